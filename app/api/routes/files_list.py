@@ -6,8 +6,11 @@ from typing import List, Optional
 
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Query
+from models.ingest_job import IngestProgress
 from pydantic import BaseModel
 from pymongo import DESCENDING, MongoClient
+from services.index_registry import get_indexer, persist_indexer
+from services.ingest_jobs import QUEUED, RUNNING
 
 # --- Mongo setup ---
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongodb:27017/docuwise")
@@ -40,6 +43,13 @@ class FileList(BaseModel):
 class FileStatus(BaseModel):
     id: str
     status: str
+    progress: Optional[IngestProgress] = None
+    error: Optional[str] = None
+
+
+class FileDeleted(BaseModel):
+    id: str
+    vectors_removed: int
 
 
 router = APIRouter()
@@ -132,10 +142,47 @@ def list_files(limit: int = Query(10, ge=1, le=100)) -> dict:
 def file_status(file_id: str) -> dict:
     try:
         oid = ObjectId(file_id) if ObjectId.is_valid(file_id) else file_id
-        doc = coll.find_one({"_id": oid}, projection={"_id": 1, "status": 1})
+        doc = coll.find_one(
+            {"_id": oid},
+            projection={"_id": 1, "status": 1, "progress": 1, "ingest_error": 1},
+        )
+        if not doc:
+            raise HTTPException(status_code=404, detail="Not found")
+        return {
+            "id": str(doc["_id"]),
+            "status": doc.get("status", "done"),
+            "progress": doc.get("progress"),
+            "error": doc.get("ingest_error"),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {e}")
+
+
+# DELETE /api/files/{file_id}
+@router.delete("/files/{file_id}", response_model=FileDeleted)
+def delete_file(file_id: str) -> dict:
+    """
+    Deletes a file record together with its vectors, so they stop appearing
+    in search results at once. Their memory is reclaimed when the index is
+    next compacted.
+    """
+    try:
+        oid = ObjectId(file_id) if ObjectId.is_valid(file_id) else file_id
+        doc = coll.find_one({"_id": oid}, projection={"saved_as": 1, "status": 1})
         if not doc:
             raise HTTPException(status_code=404, detail="Not found")
-        return {"id": str(doc["_id"]), "status": doc.get("status", "done")}
+        if doc.get("status") in (QUEUED, RUNNING):
+            raise HTTPException(status_code=409, detail="File is being ingested")
+
+        removed = 0
+        if doc.get("saved_as"):
+            removed = get_indexer().remove_document(doc["saved_as"])
+            if removed:
+                persist_indexer()
+        coll.delete_one({"_id": doc["_id"]})
+        return {"id": str(doc["_id"]), "vectors_removed": removed}
     except HTTPException:
         raise
     except Exception as e:
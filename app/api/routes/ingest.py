@@ -1,54 +1,126 @@
+import math
+import os
 from pathlib import Path
+from typing import List
 
 from fastapi import APIRouter, HTTPException, Query
-from services.chunker import TextChunker
-from services.embedder import TextEmbedder
-from services.indexer import FAISSIndexer
-from services.pdf_loader import PDFLoader
+from models.ingest_job import (
+    IngestBatchRequest,
+    IngestBatchResponse,
+    IngestJobResponse,
+)
+from services.ingest_jobs import IngestBatch, JobQueueFullError
+from services.ingest_service import (
+    INGEST_MAX_PENDING,
+    jobs,
+    submit_ingest,
+    submit_ingest_batch,
+)
 
 router = APIRouter()
 UPLOAD_DIR = Path("data")
 
+# Files per batch job; their chunks share embedding requests
+INGEST_BATCH_GROUP_SIZE = int(os.getenv("INGEST_BATCH_GROUP_SIZE", "32"))
 
-@router.post("/ingest")
-async def ingest_file(
+
+@router.post("/ingest", status_code=202, response_model=IngestJobResponse)
+def ingest_file(
     filename: str = Query(..., description="Filename saved during upload"),
+    incremental: bool = Query(
+        True, description="Replace the previous version, embedding only changes"
+    ),
 ) -> dict:
     file_path = UPLOAD_DIR / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
 
-    # Step 1: Load PDF
     try:
-        pdf_loader = PDFLoader(file_path)
-        document_text: list[str] = pdf_loader.load_text(by_page=True)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error loading PDF: {e}")
+        job = submit_ingest(filename, incremental=incremental)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    response: dict = job.to_dict()
+    return response
 
-    # Step 2: Chunk
-    try:
-        chunker = TextChunker(chunk_size=500, overlap=50)
-        chunks = chunker.chunk(document_text)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error chunking text: {e}")
 
-    # Step 3: Embed
-    try:
-        embedder = TextEmbedder()
-        embeddings = embedder.embed(chunks)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating embeddings: {e}")
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse)
+def ingest_job_status(job_id: str) -> dict:
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response: dict = job.to_dict()
+    return response
 
-    # Step 4: Metadata & Indexing
-    try:
-        metadata = [{"filename": filename, "chunk_id": i} for i in range(len(chunks))]
-        indexer = FAISSIndexer(dim=len(embeddings[0]))
-        num_vectors, num_metadata = indexer.add_embeddings(embeddings, metadata)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error indexing embeddings: {e}")
 
+def _upload_path(name: str) -> Path:
+    root = UPLOAD_DIR.resolve()
+    path = (root / name).resolve()
+    if path != root and root not in path.parents:
+        raise HTTPException(status_code=400, detail=f"Invalid path: {name}")
+    return path
+
+
+def _batch_filenames(request: IngestBatchRequest) -> List[str]:
+    filenames = list(request.filenames)
+    if request.directory is not None:
+        directory = _upload_path(request.directory)
+        if not directory.is_dir():
+            raise HTTPException(status_code=404, detail="Directory not found")
+        root = UPLOAD_DIR.resolve()
+        filenames += [
+            path.relative_to(root).as_posix()
+            for path in sorted(directory.rglob("*.pdf"))
+        ]
+    filenames = list(dict.fromkeys(filenames))  # drop repeats, keep order
+    if not filenames:
+        raise HTTPException(status_code=400, detail="No files to ingest")
+
+    missing = [name for name in filenames if not _upload_path(name).is_file()]
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"Files not found: {', '.join(missing[:20])}"
+        )
+    return filenames
+
+
+def _batch_response(batch: IngestBatch) -> dict:
+    files = [
+        result
+        for job in batch.jobs
+        if job.result
+        for result in job.result.get("files", [])
+    ]
+    failed = sum(1 for result in files if "error" in result)
     return {
-        "filename": filename,
-        "chunks_ingested": len(chunks),
-        "message": "Ingestion successful",
+        **batch.to_dict(),
+        "succeeded": len(files) - failed,
+        "failed": failed,
+        "files": files,
     }
+
+
+@router.post("/ingest/batch", status_code=202, response_model=IngestBatchResponse)
+def ingest_batch(request: IngestBatchRequest) -> dict:
+    filenames = _batch_filenames(request)
+    # Large backfills use bigger groups rather than overflowing the job queue
+    group_size = max(
+        INGEST_BATCH_GROUP_SIZE,
+        math.ceil(len(filenames) / max(1, INGEST_MAX_PENDING // 2)),
+    )
+    groups = [
+        filenames[i : i + group_size] for i in range(0, len(filenames), group_size)
+    ]
+
+    try:
+        batch = submit_ingest_batch(groups, incremental=request.incremental)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _batch_response(batch)
+
+
+@router.get("/ingest/batches/{batch_id}", response_model=IngestBatchResponse)
+def ingest_batch_status(batch_id: str) -> dict:
+    batch = jobs.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_response(batch)
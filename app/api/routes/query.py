@@ -1,19 +1,32 @@
 # app/api/routes/query.py
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel, Field
+from services.query_cache import QueryEmbeddingCache
+from services.retriever import RETRIEVAL_TOP_K, Retriever, get_retriever
 
 router = APIRouter()
 
 
 class QueryIn(BaseModel):
-    question: str
+    question: str = Field(..., min_length=1)
+    top_k: int = Field(RETRIEVAL_TOP_K, ge=1, le=50)
+    # Only search these documents (saved filenames)
+    filenames: Optional[List[str]] = None
+    # "vector", or "hybrid" to also rank by keyword matches; defaults to
+    # the RETRIEVAL_MODE setting
+    mode: Optional[Literal["vector", "hybrid"]] = None
 
 
 class Source(BaseModel):
     title: Optional[str] = None
     url: Optional[str] = None
+    filename: Optional[str] = None
+    chunk_id: Optional[int] = None
+    page: Optional[int] = None
+    score: Optional[float] = None
+    text: Optional[str] = None
 
 
 class QueryOut(BaseModel):
@@ -21,7 +34,41 @@ class QueryOut(BaseModel):
     sources: List[Source] = []
 
 
+def _server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={ms:.2f}" for name, ms in timings.items())
+
+
+def _retriever() -> Retriever:
+    try:
+        return get_retriever()
+    except ValueError as e:
+        # e.g. no embedding deployment configured
+        raise HTTPException(status_code=503, detail=str(e))
+
+
 @router.post("/query", response_model=QueryOut)
-def query_endpoint(payload: QueryIn) -> dict:
-    # TODO: plug in retriever + LLM; this is a stub
-    return {"answer": f"(stub) You asked: {payload.question}", "sources": []}
+def query_endpoint(payload: QueryIn, response: Response) -> dict:
+    try:
+        passages, timings = _retriever().retrieve(
+            payload.question, payload.top_k, payload.filenames, payload.mode
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    response.headers["Server-Timing"] = _server_timing(timings)
+
+    sources = [{"title": p["filename"], **p} for p in passages]
+    # The best passage is the answer
+    best = next((p["text"] for p in passages if p["text"]), None)
+    return {"answer": best or "No matching passages found.", "sources": sources}
+
+
+@router.get("/query/cache")
+def query_cache_stats() -> Dict[str, float]:
+    # Hit rate of the question embedding cache in this worker
+    embedder = _retriever().embedder
+    if not isinstance(embedder, QueryEmbeddingCache):
+        raise HTTPException(
+            status_code=404, detail="Questions are embedded without a cache"
+        )
+    stats: Dict[str, float] = embedder.stats()
+    return stats
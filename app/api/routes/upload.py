@@ -1,11 +1,16 @@
+import hashlib
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
 from models.file_metadata import FileUploadResponse
-from services.mongo_client import save_metadata
+from pymongo.errors import DuplicateKeyError
+from services.ingest_jobs import JobQueueFullError
+from services.ingest_service import submit_ingest
+from services.mongo_client import find_by_sha256, save_metadata
 
 load_dotenv()
 
@@ -17,17 +22,32 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 ALLOWED_TYPES = {"application/pdf"}  # Add DOCX if needed
+READ_CHUNK_SIZE = 1024 * 1024  # hash and write uploads 1 MB at a time
+
+
+def _existing_upload(doc: Dict[str, Any], ingest: bool) -> FileUploadResponse:
+    job_id = _queue_ingest(doc["saved_as"]) if ingest else None
+    return FileUploadResponse(**{**doc, "duplicate": True, "ingest_job_id": job_id})
+
+
+def _queue_ingest(filename: str, data: Optional[bytes] = None) -> str:
+    try:
+        job_id: str = submit_ingest(filename, data=data).job_id
+    except JobQueueFullError as e:
+        raise HTTPException(503, detail=str(e))
+    return job_id
 
 
 @router.post("/upload", response_model=FileUploadResponse)
-async def upload_pdf(file: UploadFile = File(...)) -> FileUploadResponse:
+async def upload_pdf(
+    file: UploadFile = File(...),
+    ingest: bool = Query(
+        False, description="Queue ingestion straight from the uploaded bytes"
+    ),
+) -> FileUploadResponse:
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(400, detail="Only PDF files are allowed")
 
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(413, detail="File too large (limit 10 MB)")
-
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     # Create a new filename with timestamp
     if not file.filename:
@@ -38,9 +58,36 @@ async def upload_pdf(file: UploadFile = File(...)) -> FileUploadResponse:
     new_filename = f"{original_name}_{timestamp}{extension}"
 
     file_path = UPLOAD_DIR / new_filename
+    part_path = UPLOAD_DIR / f".{new_filename}.part"
+
+    # Hash while streaming to a temporary file, so identical content can be
+    # detected without buffering the whole upload in memory.
+    digest = hashlib.sha256()
+    size = 0
+    # Kept only when ingesting, so the job can parse the PDF without re-reading it
+    contents: Optional[bytearray] = bytearray() if ingest else None
+    try:
+        with open(part_path, "wb") as f:
+            while chunk := await file.read(READ_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise HTTPException(413, detail="File too large (limit 10 MB)")
+                digest.update(chunk)
+                f.write(chunk)
+                if contents is not None:
+                    contents.extend(chunk)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+    sha256 = digest.hexdigest()
+
+    existing = find_by_sha256(sha256)
+    if existing:
+        part_path.unlink(missing_ok=True)
+        return _existing_upload(existing, ingest)
+
     print(f"[UPLOAD] Writing to: {file_path.resolve()}")
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    os.replace(part_path, file_path)
 
     metadata = {
         "original_filename": file.filename,
@@ -48,8 +95,19 @@ async def upload_pdf(file: UploadFile = File(...)) -> FileUploadResponse:
         "saved_path": str(file_path),
         "size_kb": round(file_path.stat().st_size / 1024, 2),
         "timestamp": timestamp,
+        "sha256": sha256,
     }
     metadata["storage"] = STORAGE_MODE
-    _ = save_metadata(metadata)
+    try:
+        _ = save_metadata(metadata)
+    except DuplicateKeyError:
+        # A concurrent upload of the same bytes won the race; keep its record
+        file_path.unlink(missing_ok=True)
+        existing = find_by_sha256(sha256)
+        if not existing:
+            raise
+        return _existing_upload(existing, ingest)
 
+    if contents is not None:
+        metadata["ingest_job_id"] = _queue_ingest(new_filename, bytes(contents))
     return FileUploadResponse(**metadata)
@@ -71,12 +71,41 @@
 #         "nn_distances": D[0].tolist(),
 #     }
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from api.routes import files_list, ingest, query, upload
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from services.index_registry import persist_indexer
+from services.ingest_service import jobs as ingest_jobs
+from services.mongo_client import ensure_indexes
+from services.retriever import get_retriever
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    ensure_indexes()
+    # Reopen the persisted vector index and create the embedding client once,
+    # before the first request, so queries only search the resident index.
+    # Without an embedding deployment the app still serves uploads and file
+    # listings; /api/query then reports the error itself.
+    try:
+        get_retriever()
+    except (ValueError, RuntimeError) as e:
+        print(f"[QUERY] Retriever not initialised at start-up: {e}")
+    yield
+    # Let in-flight ingestion jobs finish before the worker exits
+    ingest_jobs.shutdown()
+    # Snapshot what is in the write-ahead log so the next start replays nothing
+    persist_indexer(force=True)
+
 
 app = FastAPI(
-    title="DocuWise API", description="Upload and ingest PDFs for Q&A.", version="0.1.0"
+    title="DocuWise API",
+    description="Upload and ingest PDFs for Q&A.",
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -1,12 +1,20 @@
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
 
 class FileUploadResponse(BaseModel):
-    original_filename: str = Field(..., example="sample.pdf")
-    saved_as: str = Field(..., example="sample_20250803_233323.pdf")
-    saved_path: str = Field(..., example="data/sample_20250803_233323.pdf")
-    size_kb: float = Field(..., example=342.82)
-    timestamp: str = Field(..., example="20250803_233323")
-    storage: Literal["local", "azure"] = Field(..., example="local")
+    original_filename: str = Field(..., examples=["sample.pdf"])
+    saved_as: str = Field(..., examples=["sample_20250803_233323.pdf"])
+    saved_path: str = Field(..., examples=["data/sample_20250803_233323.pdf"])
+    size_kb: float = Field(..., examples=[342.82])
+    timestamp: str = Field(..., examples=["20250803_233323"])
+    storage: Literal["local", "azure"] = Field(..., examples=["local"])
+    sha256: Optional[str] = Field(
+        None,
+        examples=["9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"],
+    )
+    duplicate: bool = Field(False, examples=[False])
+    ingest_job_id: Optional[str] = Field(
+        None, examples=["3f2c9a0e1b7d4c6a8e5f0a1b2c3d4e5f"]
+    )
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class IngestProgress(BaseModel):
+    pages_extracted: int = 0
+    chunks_embedded: int = 0
+    vectors_indexed: int = 0
+
+
+class IngestJobResponse(BaseModel):
+    job_id: str = Field(..., examples=["3f2c9a0e1b7d4c6a8e5f0a1b2c3d4e5f"])
+    filename: str = Field(..., examples=["sample_20250803_233323.pdf"])
+    status: JobStatus = Field(..., examples=["queued"])
+    progress: IngestProgress = IngestProgress()
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class IngestBatchRequest(BaseModel):
+    filenames: List[str] = []
+    directory: Optional[str] = None
+    incremental: bool = True
+
+
+class IngestBatchResponse(BaseModel):
+    batch_id: str = Field(..., examples=["9b1e4c2d7a3f4e5d8c6b0a1f2e3d4c5b"])
+    status: JobStatus = Field(..., examples=["running"])
+    total_files: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    files: List[Dict[str, Any]] = []
+    jobs: List[IngestJobResponse] = []
+    created_at: Optional[datetime] = None
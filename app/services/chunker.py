@@ -1,7 +1,196 @@
-from typing import List
+import hashlib
+import itertools
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple, Union
 
+import numpy as np
 
-class TextChunker:
+# "chars" (fixed-size character windows) or "tokens" (TokenChunker)
+CHUNK_MODE = os.getenv("CHUNK_MODE", "chars")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+# A sentence (through ., ! or ? and any closing quote or bracket, when followed
+# by whitespace), or text up to a blank line, or the rest of the text
+_SEGMENT = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|(?=\n[ \t]*\n)|$)", re.S)
+_PARAGRAPH_BREAK = re.compile(r"[ \t]*\n[ \t]*\n")
+
+# Where a chunk lies in a document: (page, start, end_page, end). It runs from
+# offset `start` on `page` to offset `end` on `end_page`; both pages are indexes
+# into the page sequence given to the chunker.
+Span = Tuple[int, int, int, int]
+PageTexts = Union[Sequence[str], Mapping[int, str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+def chunk_fingerprint(text: str) -> str:
+    """
+    Short content hash that identifies a chunk across document versions.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def span_text(pages: PageTexts, span: Span) -> str:
+    """
+    Slices a chunk's text out of the page texts. Text from consecutive pages
+    is joined with a newline, skipping blank pages in between.
+    """
+    page, start, end_page, end = span
+    if page == end_page:
+        return pages[page][start:end]
+    parts = [pages[page][start:]]
+    parts += [pages[i] for i in range(page + 1, end_page)]
+    parts.append(pages[end_page][:end])
+    return "\n".join(part for part in parts if part.strip())
+
+
+class ChunkSpans:
+    """
+    Chunk boundaries for one document, stored as a single ``(n, 4)`` int32
+    array of spans rather than one string per chunk. Text is only sliced out
+    of the page texts when it is asked for.
+    """
+
+    def __init__(self, spans: np.ndarray):
+        """
+        Args:
+            spans (np.ndarray): Array of shape ``(n, 4)``, one ``Span`` per row.
+        """
+        self.spans = spans.astype(np.int32, copy=False).reshape(-1, 4)
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[Span]) -> "ChunkSpans":
+        flat = np.fromiter(itertools.chain.from_iterable(spans), dtype=np.int32)
+        return cls(flat)
+
+    @property
+    def page(self) -> np.ndarray:
+        return self.spans[:, 0]
+
+    @property
+    def start(self) -> np.ndarray:
+        return self.spans[:, 1]
+
+    @property
+    def end_page(self) -> np.ndarray:
+        return self.spans[:, 2]
+
+    @property
+    def end(self) -> np.ndarray:
+        return self.spans[:, 3]
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, i: int) -> Span:
+        page, start, end_page, end = self.spans[i].tolist()
+        return page, start, end_page, end
+
+    def text(self, i: int, pages: PageTexts) -> str:
+        """
+        Materialises the text of chunk ``i``.
+        """
+        return span_text(pages, self[i])
+
+    def texts(self, pages: PageTexts) -> Iterator[str]:
+        """
+        Lazily materialises the text of every chunk, in order.
+        """
+        for i in range(len(self)):
+            yield self.text(i, pages)
+
+
+class Chunker(ABC):
+    """
+    Base class for chunkers: subclasses produce spans, from which chunk texts
+    are sliced as they are needed.
+    """
+
+    @abstractmethod
+    def iter_spans(self, pages: Iterable[str]) -> Iterator[Span]:
+        """
+        Lazily yields the span of each chunk. Spans never start on an earlier
+        page than the previous span.
+
+        Args:
+            pages (Iterable[str]): Page-level text strings, possibly a generator.
+
+        Yields:
+            Span: Position of each chunk in ``pages``.
+        """
+
+    def chunk(self, pages: List[str]) -> List[str]:
+        """
+        Splits a list of page-level text strings into chunks.
+
+        Args:
+            pages (List[str]): List of text strings, typically one per page.
+
+        Returns:
+            List[str]: List of text chunks.
+        """
+        return list(self.iter_chunks(pages))
+
+    def chunk_spans(self, pages: Sequence[str]) -> ChunkSpans:
+        """
+        Splits pages into chunks without copying any text.
+
+        Args:
+            pages (Sequence[str]): Page texts the spans refer to.
+
+        Returns:
+            ChunkSpans: The span of every chunk.
+        """
+        return ChunkSpans.from_spans(self.iter_spans(pages))
+
+    def iter_chunks(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Lazily yields chunks as pages arrive, so callers can stream a document
+        without holding all of its chunks in memory.
+
+        Args:
+            pages (Iterable[str]): Page-level text strings, possibly a generator.
+
+        Yields:
+            str: Text chunks.
+        """
+        for _, text in self.iter_spans_with_text(pages):
+            yield text
+
+    def iter_spans_with_text(self, pages: Iterable[str]) -> Iterator[Tuple[Span, str]]:
+        """
+        Lazily yields each chunk's span together with its text. Only the pages
+        the current chunk still refers to are kept in memory.
+
+        Args:
+            pages (Iterable[str]): Page-level text strings, possibly a generator.
+
+        Yields:
+            Tuple[Span, str]: Position and text of each chunk.
+        """
+        buffered: Dict[int, str] = {}
+
+        def remember() -> Iterator[str]:
+            for i, page in enumerate(pages):
+                buffered[i] = page
+                yield page
+
+        for span in self.iter_spans(remember()):
+            yield span, span_text(buffered, span)
+            # Later spans never start before this one's first page
+            for i in [i for i in buffered if i < span[0]]:
+                del buffered[i]
+
+
+class TextChunker(Chunker):
     """
     A utility class to split long texts into overlapping chunks,
     useful for embedding and vector indexing in NLP pipelines.
@@ -23,40 +212,156 @@ class TextChunker:
         self.chunk_size = chunk_size
         self.overlap = overlap
 
-    def chunk(self, pages: List[str]) -> List[str]:
+    def iter_spans(self, pages: Iterable[str]) -> Iterator[Span]:
         """
-        Splits a list of page-level text strings into overlapping chunks.
+        Lazily yields overlapping fixed-size windows over each page.
 
         Args:
-            pages (List[str]): List of text strings, typically one per page.
+            pages (Iterable[str]): Page-level text strings, possibly a generator.
 
-        Returns:
-            List[str]: List of text chunks with overlap applied.
+        Yields:
+            Span: Position of each chunk; chunks never cross pages.
         """
-        chunks = []
-        for page in pages:
+        for page_number, page in enumerate(pages):
             if not page.strip():
                 continue
-            chunks.extend(self._split_with_overlap(page))
-        return chunks
+            for start, end in self._split_with_overlap(len(page)):
+                yield page_number, start, page_number, end
 
-    def _split_with_overlap(self, text: str) -> List[str]:
+    def _split_with_overlap(self, text_length: int) -> List[Tuple[int, int]]:
         """
-        Internal helper to split a single string into chunks with overlap.
+        Internal helper to split a string of the given length into chunks with overlap.
 
         Args:
-            text (str): The full string to split.
+            text_length (int): Length of the string to split.
 
         Returns:
-            List[str]: List of overlapping chunks from the input text.
+            List[Tuple[int, int]]: Start and end offsets of the overlapping chunks.
         """
         start = 0
         end = self.chunk_size
-        text_length = len(text)
         results = []
 
         while start < text_length:
-            results.append(text[start:end])
+            results.append((start, min(end, text_length)))
             start = end - self.overlap
             end = start + self.chunk_size
         return results
+
+
+class TokenChunker(Chunker):
+    """
+    Splits text into chunks of at most ``max_tokens`` (estimated) tokens whose
+    boundaries fall on sentence or paragraph ends.
+
+    Pages are treated as one continuous stream, so the short tail of a page is
+    merged with the start of the next one instead of becoming its own chunk.
+    Each sentence is visited once, so chunking is linear in the text length.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ):
+        """
+        Args:
+            max_tokens (int): Maximum estimated tokens in a chunk.
+            overlap_tokens (int): Whole trailing sentences, up to this many
+                tokens, repeated at the start of the next chunk.
+
+        Raises:
+            ValueError: If max_tokens is not greater than overlap_tokens.
+        """
+        if max_tokens <= overlap_tokens:
+            raise ValueError("max tokens must be greater than overlap tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def iter_spans(self, pages: Iterable[str]) -> Iterator[Span]:
+        """
+        Lazily yields chunk spans as pages arrive. A chunk is closed when the
+        next sentence would not fit, or early at a paragraph end once it is
+        three-quarters full.
+
+        Args:
+            pages (Iterable[str]): Page-level text strings, possibly a generator.
+
+        Yields:
+            Span: Position of each chunk of whole sentences; only a sentence
+            longer than ``max_tokens`` is cut, at a word boundary.
+        """
+        # Sentences of the open chunk as (page, start, end), and their sizes
+        parts: List[Tuple[int, int, int]] = []
+        sizes: List[int] = []
+        total = 0
+        carried = 0  # leading parts repeated from the previous chunk
+        for page_number, page in enumerate(pages):
+            for start, end, paragraph_end in self._segments(page):
+                size = (end - start) // 4 + 1
+                if total + size > self.max_tokens and len(parts) > carried:
+                    yield self._span(parts)
+                    parts, sizes = self._overlap(parts, sizes)
+                    total, carried = sum(sizes), len(parts)
+                if total + size > self.max_tokens:
+                    # The overlap and this sentence don't fit together
+                    parts, sizes, total, carried = [], [], 0, 0
+                parts.append((page_number, start, end))
+                sizes.append(size)
+                total += size
+                if paragraph_end and total * 4 >= self.max_tokens * 3:
+                    yield self._span(parts)
+                    parts, sizes = self._overlap(parts, sizes)
+                    total, carried = sum(sizes), len(parts)
+        if len(parts) > carried:
+            yield self._span(parts)
+
+    @staticmethod
+    def _span(parts: List[Tuple[int, int, int]]) -> Span:
+        return parts[0][0], parts[0][1], parts[-1][0], parts[-1][2]
+
+    def _segments(self, text: str) -> Iterator[Tuple[int, int, bool]]:
+        # Offsets of sentences no longer than max_tokens, and whether a
+        # paragraph ends there
+        limit = self.max_tokens * 4 - 4
+        for match in _SEGMENT.finditer(text):
+            start = match.start()
+            end = start + len(match.group().rstrip())
+            paragraph_end = _PARAGRAPH_BREAK.match(text, match.end()) is not None
+            while end - start > limit:
+                cut = text.rfind(" ", start + 1, start + limit)
+                cut = cut if cut > 0 else start + limit
+                yield start, cut, False
+                start = cut
+                while start < end and text[start].isspace():
+                    start += 1
+            if start < end:
+                yield start, end, paragraph_end
+
+    def _overlap(
+        self, parts: List[Tuple[int, int, int]], sizes: List[int]
+    ) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+        # The trailing whole sentences that fit in overlap_tokens
+        keep, total = 0, 0
+        for size in reversed(sizes):
+            if total + size > self.overlap_tokens:
+                break
+            keep += 1
+            total += size
+        if not keep:
+            return [], []
+        return parts[-keep:], sizes[-keep:]
+
+
+def make_chunker(mode: str = CHUNK_MODE) -> Chunker:
+    """
+    Creates the chunker selected by ``CHUNK_MODE``.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == "chars":
+        return TextChunker(chunk_size=500, overlap=50)
+    if mode == "tokens":
+        return TokenChunker()
+    raise ValueError(f"Unknown chunk mode: {mode}")
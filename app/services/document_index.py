@@ -0,0 +1,135 @@
+import os
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# Memory the per-document sub-indexes of one FAISSIndexer may take up
+DOC_INDEX_CACHE_MB = int(os.getenv("FAISS_DOC_INDEX_CACHE_MB", "512"))
+# Searches filtered to at most this many documents use their sub-indexes
+DOC_INDEX_MAX_DOCUMENTS = int(os.getenv("FAISS_DOC_INDEX_MAX_DOCUMENTS", "8"))
+
+# A document's sub-index and the stable id of each of its vectors
+_Entry = Tuple[faiss.IndexFlatL2, np.ndarray]
+
+
+class DocumentIndexes:
+    """
+    Small exact (flat) indexes holding the vectors of single documents, so
+    a search scoped to a few documents scans only their vectors instead of
+    the whole corpus.
+
+    Sub-indexes are kept for the most recently used documents, up to a
+    memory budget, and report stable vector ids. They hold live vectors
+    only: the owner extends them as a document's chunks are added and
+    discards them when any of its vectors are removed or relabelled, after
+    which they are rebuilt on the next scoped search.
+    """
+
+    def __init__(self, dim: int, max_bytes: int = DOC_INDEX_CACHE_MB * 2**20):
+        """
+        Args:
+            dim (int): Dimensionality of the vectors.
+            max_bytes (int): Memory budget of all sub-indexes together;
+                least recently used ones are dropped to stay within it.
+        """
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._indexes: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._indexes
+
+    def fits(self, count: int) -> bool:
+        """
+        Whether a document of ``count`` vectors fits in the budget.
+        """
+        return self._entry_bytes(count) <= self.max_bytes
+
+    def add(self, filename: str, vectors: np.ndarray, ids: np.ndarray) -> bool:
+        """
+        Appends vectors to ``filename``'s sub-index, creating it if needed.
+        A document that outgrows the budget loses its sub-index.
+
+        Returns:
+            bool: Whether ``filename`` has a sub-index afterwards.
+        """
+        entry = self._indexes.pop(filename, None)
+        if entry is None:
+            entry = (faiss.IndexFlatL2(self.dim), np.empty(0, dtype=np.int64))
+        else:
+            self.nbytes -= self._entry_bytes(entry[0].ntotal)
+        index, known = entry
+        if not self.fits(index.ntotal + len(ids)):
+            return False
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        self._indexes[filename] = (index, np.concatenate([known, ids]))
+        self.nbytes += self._entry_bytes(index.ntotal)
+        self._evict()
+        return filename in self._indexes
+
+    def discard(self, *filenames: Optional[str]) -> None:
+        """
+        Drops the sub-indexes of ``filenames``, if any.
+        """
+        for filename in filenames:
+            entry = self._indexes.pop(filename, None)  # type: ignore[arg-type]
+            if entry is not None:
+                self.nbytes -= self._entry_bytes(entry[0].ntotal)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self.nbytes = 0
+
+    def search(
+        self, filenames: Iterable[str], queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches the sub-indexes of ``filenames``, which must all be
+        present, and merges their hits.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Squared L2 distances and stable
+            ids, each of shape ``(len(queries), k)``; missing neighbours have
+            id -1 and the largest float32 distance, as FAISS reports them.
+        """
+        all_distances = [np.full((len(queries), k), np.finfo(np.float32).max)]
+        all_ids = [np.full((len(queries), k), -1, dtype=np.int64)]
+        for filename in filenames:
+            index, ids = self._indexes[filename]
+            self._indexes.move_to_end(filename)
+            if not index.ntotal:
+                continue
+            distances, rows = index.search(queries, min(k, index.ntotal))
+            all_distances.append(distances)
+            all_ids.append(ids[rows])
+        if len(all_ids) == 2:
+            # One document: its hits are sorted already
+            distances, ids = all_distances[1], all_ids[1]
+            pad = k - distances.shape[1]
+            return (
+                np.hstack([distances, all_distances[0][:, :pad]]),
+                np.hstack([ids, all_ids[0][:, :pad]]),
+            )
+        distances = np.hstack(all_distances[1:] + all_distances[:1])
+        ids = np.hstack(all_ids[1:] + all_ids[:1])
+        # Ties go to the older vector, as in the main index
+        order = np.lexsort((ids, distances), axis=1)[:, :k]
+        return (
+            np.take_along_axis(distances, order, axis=1).astype(np.float32),
+            np.take_along_axis(ids, order, axis=1),
+        )
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and self._indexes:
+            _, (index, _) = self._indexes.popitem(last=False)
+            self.nbytes -= self._entry_bytes(index.ntotal)
+
+    def _entry_bytes(self, count: int) -> int:
+        # float32 vector plus int64 id per row
+        return count * (self.dim * 4 + 8)
@@ -1,9 +1,16 @@
+import base64
 import os
-from typing import Any, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Union
 
+import numpy as np
 import openai
 from dotenv import load_dotenv
 
+from .chunker import estimate_tokens
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+
 load_dotenv()
 
 openai.api_type = "azure"
@@ -11,46 +18,252 @@ openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
 openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
 openai.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
 
+# Azure OpenAI accepts at most 2048 inputs per request; keep well below the
+# per-request token ceiling so one request never carries a whole manual.
+MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "256"))
+MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+
 
 class TextEmbedder:
     """
     A class to generate embeddings for a list of text chunks using Azure OpenAI.
     """
 
-    def __init__(self, deployment: Optional[str] = None, embedding_client: Any = None):
+    def __init__(
+        self,
+        deployment: Optional[str] = None,
+        embedding_client: Any = None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_concurrency: int = MAX_CONCURRENCY,
+        dimensions: Optional[int] = None,
+        cache: Optional[EmbeddingCache] = None,
+    ):
         """
         Initialize the embedder with an Azure deployment name.
 
         Args:
             deployment (str): Azure deployment name. If None, loaded from env var.
+            embedding_client (Any): Client exposing ``create``; defaults to openai.
+            max_batch_size (int): Maximum number of inputs per request.
+            max_batch_tokens (int): Maximum estimated tokens per request.
+            max_concurrency (int): Maximum requests in flight for this embedder.
+            dimensions (int, optional): Output dimensions requested from models
+                that support shortening. If None, loaded from env var if set.
+            cache (EmbeddingCache, optional): Cache consulted before any request.
+
+        Raises:
+            ValueError: If no deployment is configured or a limit is not positive.
         """
 
         self.deployment = deployment or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
         if not self.deployment:
             raise ValueError("Deployment name must be provided or set in environment.")
+        if min(max_batch_size, max_batch_tokens, max_concurrency) < 1:
+            raise ValueError("Batch limits and concurrency must be positive.")
         # Injectable client, default is openai.Embedding
         self.embedding_client = embedding_client or openai.embeddings
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        env_dimensions = os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS")
+        self.dimensions = dimensions or (
+            int(env_dimensions) if env_dimensions else None
+        )
+        self.cache = cache
+        # Vector size seen in responses, so later calls can preallocate
+        self._dim: Optional[int] = self.dimensions
+        # Shared by every embed() call on this instance, so concurrent callers
+        # (e.g. several pipeline workers) together respect the in-flight limit.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="embed"
+        )
 
     def embed(self, texts: List[str]) -> List[List[float]]:
         """
         Generates embeddings for a list of text chunks.
 
+        Texts already in the cache are served from it; the rest are split into
+        size- and token-bounded batches that are sent concurrently. Results are
+        returned in input order.
+
         Args:
             texts (List[str]): List of text chunks to embed.
 
         Returns:
             List[List[float]]: Embedding vectors for each chunk.
         """
+        vectors: List[List[float]] = self.embed_array(texts).tolist()
+        return vectors
+
+    def embed_array(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """
+        Like :meth:`embed`, but returns one contiguous float32 array.
+
+        Embeddings are requested base64-encoded and decoded straight into
+        rows of the result, so no Python float is created per dimension and
+        the array can be handed to FAISS without another copy.
+
+        Args:
+            texts (List[str]): List of text chunks to embed.
+            use_cache (bool): Consult and fill the cache; callers that keep
+                their own cache tiers pass False.
+
+        Returns:
+            np.ndarray: Array of shape ``(len(texts), dim)``.
+        """
 
         try:
             if not self.deployment:
                 raise ValueError(
                     "Deployment name must be provided or set in environment."
                 )
-            response = self.embedding_client.create(
-                model=str(self.deployment), input=texts
-            )
-            return [d.embedding for d in response.data]
-            # return [item["embedding"] for item in response["data"]]
+            if self.cache is None or not use_cache:
+                return self._embed_uncached(texts)
+
+            keys = [
+                self.cache.make_key(text, self.deployment, self.dimensions)
+                for text in texts
+            ]
+            vectors = self.cache.get_many(keys)
+            # Embed each missing text once, even if it repeats within `texts`
+            missing: Dict[bytes, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in vectors:
+                    missing.setdefault(key, text)
+            if missing:
+                fresh = self._embed_uncached(list(missing.values()))
+                rows = dict(zip(missing, fresh))
+                self.cache.put_many(rows)
+                vectors.update(rows)
+            return self._stack([vectors[key] for key in keys])
         except Exception as e:
             raise RuntimeError(f"Embedding failed: {e}")
+
+    def _stack(self, rows: Sequence[np.ndarray]) -> np.ndarray:
+        dim = len(rows[0]) if rows else self._dim or 0
+        out = np.empty((len(rows), dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            out[i] = row
+        return out
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        batches = self.split_batches(texts)
+        if not batches:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        starts = np.cumsum([0] + [len(batch) for batch in batches]).tolist()
+
+        first = 0
+        if self._dim is None:
+            # The first response tells the vector size
+            head = self._embed_batch(batches[0])
+            out = np.empty((len(texts), head.shape[1]), dtype=np.float32)
+            out[: len(head)] = head
+            first = 1
+        else:
+            out = np.empty((len(texts), self._dim), dtype=np.float32)
+
+        # Each batch decodes into its own slice of `out`
+        list(
+            self._executor.map(
+                lambda i: self._embed_batch(batches[i], out[starts[i] : starts[i + 1]]),
+                range(first, len(batches)),
+            )
+        )
+        return out
+
+    def split_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Greedily groups consecutive texts into batches that respect both
+        ``max_batch_size`` and ``max_batch_tokens``. A single text larger than
+        the token budget is sent on its own.
+
+        Args:
+            texts (List[str]): Texts to group.
+
+        Returns:
+            List[List[str]]: Consecutive batches covering ``texts`` in order.
+        """
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) == self.max_batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(
+        self, texts: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        kwargs: Dict[str, Any] = {}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+        response = self.embedding_client.create(
+            model=str(self.deployment),
+            input=texts,
+            encoding_format="base64",
+            **kwargs,
+        )
+        data = list(response.data)
+        if len(data) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(data)}")
+
+        # Keep input order: the response `index` says which input each vector is for
+        indices = []
+        for position, item in enumerate(data):
+            index = getattr(item, "index", None)
+            indices.append(index if isinstance(index, int) else position)
+        if sorted(indices) != list(range(len(texts))):
+            raise ValueError(
+                f"Expected one embedding per input index 0-{len(texts) - 1}, "
+                f"got indexes {sorted(indices)}"
+            )
+
+        for index, item in zip(indices, data):
+            vector = _decode(item.embedding)
+            if out is None:
+                out = np.empty((len(texts), len(vector)), dtype=np.float32)
+            if len(vector) != out.shape[1]:
+                raise ValueError(
+                    f"Expected {out.shape[1]}-dimensional embeddings, got {len(vector)}"
+                )
+            out[index] = vector
+        if out is None:
+            out = np.empty((0, self._dim or 0), dtype=np.float32)
+        self._dim = out.shape[1]
+        return out
+
+
+def _decode(embedding: Union[str, List[float]]) -> np.ndarray:
+    # base64 of little-endian float32s; plain lists are accepted too
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+    return np.asarray(embedding, dtype=np.float32)
+
+
+_embedder: Optional[TextEmbedder] = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> TextEmbedder:
+    """
+    Returns the process-wide embedder backed by the shared embedding cache, so
+    every ingestion job draws on one pool of ``MAX_CONCURRENCY`` requests.
+
+    Raises:
+        ValueError: If no deployment is configured.
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = TextEmbedder(cache=get_embedding_cache())
+        return _embedder
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/embedding_cache.sqlite3")
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+
+# SQLite's default limit on host parameters per statement is 999
+_QUERY_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors.
+
+    Vectors are stored as float32 blobs in a SQLite file, keyed by a hash of
+    the text, the embedding deployment and the requested dimensions, so an
+    identical chunk is only ever embedded once per model. When the cache
+    grows past ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = EMBED_CACHE_PATH,
+        max_bytes: int = EMBED_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        """
+        Args:
+            path (Union[str, Path]): SQLite file; created if missing.
+            max_bytes (int): Size of stored vectors above which entries are evicted.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)"
+        )
+        self._size = self._stored_bytes()
+
+    @staticmethod
+    def make_key(text: str, deployment: str, dimensions: Optional[int] = None) -> bytes:
+        """
+        Content address of ``text`` as embedded by ``deployment``.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{deployment}\0{dimensions or 0}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Looks up several keys at once and refreshes their recency.
+
+        Returns:
+            Dict[bytes, np.ndarray]: Read-only float32 vectors for the keys that
+            were cached, viewing the stored blobs without a copy.
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _QUERY_CHUNK):
+                part = unique[start : start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: Mapping[bytes, Iterable[float]]) -> None:
+        """
+        Stores vectors under their keys, then evicts if over budget.
+        """
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+            if rows and cursor.rowcount > 0:
+                # Vectors from one deployment all have the same size
+                self._size += cursor.rowcount * len(rows[0][1])
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters for this process plus the cache's current size.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries[0],
+                "bytes": self._size,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _stored_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        return int(row[0])
+
+    def _evict(self) -> None:
+        # Drop least recently used entries down to 90% of the budget, so
+        # eviction runs in occasional bulk deletes rather than on every put.
+        target = int(self.max_bytes * 0.9)
+        self._size = self._stored_bytes()  # other workers may share the file
+        while self._size > target:
+            row = self._conn.execute(
+                "SELECT AVG(LENGTH(vector)) FROM embeddings"
+            ).fetchone()
+            average = max(1, int(row[0] or 1))
+            count = max(1, (self._size - target) // average)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count,),
+            )
+            self._size = self._stored_bytes()
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide cache, or None when ``EMBED_CACHE_PATH`` is empty.
+    """
+    global _cache
+    if not EMBED_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(EMBED_CACHE_PATH)
+        return _cache
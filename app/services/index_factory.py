@@ -0,0 +1,278 @@
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FLAT = "flat"
+IVF_FLAT = "ivf_flat"
+IVF_PQ = "ivf_pq"
+HNSW = "hnsw"
+AUTO = "auto"
+
+# How vectors are stored: full float32, or scalar-quantised to 2 or 1 bytes
+# per dimension (IVF-PQ always stores PQ codes)
+FLOAT32 = "float32"
+FP16 = "fp16"
+SQ8 = "sq8"
+_STORAGE_CODES = {FLOAT32: "Flat", FP16: "SQfp16", SQ8: "SQ8"}
+
+# Exact search stays fast enough up to a few hundred thousand vectors; beyond
+# that IVF-Flat, and once full vectors no longer fit comfortably, IVF-PQ.
+FLAT_MAX_VECTORS = int(os.getenv("FAISS_FLAT_MAX_VECTORS", "200000"))
+IVF_FLAT_MAX_VECTORS = int(os.getenv("FAISS_IVF_FLAT_MAX_VECTORS", "5000000"))
+VECTOR_STORAGE = os.getenv("FAISS_VECTOR_STORAGE", FLOAT32)
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+# Defaults stored in built indexes; search() can override them per query
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# k-means wants ~40-256 training points per list; more costs time, not recall
+TRAIN_POINTS_PER_LIST = 64
+MIN_POINTS_PER_LIST = 39
+PQ_DIMS_PER_SUBQUANTIZER = 16
+ADD_BATCH_SIZE = 65536
+# A new SQ8 corpus keeps float32 vectors until it has this many, then learns
+# the quantiser's ranges from all of them: ranges learnt from a small first
+# batch clip most later vectors
+QUANTIZER_TRAIN_MIN_VECTORS = int(
+    os.getenv("FAISS_QUANTIZER_TRAIN_MIN_VECTORS", "4096")
+)
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """
+    Picks the index type suited to a corpus of ``num_vectors`` vectors.
+    HNSW is never picked automatically: it needs the most memory and cannot
+    remove vectors without rebuilding its graph.
+    """
+    if num_vectors <= FLAT_MAX_VECTORS:
+        return FLAT
+    if num_vectors <= IVF_FLAT_MAX_VECTORS:
+        return IVF_FLAT
+    return IVF_PQ
+
+
+def nlist_for(num_vectors: int) -> int:
+    """
+    Number of IVF lists: about 4 * sqrt(n), rounded to a power of two, with
+    enough vectors per list to train the coarse quantizer.
+    """
+    target = 4 * math.sqrt(max(num_vectors, 1))
+    nlist = 2 ** max(0, round(math.log2(target)))
+    while nlist > 1 and num_vectors < nlist * MIN_POINTS_PER_LIST:
+        nlist //= 2
+    return int(nlist)
+
+
+def pq_subquantizers(dim: int) -> int:
+    """
+    Number of PQ sub-quantizers: about one per 16 dimensions, dividing ``dim``.
+    """
+    m = max(1, dim // PQ_DIMS_PER_SUBQUANTIZER)
+    while dim % m:
+        m -= 1
+    return int(m)
+
+
+def index_spec(
+    index_type: str, dim: int, num_vectors: int, storage: str = VECTOR_STORAGE
+) -> str:
+    """
+    Translates an index type into a ``faiss.index_factory`` string sized for
+    ``num_vectors``. Anything that isn't a known type is returned unchanged,
+    so factory strings such as ``"IVF4096,PQ64"`` can be passed through.
+
+    Args:
+        index_type (str): One of ``flat``, ``ivf_flat``, ``ivf_pq``, ``hnsw``,
+            ``auto``, or a factory string.
+        dim (int): Dimensionality of the vectors.
+        num_vectors (int): Number of vectors the index will hold.
+        storage (str): ``float32``, ``fp16`` or ``sq8``; how flat, IVF-Flat
+            and HNSW indexes store their vectors.
+
+    Returns:
+        str: The factory string.
+
+    Raises:
+        ValueError: If the storage mode is unknown.
+    """
+    if storage not in _STORAGE_CODES:
+        raise ValueError(f"Unknown vector storage: {storage}")
+    code = _STORAGE_CODES[storage]
+    if index_type == AUTO:
+        index_type = choose_index_type(num_vectors)
+    if index_type == FLAT:
+        return code
+    if index_type == IVF_FLAT:
+        return f"IVF{nlist_for(num_vectors)},{code}"
+    if index_type == IVF_PQ:
+        return f"IVF{nlist_for(num_vectors)},PQ{pq_subquantizers(dim)}"
+    if index_type == HNSW:
+        return f"HNSW{HNSW_M}" if storage == FLOAT32 else f"HNSW{HNSW_M}_{code}"
+    return index_type
+
+
+def new_index(dim: int, storage: str = VECTOR_STORAGE) -> faiss.Index:
+    """
+    Creates the empty flat index a new corpus starts with. Storage modes
+    whose quantiser must be trained (sq8) start out as float32; see
+    :func:`ready_to_quantize`.
+
+    Raises:
+        ValueError: If the storage mode is unknown.
+    """
+    index = faiss.index_factory(dim, index_spec(FLAT, dim, 0, storage), faiss.METRIC_L2)
+    if not index.is_trained:
+        return faiss.IndexFlatL2(dim)
+    return index
+
+
+def ready_to_quantize(index: faiss.Index, storage: str) -> bool:
+    """
+    Whether ``index`` is the float32 stand-in :func:`new_index` created for
+    an sq8 corpus and now holds enough vectors to train the quantiser on.
+    """
+    return (
+        storage == SQ8
+        and isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+        and index.ntotal >= QUANTIZER_TRAIN_MIN_VECTORS
+    )
+
+
+def training_sample(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """
+    Draws ``size`` rows uniformly without replacement (all rows if fewer),
+    so training cost does not grow with the corpus.
+    """
+    if len(vectors) <= size:
+        return np.ascontiguousarray(vectors, dtype="float32")
+    rows = np.random.default_rng(seed).choice(len(vectors), size, replace=False)
+    rows.sort()  # sequential reads are much faster on memory-mapped vectors
+    return np.ascontiguousarray(vectors[rows], dtype="float32")
+
+
+def build_index(
+    spec: str,
+    vectors: np.ndarray,
+    train_size: Optional[int] = None,
+    seed: int = 0,
+) -> faiss.Index:
+    """
+    Creates an index from a factory string, trains it on a sample of
+    ``vectors`` if it needs training, and adds every vector in order.
+
+    Args:
+        spec (str): ``faiss.index_factory`` string, e.g. from :func:`index_spec`.
+        vectors (np.ndarray): float32 array of shape ``(n, dim)``.
+        train_size (int, optional): Training sample size; by default
+            ``TRAIN_POINTS_PER_LIST`` per IVF list.
+        seed (int): Seed for the training sample.
+
+    Returns:
+        faiss.Index: The populated index; vector ids are row numbers.
+
+    Raises:
+        ValueError: If there are too few vectors to train the index.
+    """
+    dim = vectors.shape[1]
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        ivf = faiss.try_extract_index_ivf(index)
+        nlist = ivf.nlist if ivf is not None else 1
+        if len(vectors) < nlist * MIN_POINTS_PER_LIST:
+            raise ValueError(
+                f"{spec} needs at least {nlist * MIN_POINTS_PER_LIST} vectors to "
+                f"train, got {len(vectors)}."
+            )
+        size = train_size or max(nlist * TRAIN_POINTS_PER_LIST, 10000)
+        index.train(training_sample(vectors, size, seed))
+    _set_search_defaults(index)
+    for start in range(0, len(vectors), ADD_BATCH_SIZE):
+        batch = vectors[start : start + ADD_BATCH_SIZE]
+        index.add(np.ascontiguousarray(batch, dtype="float32"))
+    return index
+
+
+def _set_search_defaults(index: faiss.Index) -> None:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(FAISS_NPROBE, ivf.nlist)
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW):
+        hnsw.hnsw.efSearch = FAISS_EF_SEARCH
+
+
+def search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query search parameters for ``index``; None leaves its defaults.
+
+    Args:
+        index (faiss.Index): Index the parameters are for.
+        nprobe (int, optional): IVF lists visited per query.
+        ef_search (int, optional): HNSW candidate list size per query.
+        selector (faiss.IDSelector, optional): Restricts results to the ids
+            it selects; the caller must keep it alive during the search.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = faiss.downcast_index(index)
+    params: Optional[faiss.SearchParameters] = None
+    if ivf is not None and (nprobe is not None or selector is not None):
+        params = faiss.SearchParametersIVF()
+        # Unset fields would replace the index's own setting with FAISS's default
+        params.nprobe = nprobe if nprobe is not None else ivf.nprobe
+    elif isinstance(hnsw, faiss.IndexHNSW) and (
+        ef_search is not None or selector is not None
+    ):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search if ef_search is not None else hnsw.hnsw.efSearch
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    if params is not None and selector is not None:
+        params.sel = selector
+    return params
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """
+    Short name of the kind of index: ``flat``, ``ivf_flat``, ``ivf_pq``,
+    ``hnsw``, or the FAISS class name for anything else.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return IVF_PQ if isinstance(ivf, faiss.IndexIVFPQ) else IVF_FLAT
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        return FLAT
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    return type(index).__name__
+
+
+def vector_storage_of(index: faiss.Index) -> str:
+    """
+    How ``index`` stores its vectors: ``float32``, ``fp16``, ``sq8``, ``pq``,
+    or the FAISS class name for anything else.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexIVFFlat)):
+        return FLOAT32
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = index.sq.qtype
+        if qtype == faiss.ScalarQuantizer.QT_fp16:
+            return FP16
+        if qtype == faiss.ScalarQuantizer.QT_8bit:
+            return SQ8
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return type(index).__name__
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .indexer import FAISSIndexer
+from .sharded_indexer import ShardedIndexer
+from .vector_store import VectorStore
+
+load_dotenv()
+
+INDEX_DIR = Path(os.getenv("FAISS_INDEX_DIR", "data/index"))
+EMBED_DIM = int(os.getenv("EMBED_DIM", "1536"))
+# "faiss" keeps the index in process; "qdrant" uses the QDRANT_URL collection
+VECTOR_STORE = os.getenv("VECTOR_STORE", "faiss")
+# More than one shard splits the index by document and searches in parallel
+FAISS_SHARDS = int(os.getenv("FAISS_SHARDS", "1"))
+# Changes are logged as they happen; a snapshot is taken once the log has
+# grown this much or is this old, which bounds the replay on restart
+SNAPSHOT_WAL_MB = int(os.getenv("FAISS_SNAPSHOT_WAL_MB", "256"))
+SNAPSHOT_INTERVAL = int(os.getenv("FAISS_SNAPSHOT_INTERVAL", "300"))  # seconds
+
+_indexer: Optional[VectorStore] = None
+_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+_last_snapshot = time.monotonic()
+
+
+def get_indexer() -> VectorStore:
+    """
+    Returns the process-wide vector store, reopening the persisted snapshot
+    (or connecting to Qdrant) on first use.
+
+    Raises:
+        ValueError: If ``VECTOR_STORE`` is unknown.
+    """
+    global _indexer
+    with _lock:
+        if _indexer is None:
+            if VECTOR_STORE == "qdrant":
+                _indexer = _open_qdrant()
+            elif VECTOR_STORE != "faiss":
+                raise ValueError(f"Unknown VECTOR_STORE: {VECTOR_STORE}")
+            elif FAISS_SHARDS > 1:
+                _indexer = ShardedIndexer.open(
+                    INDEX_DIR, dim=EMBED_DIM, num_shards=FAISS_SHARDS
+                )
+            else:
+                _indexer = FAISSIndexer.open(INDEX_DIR, dim=EMBED_DIM)
+        return _indexer
+
+
+def persist_indexer(force: bool = False) -> Optional[int]:
+    """
+    Snapshots the process-wide indexer to ``INDEX_DIR`` if one is due.
+
+    Every change is already in the write-ahead log, so a snapshot is only
+    taken once the log exceeds ``FAISS_SNAPSHOT_WAL_MB`` or is older than
+    ``FAISS_SNAPSHOT_INTERVAL`` seconds.
+
+    Args:
+        force (bool): Snapshot whenever anything was logged, e.g. at shutdown.
+
+    Returns:
+        Optional[int]: The snapshot generation that was written (for a
+        sharded index, the number of shards written), or None if no snapshot
+        was due.
+    """
+    global _last_snapshot
+    indexer = get_indexer()
+    with _snapshot_lock:
+        logged = indexer.wal_bytes
+        due = (
+            force
+            or logged >= SNAPSHOT_WAL_MB * 1024 * 1024
+            or time.monotonic() - _last_snapshot >= SNAPSHOT_INTERVAL
+        )
+        if not logged or not due:
+            return None
+        written = indexer.save(INDEX_DIR)
+        if written:
+            _last_snapshot = time.monotonic()
+        return written
+
+
+def _open_qdrant() -> VectorStore:
+    # Imported here so the FAISS deployment doesn't load the Qdrant client
+    from qdrant_client import QdrantClient
+
+    from .qdrant_store import QdrantStore
+
+    client = QdrantClient(
+        url=os.environ["QDRANT_URL"], api_key=os.getenv("QDRANT_API_KEY"), timeout=60
+    )
+    return QdrantStore(client, dim=EMBED_DIM)
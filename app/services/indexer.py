@@ -1,32 +1,129 @@
-from typing import Any, Dict, List, Tuple
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import faiss
 import numpy as np
 
+from . import index_factory
+from .document_index import DOC_INDEX_MAX_DOCUMENTS, DocumentIndexes
+from .lexical_index import LexicalIndex, TermCounts
+from .metadata_store import MetadataStore
+from .rw_lock import ReadWriteLock
+from .vector_store import VectorStore
+from .write_ahead_log import (
+    ADD,
+    RELABEL,
+    REMOVE,
+    Record,
+    WriteAheadLog,
+    wal_generations,
+    wal_path,
+)
 
-class FAISSIndexer:
+CURRENT_FILE = "CURRENT"
+# Compact once this fraction of the indexed vectors are tombstones
+COMPACT_TOMBSTONE_FRACTION = float(os.getenv("FAISS_COMPACT_TOMBSTONE_FRACTION", "0.2"))
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Writes ``data`` to ``path`` via a temporary file and an atomic rename,
+    so readers never observe a half-written file.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _renumber_ivf(ivf: faiss.IndexIVF, removed: np.ndarray) -> None:
+    # IVF removal keeps the other vectors' ids; shift each down by the number
+    # of removed ids below it, as a flat index would.
+    invlists = faiss.downcast_InvertedLists(ivf.invlists)
+    for list_no in range(invlists.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+            ids -= np.searchsorted(removed, ids)
+
+
+class FAISSIndexer(VectorStore):
     """
     indexes embeddings using FAISS for similarity search.
     """
 
-    def __init__(self, dim: int = 1536):
+    def __init__(
+        self,
+        dim: int = 1536,
+        storage: str = index_factory.VECTOR_STORAGE,
+        compact_fraction: float = COMPACT_TOMBSTONE_FRACTION,
+    ):
         """
         Args:
             dim (int): Dimensionality of the embedding vectors.
+            storage (str): How vectors are stored: ``float32``, or ``fp16`` /
+                ``sq8`` to quantise them to 2 or 1 bytes per dimension. An sq8
+                index stores float32 vectors until it holds
+                ``QUANTIZER_TRAIN_MIN_VECTORS``, then is trained on all of them.
+            compact_fraction (float): Fraction of tombstoned vectors at which
+                a background compaction starts.
+
+        Raises:
+            ValueError: If the storage mode is unknown.
         """
 
-        self.index = faiss.IndexFlatL2(dim)
-        self.metadata_store: List[Dict[str, Any]] = []
+        self.dim = dim
+        self.storage = storage
+        self.index = index_factory.new_index(dim, storage)
+        self.metadata_store = MetadataStore()
+        # Keyword index over the chunk texts given to add_embeddings
+        self.lexical = LexicalIndex()
+        # Exact sub-indexes of recently used documents, for scoped searches
+        self.doc_indexes = DocumentIndexes(dim)
+        self.compact_fraction = compact_fraction
+        # Searches share the lock, so they run concurrently; changes take it
+        # exclusively
+        self._lock = ReadWriteLock()
+        self._live_selector: Optional[faiss.IDSelector] = None
+        self._compaction: Optional[threading.Thread] = None
+        self._compact_lock = threading.Lock()
+        # Serialises saves, which number their files from what is on disk
+        self._save_lock = threading.Lock()
+        self._wal: Optional[WriteAheadLog] = None
+        self._wal_dir: Optional[Path] = None
 
     def add_embeddings(
-        self, embeddings: List[List[float]], metadata: List[Dict[str, Any]]
+        self,
+        embeddings: Union[List[List[float]], np.ndarray],
+        metadata: List[Dict[str, Any]],
+        texts: Optional[Sequence[Optional[Union[str, TermCounts]]]] = None,
     ) -> Tuple[int, int]:
         """
         Adds embeddings and metadata to the FAISS index.
 
         Args:
-            embeddings (List[List[float]]): Embedding vectors.
+            embeddings (Union[List[List[float]], np.ndarray]): Embedding vectors.
             metadata (List[Dict[str, Any]]): Metadata corresponding to each vector.
+            texts (Sequence, optional): Each chunk's text (or its term
+                counts, see :meth:`live_batches`). Texts are stored with the
+                metadata, so hits carry them, and go into the keyword index
+                behind :meth:`search_text`; None leaves a chunk out of both.
 
         Returns:
             Tuple[int, int]: Number of vectors and metadata entries added.
@@ -34,12 +131,782 @@ class FAISSIndexer:
         Raises:
             ValueError: If lengths don't match or inputs are empty.
         """
-        if not embeddings or not metadata:
+        if len(embeddings) == 0 or not metadata:
             raise ValueError("Vectors and metadata must not be empty.")
         if len(embeddings) != len(metadata):
             raise ValueError("Vectors and metadata must be of same length.")
+        if texts is not None and len(texts) != len(metadata):
+            raise ValueError("Texts and metadata must be of same length.")
 
-        vectors = np.array(embeddings).astype("float32")
-        self.index.add(vectors)
-        self.metadata_store.extend(metadata)
+        # A C-contiguous float32 array (as TextEmbedder.embed_array returns)
+        # is passed to FAISS and written to the log as-is, without copies
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock.write():
+            header = {"metadata": metadata, "texts": texts}
+            self._log(ADD, header, vectors.data)
+            self.index.add(vectors)
+            if index_factory.ready_to_quantize(self.index, self.storage):
+                spec = index_factory.index_spec(
+                    index_factory.FLAT, self.dim, self.index.ntotal, self.storage
+                )
+                self.index = index_factory.build_index(spec, self._vectors())
+            ids = self.metadata_store.extend(metadata, texts)
+            if texts is not None:
+                self.lexical.add(ids, texts)
+            self._extend_doc_indexes(vectors, metadata, ids)
+            self._live_selector = None
         return len(embeddings), len(metadata)
+
+    @property
+    def index_type(self) -> str:
+        """
+        Kind of FAISS index in use: ``flat``, ``ivf_flat``, ``ivf_pq`` or ``hnsw``.
+        """
+        return index_factory.index_type_of(self.index)
+
+    @property
+    def vector_storage(self) -> str:
+        """
+        How the index stores vectors: ``float32``, ``fp16``, ``sq8`` or ``pq``.
+        """
+        return index_factory.vector_storage_of(self.index)
+
+    def search(
+        self,
+        queries: Union[List[List[float]], np.ndarray],
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Finds the ``k`` nearest chunks to each query, in one FAISS call.
+
+        Args:
+            queries (Union[List[List[float]], np.ndarray]): Query vectors, one
+                per row (a single vector is treated as one query).
+            k (int): Number of hits per query.
+            filter (Iterable[str], optional): Only return chunks of these
+                filenames; each query still gets up to ``k`` hits. Up to
+                ``DOC_INDEX_MAX_DOCUMENTS`` documents are searched exactly
+                in their own sub-indexes, so the cost depends on their size
+                rather than the corpus's; larger filters are applied inside
+                FAISS.
+            nprobe (int, optional): IVF lists to visit for these queries;
+                ignored by other index types and scoped searches.
+            ef_search (int, optional): HNSW candidate list size for these
+                queries; ignored by other index types and scoped searches.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, its hits nearest
+            first, each with the chunk's stable ``id``, its current
+            ``position``, ``score`` (squared L2 distance, lower is closer),
+            the chunk's ``metadata`` and its ``text`` (None if it was added
+            without one).
+        """
+        vectors, filter = self._prepare_search(queries, filter)
+        with self._lock.read():
+            distances, positions = self._search_vectors(
+                vectors, k, filter, nprobe, ef_search
+            )
+            found = positions >= 0
+            metadata = iter(self.metadata_store.gather(positions[found]))
+            texts = iter(self.metadata_store.texts(positions[found]))
+            ids = iter(self.metadata_store.ids(positions[found]).tolist())
+
+        hits: List[List[Dict[str, Any]]] = []
+        for row_distances, row_positions, row_found in zip(
+            distances.tolist(), positions.tolist(), found.tolist()
+        ):
+            hits.append(
+                [
+                    {
+                        "id": next(ids),
+                        "position": p,
+                        "score": d,
+                        "metadata": next(metadata),
+                        "text": next(texts),
+                    }
+                    for d, p, ok in zip(row_distances, row_positions, row_found)
+                    if ok
+                ]
+            )
+        return hits
+
+    def search_text(
+        self, query: str, k: int = 5, filter: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds the ``k`` chunks that best match ``query``'s words by BM25,
+        e.g. exact part numbers or error codes that embeddings blur. Only
+        chunks added with their text are found.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of hits.
+            filter (Iterable[str], optional): Only return chunks of these
+                filenames.
+
+        Returns:
+            List[Dict[str, Any]]: Hits best first, each with the chunk's
+            stable ``id``, current ``position``, ``score`` (BM25, higher is
+            better), ``metadata`` and ``text``.
+        """
+        with self._lock.read():
+            allowed = None
+            if filter is not None:
+                positions = self.metadata_store.positions(*filter)
+                allowed = self.metadata_store.ids(positions)
+            ids, scores = self.lexical.search(query, k, allowed)
+            positions = self.metadata_store.lookup(ids)
+            metadata = self.metadata_store.gather(positions)
+            texts = self.metadata_store.texts(positions)
+        return [
+            {"id": i, "position": p, "score": score, "metadata": m, "text": text}
+            for i, p, score, m, text in zip(
+                ids.tolist(), positions.tolist(), scores.tolist(), metadata, texts
+            )
+        ]
+
+    def search_vectors(
+        self,
+        queries: Union[List[List[float]], np.ndarray],
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Like :meth:`search`, but returns the raw FAISS result. Tombstoned
+        vectors are never returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Squared L2 distances and vector
+            positions, each of shape ``(len(queries), k)``; missing
+            neighbours have position -1.
+        """
+        vectors, filter = self._prepare_search(queries, filter)
+        with self._lock.read():
+            return self._search_vectors(vectors, k, filter, nprobe, ef_search)
+
+    def _prepare_search(
+        self,
+        queries: Union[List[List[float]], np.ndarray],
+        filter: Optional[Iterable[str]],
+    ) -> Tuple[np.ndarray, Optional[List[str]]]:
+        # Query matrix and filenames of a search; builds the sub-indexes a
+        # scoped search will use, so the search itself only needs to read
+        vectors = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.dim)
+        if filter is None:
+            return vectors, None
+        filenames = list(dict.fromkeys(filter))
+        if len(filenames) <= DOC_INDEX_MAX_DOCUMENTS:
+            with self._lock.read():
+                resident = self._resident_documents(filenames) is not None
+            if not resident:
+                with self._lock.write():
+                    self._load_doc_indexes(filenames)
+        return vectors, filenames
+
+    def _search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[List[str]],
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Called with the lock held, for reading at least
+        scoped = None if filter is None else self._resident_documents(filter)
+        if scoped is not None:
+            distances, ids = self.doc_indexes.search(scoped, vectors, k)
+            return distances, self.metadata_store.lookup(ids)
+
+        selector = None
+        if filter is not None:
+            allowed = self.metadata_store.positions(*filter)
+            selector = faiss.IDSelectorBatch(allowed)
+        elif self.metadata_store.tombstones:
+            selector = self._live_positions()
+        params = index_factory.search_params(self.index, nprobe, ef_search, selector)
+        distances, positions = self.index.search(vectors, k, params=params)
+        return distances, positions
+
+    def rebuild(
+        self,
+        index_type: str = index_factory.AUTO,
+        train_size: Optional[int] = None,
+        storage: str = index_factory.VECTOR_STORAGE,
+    ) -> str:
+        """
+        Rebuilds the vectors into a new kind of index, e.g. to move a corpus
+        that has outgrown exact search from the flat index to IVF. Vector
+        positions and metadata are unchanged.
+
+        Args:
+            index_type (str): ``auto`` (chosen from the vector count), ``flat``,
+                ``ivf_flat``, ``ivf_pq``, ``hnsw`` or a ``faiss.index_factory``
+                string.
+            train_size (int, optional): Training sample size for IVF indexes.
+            storage (str): ``float32``, ``fp16`` or ``sq8``; how the new index
+                stores vectors (IVF-PQ always stores PQ codes).
+
+        Returns:
+            str: The factory string of the new index.
+
+        Raises:
+            ValueError: If there are too few vectors to train the index, or
+                the storage mode is unknown.
+        """
+        with self._lock.write():
+            spec = index_factory.index_spec(
+                index_type, self.dim, self.index.ntotal, storage
+            )
+            vectors = self._vectors()
+            self.index = index_factory.build_index(spec, vectors, train_size)
+            self.storage = storage
+        return spec
+
+    def has_document(self, filename: str) -> bool:
+        """
+        Whether any vectors for ``filename`` are already indexed.
+        """
+        with self._lock.read():
+            return self.metadata_store.has_document(filename)
+
+    def document_fingerprints(self, filename: str) -> Counter[str]:
+        """
+        Counts the chunk fingerprints indexed for ``filename``; chunks indexed
+        without a fingerprint are not counted.
+        """
+        with self._lock.read():
+            positions = self.metadata_store.positions(filename)
+            fingerprints = self.metadata_store.fingerprints(positions)
+        return Counter(fp for fp in fingerprints if fp is not None)
+
+    def remove_document(self, filename: str) -> int:
+        """
+        Deletes every vector indexed for ``filename``. The vectors are
+        tombstoned, so they drop out of searches at once; their memory is
+        reclaimed by the next :meth:`compact`.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        with self._lock.write():
+            positions = self.metadata_store.positions(filename)
+            self._remove_positions(positions)
+        return len(positions)
+
+    def remove_ids(self, ids: Union[List[int], np.ndarray]) -> int:
+        """
+        Deletes the vectors with the given stable ids, like
+        :meth:`remove_document`. Unknown or already deleted ids are ignored.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        with self._lock.write():
+            positions = self.metadata_store.lookup(ids)
+            positions = positions[positions >= 0]
+            self._remove_positions(positions)
+        return len(positions)
+
+    def live_batches(
+        self, batch_size: int = index_factory.ADD_BATCH_SIZE
+    ) -> Iterator[
+        Tuple[np.ndarray, List[Dict[str, Any]], List[Optional[Union[str, TermCounts]]]]
+    ]:
+        """
+        Yields the vectors that aren't deleted, with their metadata and texts
+        (to pass to :meth:`add_embeddings`), in batches, e.g. to copy them
+        into other indexes. Chunks whose text isn't stored yield their
+        keyword index term counts instead. Meant for offline use: the index
+        must not change while the batches are consumed.
+        """
+        with self._lock.write():
+            live = np.flatnonzero(self.metadata_store.live_mask())
+            ids = self.metadata_store.ids(live)
+            # One pass over the postings for all chunks
+            terms = self.lexical.term_counts(ids) if len(self.lexical) else None
+        for start in range(0, len(live), batch_size):
+            positions = live[start : start + batch_size].tolist()
+            with self._lock.write():
+                vectors = self._vectors_at(positions)
+                metadata = self.metadata_store.gather(positions)
+                stored = self.metadata_store.texts(positions)
+            batch_texts: List[Optional[Union[str, TermCounts]]] = []
+            for i, text in enumerate(stored, start=start):
+                batch_texts.append(
+                    text if text is not None or terms is None else terms[i]
+                )
+            yield vectors, metadata, batch_texts
+
+    @property
+    def tombstone_fraction(self) -> float:
+        """
+        Fraction of the indexed vectors that are deleted but not yet compacted.
+        """
+        with self._lock.read():
+            total = len(self.metadata_store)
+            return self.metadata_store.tombstones / total if total else 0.0
+
+    def compact(self) -> int:
+        """
+        Physically removes tombstoned vectors from the index and metadata.
+        Positions of the remaining vectors change; their ids do not.
+
+        The survivors are compacted in a copy of the index while searches
+        and changes go on; the copy is swapped in under the lock, after
+        taking in the vectors added meanwhile.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        with self._compact_lock:
+            with self._lock.read():
+                dead = self.metadata_store.tombstoned()
+                if not len(dead):
+                    return 0
+                source = self.index
+                copied = source.ntotal
+                index = faiss.clone_index(source)
+            self._drop_positions(index, dead)
+
+            with self._lock.write():
+                if self.index is not source:
+                    # Rebuilt meanwhile (e.g. quantised): compact the new one
+                    index = self.index
+                    self._drop_positions(index, dead)
+                elif self.index.ntotal > copied:
+                    added = list(range(copied, self.index.ntotal))
+                    index.add(self._vectors_at(added))
+                self.index = index
+                self.metadata_store.delete(dead)
+                if len(self.lexical):
+                    self.lexical.compact()
+                self._live_selector = None
+        return len(dead)
+
+    def wait_for_compaction(self, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until a running background compaction has finished.
+        """
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join(timeout)
+
+    def replace_document(
+        self,
+        previous: str,
+        filename: str,
+        carried: List[Dict[str, Any]],
+        texts: Optional[Sequence[str]] = None,
+    ) -> int:
+        """
+        Retires ``previous`` in favour of its new version ``filename``.
+
+        Vectors of ``previous`` whose fingerprint matches an entry of
+        ``carried`` are kept and relabelled with that entry, so unchanged
+        chunks move to the new version without being embedded again; the
+        remaining vectors of ``previous`` are removed. Both steps happen under
+        one lock, so searches see either the old version or the new one.
+
+        Args:
+            previous (str): Filename of the version being replaced.
+            filename (str): Filename of the new version.
+            carried (List[Dict[str, Any]]): Metadata of the new version's chunks
+                that reuse a vector of ``previous``; each needs a ``fingerprint``.
+            texts (Sequence[str], optional): Text of each carried chunk. Not
+                needed here: reused vectors keep their ids, and with them
+                their stored texts and keyword index entries.
+
+        Returns:
+            int: Number of stale vectors removed.
+
+        Raises:
+            ValueError: If a carried fingerprint is no longer indexed for
+                ``previous``; nothing is changed in that case.
+        """
+        with self._lock.write():
+            reused, stale = self._match_carried(previous, carried)
+            entries = [{**entry, "filename": filename} for entry in carried]
+            self.doc_indexes.discard(previous, filename)
+            if reused:
+                ids = self.metadata_store.ids(reused).tolist()
+                self._log(RELABEL, {"ids": ids, "metadata": entries})
+            for position, entry in zip(reused, entries):
+                self.metadata_store.set(position, entry)
+            self._remove_positions(stale)
+        return len(stale)
+
+    def carried_vectors(
+        self, previous: str, carried: List[Dict[str, Any]]
+    ) -> np.ndarray:
+        """
+        The vectors of ``previous`` that the ``carried`` entries reuse, in
+        order, for moving them to another index.
+
+        Raises:
+            ValueError: If a carried fingerprint is no longer indexed for
+                ``previous``.
+        """
+        with self._lock.write():
+            reused, _ = self._match_carried(previous, carried)
+            return self._vectors_at(reused)
+
+    def _match_carried(
+        self, previous: str, carried: List[Dict[str, Any]]
+    ) -> Tuple[List[int], List[int]]:
+        # The position each carried entry reuses, and the unused positions
+        available: Dict[str, List[int]] = {}
+        positions = self.metadata_store.positions(previous)
+        fingerprints = self.metadata_store.fingerprints(positions)
+        for i, fingerprint in zip(positions.tolist(), fingerprints):
+            available.setdefault(fingerprint or "", []).append(i)
+
+        reused = []
+        for entry in carried:
+            matches = available.get(entry["fingerprint"])
+            if not matches:
+                raise ValueError(
+                    f"Chunk {entry['fingerprint']} is no longer indexed for {previous}."
+                )
+            reused.append(matches.pop())
+        stale = sorted(i for matches in available.values() for i in matches)
+        return reused, stale
+
+    def _remove_positions(self, positions: Union[List[int], np.ndarray]) -> None:
+        # Tombstone now and compact in the background once enough pile up
+        if not len(positions):
+            return
+        ids = self.metadata_store.ids(positions)
+        self._log(REMOVE, ids.tolist())
+        self.doc_indexes.discard(*self.metadata_store.filenames(positions))
+        self.metadata_store.tombstone(positions)
+        self.lexical.remove(ids)
+        self._live_selector = None
+        if self.tombstone_fraction >= self.compact_fraction and (
+            self._compaction is None or not self._compaction.is_alive()
+        ):
+            self._compaction = threading.Thread(
+                target=self.compact, name="index-compact", daemon=True
+            )
+            self._compaction.start()
+
+    def _extend_doc_indexes(
+        self, vectors: np.ndarray, metadata: List[Dict[str, Any]], ids: np.ndarray
+    ) -> None:
+        # New documents get a sub-index as their chunks stream in; resident
+        # ones are kept current. Others are built on their next scoped search.
+        rows: Dict[str, List[int]] = {}
+        for i, entry in enumerate(metadata):
+            filename = entry.get("filename")
+            if isinstance(filename, str):
+                rows.setdefault(filename, []).append(i)
+        for filename, group in rows.items():
+            if filename in self.doc_indexes or self.metadata_store.document_size(
+                filename
+            ) == len(group):
+                self.doc_indexes.add(filename, vectors[group], ids[group])
+
+    def _load_doc_indexes(self, filenames: List[str]) -> None:
+        # Builds the missing sub-indexes of the indexed documents among
+        # `filenames`, if they fit in the budget
+        present = [f for f in filenames if self.metadata_store.has_document(f)]
+        missing = [f for f in present if f not in self.doc_indexes]
+        sizes = [self.metadata_store.document_size(f) for f in missing]
+        if not self.doc_indexes.fits(sum(sizes)):
+            return
+        for filename in missing:
+            positions = self.metadata_store.positions(filename)
+            self.doc_indexes.add(
+                filename,
+                self._vectors_at(positions.tolist()),
+                self.metadata_store.ids(positions),
+            )
+
+    def _resident_documents(self, filenames: List[str]) -> Optional[List[str]]:
+        # The indexed documents among `filenames`, if each has a resident
+        # sub-index; None if the search should go to the main index instead
+        # (too many documents, or together they don't fit in the budget)
+        if len(filenames) > DOC_INDEX_MAX_DOCUMENTS:
+            return None
+        present = [f for f in filenames if self.metadata_store.has_document(f)]
+        if not all(f in self.doc_indexes for f in present):
+            return None
+        return present
+
+    def _live_positions(self) -> faiss.IDSelector:
+        # Bitmap of untombstoned positions, rebuilt after each change.
+        # Concurrent searches may each build it; they build the same bitmap.
+        selector = self._live_selector
+        if selector is None:
+            live = self.metadata_store.live_mask()
+            bitmap = np.packbits(live, bitorder="little")
+            selector = faiss.IDSelectorBitmap(bitmap)
+            self._live_selector = selector
+        return selector
+
+    def _drop_positions(
+        self, index: faiss.Index, positions: Union[List[int], np.ndarray]
+    ) -> None:
+        # FAISS ids are positions in the metadata store: after removal the
+        # remaining vectors must be renumbered in order, as the metadata is.
+        if not len(positions):
+            return
+        removed = np.unique(np.asarray(positions, dtype="int64"))
+        ivf = faiss.try_extract_index_ivf(index)
+        if isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes):
+            # Flat and scalar-quantised flat indexes close the gaps themselves
+            index.remove_ids(removed)
+        elif ivf is not None:
+            index.remove_ids(removed)
+            _renumber_ivf(ivf, removed)
+        else:
+            # HNSW can't remove from its graph, so the survivors are re-added
+            keep = np.ones(index.ntotal, dtype=bool)
+            keep[removed] = False
+            vectors = self._vectors(index)[keep]
+            index.reset()
+            for start in range(0, len(vectors), index_factory.ADD_BATCH_SIZE):
+                index.add(vectors[start : start + index_factory.ADD_BATCH_SIZE])
+
+    def _vectors_at(self, positions: List[int]) -> np.ndarray:
+        if not positions:
+            return np.empty((0, self.dim), dtype="float32")
+        flat = faiss.downcast_index(self.index)
+        if isinstance(flat, faiss.IndexFlat):
+            return self._vectors()[positions]
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.make_direct_map(True)
+        try:
+            keys = np.asarray(positions, dtype="int64")
+            vectors: np.ndarray = self.index.reconstruct_batch(keys)
+            return vectors
+        finally:
+            if ivf is not None:
+                ivf.make_direct_map(False)
+
+    def _vectors(self, index: Optional[faiss.Index] = None) -> np.ndarray:
+        # All vectors of `index` (by default the live one) in position order;
+        # a view, not a copy, for flat indexes
+        if index is None:
+            index = self.index
+        n = index.ntotal
+        flat = faiss.downcast_index(index)
+        if isinstance(flat, faiss.IndexFlat):
+            data = faiss.rev_swig_ptr(flat.get_xb(), n * self.dim)
+            return np.asarray(data).reshape(n, self.dim)
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map(True)
+        try:
+            vectors: np.ndarray = index.reconstruct_n(0, n)
+            return vectors
+        finally:
+            if ivf is not None:
+                ivf.make_direct_map(False)
+
+    @property
+    def wal_bytes(self) -> int:
+        """
+        Size of the write-ahead log since the last snapshot; 0 if changes
+        aren't being logged.
+        """
+        with self._lock.read():
+            return self._wal.size if self._wal is not None else 0
+
+    def save(self, directory: Union[str, Path]) -> int:
+        """
+        Persists the index and its metadata as a new snapshot generation.
+
+        Each snapshot is written to generation-numbered files; the ``CURRENT``
+        pointer is swapped atomically only once both files are on disk, so a
+        crash mid-save leaves the previous snapshot intact. If changes are
+        logged to ``directory`` (see :meth:`open`), later changes go to a new
+        log that starts at this snapshot, and older logs are deleted once the
+        snapshot is current. Concurrent saves run one at a time.
+
+        Args:
+            directory (Union[str, Path]): Directory holding the snapshots.
+
+        Returns:
+            int: The generation number that was written.
+        """
+        with self._save_lock:
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            previous = self._current_generation(directory)
+            # Past any log left by a save that crashed before swapping CURRENT
+            generation = max([previous or 0, *wal_generations(directory)]) + 1
+
+            with self._lock.write():
+                index_bytes = faiss.serialize_index(self.index).tobytes()
+                metadata_bytes = self.metadata_store.to_bytes()
+                lexical_bytes = self.lexical.to_bytes() if len(self.lexical) else None
+                if self._wal is not None and self._wal_dir == directory.resolve():
+                    self._wal.close()
+                    self._wal = WriteAheadLog(wal_path(directory, generation))
+
+            _atomic_write_bytes(directory / f"index-{generation}.faiss", index_bytes)
+            _atomic_write_bytes(
+                directory / f"metadata-{generation}.npz", metadata_bytes
+            )
+            if lexical_bytes is not None:
+                _atomic_write_bytes(
+                    directory / f"lexical-{generation}.npz", lexical_bytes
+                )
+            _atomic_write_bytes(directory / CURRENT_FILE, str(generation).encode())
+
+            if previous is not None:
+                # Readers that memory-mapped the old files keep their inode alive.
+                for stale in (
+                    directory / f"index-{previous}.faiss",
+                    directory / f"metadata-{previous}.npz",
+                    directory / f"metadata-{previous}.json",
+                    directory / f"lexical-{previous}.npz",
+                ):
+                    stale.unlink(missing_ok=True)
+            for older in wal_generations(directory):
+                if older < generation:
+                    wal_path(directory, older).unlink(missing_ok=True)
+            return generation
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "FAISSIndexer":
+        """
+        Reopens the latest snapshot written by :meth:`save` and replays the
+        changes logged since it was taken.
+
+        Args:
+            directory (Union[str, Path]): Directory holding the snapshots.
+            mmap (bool): Memory-map the vectors instead of reading them into RAM,
+                so large indexes open without being rebuilt or copied.
+
+        Returns:
+            FAISSIndexer: Indexer holding the persisted vectors and metadata.
+
+        Raises:
+            FileNotFoundError: If no snapshot exists in ``directory``.
+            ValueError: If the snapshot's vectors and metadata disagree.
+        """
+        directory = Path(directory)
+        generation = cls._current_generation(directory)
+        if generation is None:
+            raise FileNotFoundError(f"No index snapshot in: {directory}")
+
+        index_path = str(directory / f"index-{generation}.faiss")
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+        if mmap and index_factory.index_type_of(index) != index_factory.FLAT:
+            # Memory-mapped IVF lists are read-only, so reopen it into RAM
+            index = faiss.read_index(index_path)
+        metadata = cls._read_metadata(directory, generation)
+        if index.ntotal != len(metadata):
+            raise ValueError("Snapshot vectors and metadata must be of same length.")
+
+        indexer = cls(dim=index.d)
+        indexer.index = index
+        indexer.metadata_store = metadata
+        lexical_path = directory / f"lexical-{generation}.npz"
+        if lexical_path.exists():
+            indexer.lexical = LexicalIndex.from_bytes(lexical_path.read_bytes())
+        indexer._replay(directory, generation)
+        return indexer
+
+    @classmethod
+    def open(
+        cls,
+        directory: Union[str, Path],
+        dim: int = 1536,
+        mmap: bool = True,
+        wal: bool = True,
+    ) -> "FAISSIndexer":
+        """
+        Loads the snapshot in ``directory`` or starts an empty index if none exists.
+
+        Args:
+            directory (Union[str, Path]): Directory holding the snapshots.
+            dim (int): Expected dimensionality of the embedding vectors.
+            mmap (bool): Memory-map the vectors; see :meth:`load`.
+            wal (bool): Log every later change to a write-ahead log in
+                ``directory`` before applying it, so changes made since the
+                last :meth:`save` are recovered by the next :meth:`open`.
+                Recovery only replays the log, so its time is bounded by how
+                often snapshots are taken, not by the corpus size.
+
+        Raises:
+            ValueError: If the persisted index has a different dimensionality.
+        """
+        directory = Path(directory)
+        generation = cls._current_generation(directory)
+        if generation is None:
+            indexer = cls(dim=dim)
+            indexer._replay(directory, 0)
+        else:
+            indexer = cls.load(directory, mmap=mmap)
+            if indexer.dim != dim:
+                raise ValueError(
+                    f"Persisted index has dim={indexer.dim}, expected {dim}."
+                )
+        if wal:
+            # Keep appending to the newest log; it starts at the last snapshot
+            latest = max([generation or 0, *wal_generations(directory)])
+            indexer._wal = WriteAheadLog(wal_path(directory, latest))
+            indexer._wal_dir = directory.resolve()
+        return indexer
+
+    def _log(
+        self, kind: int, header: Any, payload: Union[bytes, memoryview] = b""
+    ) -> None:
+        # Called under the lock before a change is applied
+        if self._wal is not None:
+            self._wal.append(kind, header, payload)
+
+    def _replay(self, directory: Path, since: int) -> None:
+        # Re-applies the changes logged after snapshot `since`, oldest first
+        for generation in wal_generations(directory):
+            if generation >= since:
+                for record in WriteAheadLog.replay(wal_path(directory, generation)):
+                    self._apply(record)
+
+    def _apply(self, record: Record) -> None:
+        kind, header, payload = record
+        if kind == ADD:
+            vectors = np.frombuffer(payload, dtype=np.float32).reshape(-1, self.dim)
+            if isinstance(header, list):
+                # Logged before texts were recorded
+                header = {"metadata": header, "texts": None}
+            self.add_embeddings(vectors, header["metadata"], header["texts"])
+        elif kind == REMOVE:
+            self.remove_ids(header)
+        elif kind == RELABEL:
+            with self._lock.write():
+                positions = self.metadata_store.lookup(header["ids"]).tolist()
+                found = [p for p in positions if p >= 0]
+                self.doc_indexes.discard(
+                    *self.metadata_store.filenames(found),
+                    *(entry.get("filename") for entry in header["metadata"]),
+                )
+                for position, entry in zip(positions, header["metadata"]):
+                    if position >= 0:
+                        self.metadata_store.set(position, entry)
+        else:
+            raise ValueError(f"Unknown write-ahead log record kind: {kind}")
+
+    @staticmethod
+    def _read_metadata(directory: Path, generation: int) -> MetadataStore:
+        path = directory / f"metadata-{generation}.npz"
+        if path.exists():
+            return MetadataStore.from_bytes(path.read_bytes())
+        # Snapshots written before the columnar store kept a JSON list
+        with open(directory / f"metadata-{generation}.json", "rb") as f:
+            return MetadataStore.from_dicts(json.load(f))
+
+    @staticmethod
+    def _current_generation(directory: Path) -> Optional[int]:
+        try:
+            return int((directory / CURRENT_FILE).read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return None
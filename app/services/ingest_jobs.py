@@ -0,0 +1,336 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFullError(RuntimeError):
+    """
+    Raised when more ingestion jobs are pending than the manager accepts.
+    """
+
+
+class IngestProgress:
+    """
+    Thread-safe progress counters for a single ingestion job.
+    """
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        self.pages_extracted = 0
+        self.chunks_embedded = 0
+        self.vectors_indexed = 0
+        self._on_change = on_change
+        self._lock = threading.Lock()
+
+    def add(self, pages: int = 0, chunks: int = 0, vectors: int = 0) -> None:
+        """
+        Increments the counters and notifies the owning job.
+
+        Args:
+            pages (int): Pages extracted since the last call.
+            chunks (int): Chunks embedded since the last call.
+            vectors (int): Vectors indexed since the last call.
+        """
+        with self._lock:
+            self.pages_extracted += pages
+            self.chunks_embedded += chunks
+            self.vectors_indexed += vectors
+        if self._on_change:
+            self._on_change()
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pages_extracted": self.pages_extracted,
+                "chunks_embedded": self.chunks_embedded,
+                "vectors_indexed": self.vectors_indexed,
+            }
+
+
+IngestRunner = Callable[[str, IngestProgress], Dict[str, Any]]
+
+
+class FileLocks:
+    """
+    Per-filename locks, so two jobs never ingest the same file at once even
+    when both were queued before either indexed it (e.g. a retried upload
+    and an explicit ingest request).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Lock of each filename and how many holders use or await it
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+
+    @contextmanager
+    def hold(self, filenames: Iterable[str]) -> Iterator[None]:
+        """
+        Holds the locks of ``filenames``, waiting for other holders.
+        """
+        # One global order, so holders of overlapping sets can't deadlock
+        names = sorted(set(filenames))
+        with self._lock:
+            locks = []
+            for name in names:
+                lock, users = self._locks.get(name, (threading.Lock(), 0))
+                self._locks[name] = (lock, users + 1)
+                locks.append(lock)
+        acquired: List[threading.Lock] = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            with self._lock:
+                for name in names:
+                    lock, users = self._locks[name]
+                    if users == 1:
+                        del self._locks[name]
+                    else:
+                        self._locks[name] = (lock, users - 1)
+
+
+class IngestJob:
+    """
+    State of one queued, running or finished ingestion job.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        on_change: Callable[[], None],
+        group: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            filename (str): File the job ingests, or a label for a group.
+            on_change (Callable[[], None]): Called when progress is made.
+            group (List[str], optional): Files of a batch job; None for a
+                job ingesting ``filename`` alone.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.group = group
+        self.status = QUEUED
+        self.progress = IngestProgress(on_change=on_change)
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": self.progress.to_dict(),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestBatch:
+    """
+    Jobs queued together by one batch request, each covering a group of files.
+    """
+
+    def __init__(self, jobs: List[IngestJob], total_files: int):
+        self.batch_id = uuid.uuid4().hex
+        self.jobs = jobs
+        self.total_files = total_files
+        self.created_at = datetime.now(timezone.utc)
+
+    @property
+    def status(self) -> str:
+        statuses = {job.status for job in self.jobs}
+        if statuses == {QUEUED}:
+            return QUEUED
+        if statuses & {QUEUED, RUNNING}:
+            return RUNNING
+        # A batch is done once every job has finished, even if some files failed
+        return FAILED if statuses == {FAILED} else DONE
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "total_files": self.total_files,
+            "jobs": [job.to_dict() for job in self.jobs],
+            "created_at": self.created_at,
+        }
+
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs on a bounded worker pool, off the event loop.
+
+    Jobs are tracked in memory; an optional ``on_update`` hook mirrors each
+    job's status and progress elsewhere (e.g. the file's Mongo record).
+    Progress notifications are throttled to ``update_interval`` seconds,
+    while status transitions are always delivered.
+    """
+
+    def __init__(
+        self,
+        runner: IngestRunner,
+        max_workers: int = 2,
+        max_pending: int = 100,
+        on_update: Optional[Callable[[IngestJob], None]] = None,
+        update_interval: float = 0.5,
+        max_history: int = 1000,
+    ):
+        """
+        Args:
+            runner (IngestRunner): Callable doing the work for one filename.
+            max_workers (int): Number of jobs executed concurrently.
+            max_pending (int): Maximum number of queued jobs before rejecting.
+            on_update (Callable[[IngestJob], None], optional): Status hook.
+            update_interval (float): Minimum seconds between progress updates.
+            max_history (int): Finished jobs kept in memory for status lookups.
+
+        Raises:
+            ValueError: If ``max_workers`` or ``max_pending`` is not positive.
+        """
+        if max_workers < 1 or max_pending < 1:
+            raise ValueError("max_workers and max_pending must be positive")
+        self.runner = runner
+        self.max_pending = max_pending
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.max_history = max_history
+        self.jobs: Dict[str, IngestJob] = {}
+        self.batches: Dict[str, IngestBatch] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._lock = threading.Lock()
+        self._last_update: Dict[str, float] = {}
+
+    def submit(self, filename: str, runner: Optional[IngestRunner] = None) -> IngestJob:
+        """
+        Queues ``filename`` for ingestion and returns immediately.
+
+        Args:
+            filename (str): File to ingest.
+            runner (IngestRunner, optional): Overrides the manager's runner for
+                this job, e.g. to ingest from an in-memory upload.
+
+        Raises:
+            JobQueueFullError: If ``max_pending`` jobs are already queued.
+        """
+        return self._submit_all([(filename, runner or self.runner, None)])[0]
+
+    def submit_batch(
+        self, groups: Sequence[Tuple[List[str], IngestRunner]]
+    ) -> IngestBatch:
+        """
+        Queues one job per group of files, all or none.
+
+        Args:
+            groups (Sequence[Tuple[List[str], IngestRunner]]): Each group's files
+                and the runner ingesting them together.
+
+        Raises:
+            JobQueueFullError: If the groups don't all fit in the queue.
+        """
+        # Each job is labelled after its group's first file
+        work: List[Tuple[str, IngestRunner, Optional[List[str]]]] = []
+        for files, runner in groups:
+            label = files[0] if len(files) == 1 else f"{files[0]} (+{len(files) - 1})"
+            work.append((label, runner, list(files)))
+        total_files = sum(len(files) for files, _ in groups)
+        batch = IngestBatch(self._submit_all(work), total_files)
+        with self._lock:
+            self.batches[batch.batch_id] = batch
+            for stale in list(self.batches)[: -self.max_history]:
+                del self.batches[stale]
+        return batch
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def get_batch(self, batch_id: str) -> Optional[IngestBatch]:
+        return self.batches.get(batch_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _submit_all(
+        self, work: List[Tuple[str, IngestRunner, Optional[List[str]]]]
+    ) -> List[IngestJob]:
+        with self._lock:
+            pending = sum(1 for j in self.jobs.values() if j.status == QUEUED)
+            if pending + len(work) > self.max_pending:
+                raise JobQueueFullError("Too many ingestion jobs queued")
+            self._prune_finished()
+            jobs = [self._new_job(filename, group) for filename, _, group in work]
+
+        for job, (_, runner, _) in zip(jobs, work):
+            self._notify(job, force=True)
+            self._executor.submit(self._run, job, runner)
+        return jobs
+
+    def _new_job(self, filename: str, group: Optional[List[str]] = None) -> IngestJob:
+        job = IngestJob(filename, on_change=lambda: self._notify(job), group=group)
+        self.jobs[job.job_id] = job
+        return job
+
+    def _prune_finished(self) -> None:
+        finished = [j for j in self.jobs.values() if j.status in (DONE, FAILED)]
+        # dicts keep insertion order, so the oldest jobs come first
+        for job in finished[: max(0, len(finished) - self.max_history)]:
+            del self.jobs[job.job_id]
+            self._last_update.pop(job.job_id, None)
+
+    def _run(self, job: IngestJob, runner: IngestRunner) -> None:
+        job.status = RUNNING
+        job.started_at = datetime.now(timezone.utc)
+        self._notify(job, force=True)
+        try:
+            job.result = runner(job.filename, job.progress)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._notify(job, force=True)
+
+    def _notify(self, job: IngestJob, force: bool = False) -> None:
+        if not self.on_update:
+            return
+        now = time.monotonic()
+        last = self._last_update.get(job.job_id)
+        if not force and last is not None and now - last < self.update_interval:
+            return
+        self._last_update[job.job_id] = now
+        try:
+            self.on_update(job)
+        except Exception as e:
+            # Status mirroring is best-effort; it must never fail the job itself.
+            print(f"[INGEST] Status update failed for {job.filename}: {e}")
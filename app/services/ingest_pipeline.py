@@ -0,0 +1,434 @@
+import queue
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .chunker import Chunker, chunk_fingerprint, estimate_tokens, make_chunker
+from .embedder import TextEmbedder
+from .ingest_jobs import IngestProgress
+from .pdf_loader import PDFLoader
+from .vector_store import VectorStore
+
+EMBED_BATCH_SIZE = 64  # chunks per embedding request
+EMBED_WORKERS = 2  # embedding requests in flight per document
+QUEUE_DEPTH = 4  # batches buffered between two stages
+
+# A batch of chunks to embed: (document of each chunk, metadata of each chunk,
+# texts). Chunks of several small documents may share one batch.
+ChunkBatch = Tuple[List["IngestSource"], List[Dict[str, Any]], List[str]]
+# The same batch after embedding: (documents, metadata, vectors, texts)
+VectorBatch = Tuple[List["IngestSource"], List[Dict[str, Any]], np.ndarray, List[str]]
+
+_DONE = object()
+
+
+class IngestSource:
+    """
+    One document to ingest, and its outcome once the pipeline has run.
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        filename: str,
+        data: Optional[bytes] = None,
+        previous: Optional[str] = None,
+    ):
+        """
+        Args:
+            file_path (Union[str, Path]): Location of the PDF on disk.
+            filename (str): Name recorded in each chunk's metadata.
+            data (bytes, optional): PDF content already in memory; when given it
+                is parsed directly and ``file_path`` is not read.
+            previous (str, optional): Filename of the version this one replaces.
+        """
+        self.file_path = file_path
+        self.filename = filename
+        self.data = data
+        self.previous = previous
+        self.error: Optional[BaseException] = None
+        self.reusable: Counter[str] = Counter()
+        self.carried: List[Dict[str, Any]] = []
+        self.carried_texts: List[str] = []
+        self.vectors = 0
+        self.removed = 0
+        self.tokens = 0  # estimated tokens sent for embedding
+
+    def result(self) -> Dict[str, Any]:
+        if self.error is not None:
+            return {
+                "filename": self.filename,
+                "message": "Ingestion failed",
+                "error": str(self.error),
+            }
+        return {
+            "filename": self.filename,
+            "chunks_ingested": self.vectors + len(self.carried),
+            "vectors_indexed": self.vectors,
+            "tokens_embedded": self.tokens,
+            "chunks_reused": len(self.carried),
+            "chunks_removed": self.removed,
+            "replaced": self.previous,
+            "message": "Ingestion successful",
+        }
+
+
+class _Aborted(Exception):
+    """
+    Raised inside a stage when another stage failed and the pipeline stops.
+    """
+
+
+class _Pipeline:
+    """
+    Shared plumbing for the stage threads: bounded queues for backpressure,
+    a stop flag, and the first error raised by any stage.
+    """
+
+    def __init__(self, queue_depth: int):
+        self.batches: "queue.Queue[Any]" = queue.Queue(maxsize=queue_depth)
+        self.vectors: "queue.Queue[Any]" = queue.Queue(maxsize=queue_depth)
+        self.stop = threading.Event()
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self.stop.set()
+
+    def fail_source(self, source: IngestSource, error: BaseException) -> None:
+        # Only this document fails; the others in the run carry on
+        with self._lock:
+            if source.error is None:
+                source.error = error
+
+    def put(self, q: "queue.Queue[Any]", item: Any) -> None:
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Aborted()
+
+    def get(self, q: "queue.Queue[Any]") -> Any:
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise _Aborted()
+
+
+def _iter_pages(source: IngestSource, progress: IngestProgress) -> Iterator[str]:
+    loader = PDFLoader(source.file_path, stream=source.data)
+    for _, text in loader.iter_pages():
+        progress.add(pages=1)
+        yield text
+
+
+def _iter_new_chunks(
+    source: IngestSource, chunker: Chunker, progress: IngestProgress
+) -> Iterator[Tuple[Dict[str, Any], str]]:
+    # Chunks whose fingerprint the previous version already has are set aside
+    # in `source.carried` instead of being embedded again. The whole document
+    # goes through one chunker call so chunks may span pages; each chunk's
+    # metadata records where its text lies, for citations.
+    pages = _iter_pages(source, progress)
+    for chunk_id, (span, chunk) in enumerate(chunker.iter_spans_with_text(pages)):
+        page, start, end_page, end = span
+        fingerprint = chunk_fingerprint(chunk)
+        metadata = {
+            "filename": source.filename,
+            "chunk_id": chunk_id,
+            "fingerprint": fingerprint,
+            "page": page,
+            "start": start,
+            "end_page": end_page,
+            "end": end,
+        }
+        if source.reusable[fingerprint] > 0:
+            source.reusable[fingerprint] -= 1
+            source.carried.append(metadata)
+            source.carried_texts.append(chunk)
+            continue
+        source.tokens += estimate_tokens(chunk)
+        yield metadata, chunk
+
+
+def _produce_batches(
+    pipeline: _Pipeline,
+    sources: List[IngestSource],
+    chunker: Chunker,
+    batch_size: int,
+    workers: int,
+    progress: IngestProgress,
+) -> None:
+    # Stage 1+2: stream pages out of each PDF in turn and pack their chunks
+    # into batches, so small documents share embedding requests.
+    try:
+        owners: List[IngestSource] = []
+        metadata: List[Dict[str, Any]] = []
+        texts: List[str] = []
+        for source in sources:
+            try:
+                for chunk_metadata, chunk in _iter_new_chunks(
+                    source, chunker, progress
+                ):
+                    if source.error is not None:
+                        break  # one of its batches failed to embed
+                    owners.append(source)
+                    metadata.append(chunk_metadata)
+                    texts.append(chunk)
+                    if len(texts) == batch_size:
+                        pipeline.put(pipeline.batches, (owners, metadata, texts))
+                        owners, metadata, texts = [], [], []
+            except _Aborted:
+                raise
+            except Exception as e:
+                pipeline.fail_source(source, RuntimeError(f"Error loading PDF: {e}"))
+                # Don't embed the chunks of this document that weren't sent yet
+                keep = [i for i, owner in enumerate(owners) if owner is not source]
+                owners = [owners[i] for i in keep]
+                metadata = [metadata[i] for i in keep]
+                texts = [texts[i] for i in keep]
+        if texts:
+            pipeline.put(pipeline.batches, (owners, metadata, texts))
+        for _ in range(workers):
+            pipeline.put(pipeline.batches, _DONE)
+    except _Aborted:
+        pass
+    except Exception as e:
+        pipeline.fail(RuntimeError(f"Error loading PDF: {e}"))
+
+
+def _embed_batches(
+    pipeline: _Pipeline,
+    embedder: TextEmbedder,
+    progress: IngestProgress,
+) -> None:
+    # Stage 3: embed batches; several of these run so network waits overlap
+    try:
+        while True:
+            item = pipeline.get(pipeline.batches)
+            if item is _DONE:
+                pipeline.put(pipeline.vectors, _DONE)
+                return
+            owners, metadata, texts = item
+            try:
+                vectors = embedder.embed_array(texts)
+            except Exception as e:
+                error = RuntimeError(f"Error generating embeddings: {e}")
+                for owner in owners:
+                    pipeline.fail_source(owner, error)
+                continue
+            progress.add(chunks=len(texts))
+            pipeline.put(pipeline.vectors, (owners, metadata, vectors, texts))
+    except _Aborted:
+        pass
+    except Exception as e:
+        pipeline.fail(RuntimeError(f"Error generating embeddings: {e}"))
+
+
+def ingest_document(
+    file_path: Union[str, Path],
+    filename: str,
+    indexer: VectorStore,
+    embedder: Optional[TextEmbedder] = None,
+    progress: Optional[IngestProgress] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    embed_workers: int = EMBED_WORKERS,
+    queue_depth: int = QUEUE_DEPTH,
+    data: Optional[bytes] = None,
+    previous: Optional[str] = None,
+    chunker: Optional[Chunker] = None,
+) -> Dict[str, Any]:
+    """
+    Streams one PDF through extraction, chunking, embedding and indexing.
+
+    The stages run concurrently and are connected by bounded queues, so
+    vectors reach the index while later pages are still being parsed, and
+    memory per document stays bounded by ``queue_depth`` batches rather
+    than growing with the page count.
+
+    Every chunk's metadata carries a content fingerprint. When ``previous``
+    names an indexed earlier version of the document, only chunks whose
+    fingerprint that version lacks are embedded; once the new chunks are
+    indexed, the unchanged vectors are handed over to ``filename`` and the
+    stale ones are removed. If ingestion fails, the vectors already added
+    for ``filename`` are removed again and ``previous`` is left untouched.
+
+    Args:
+        file_path (Union[str, Path]): Location of the PDF on disk.
+        filename (str): Name recorded in each chunk's metadata.
+        indexer (VectorStore): Index the vectors are appended to.
+        embedder (TextEmbedder, optional): Embedder to use; created if omitted.
+        progress (IngestProgress, optional): Counters updated as batches flow.
+        batch_size (int): Number of chunks sent per embedding request.
+        embed_workers (int): Number of embedding requests in flight.
+        queue_depth (int): Number of batches buffered between two stages.
+        data (bytes, optional): PDF content already in memory; when given it is
+            parsed directly and ``file_path`` is not read.
+        previous (str, optional): Filename of the version this one replaces.
+        chunker (Chunker, optional): Chunker to use; defaults to ``CHUNK_MODE``.
+
+    Returns:
+        Dict[str, Any]: Summary of the ingested document, including the
+        estimated number of tokens sent for embedding.
+
+    Raises:
+        RuntimeError: If a stage fails; the message names the failing stage.
+    """
+    source = IngestSource(file_path, filename, data=data, previous=previous)
+    _run_pipeline(
+        [source],
+        indexer,
+        embedder,
+        progress,
+        batch_size,
+        embed_workers,
+        queue_depth,
+        chunker,
+    )
+    if source.error is not None:
+        raise source.error
+    return source.result()
+
+
+def ingest_documents(
+    sources: List[IngestSource],
+    indexer: VectorStore,
+    embedder: Optional[TextEmbedder] = None,
+    progress: Optional[IngestProgress] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    embed_workers: int = EMBED_WORKERS,
+    queue_depth: int = QUEUE_DEPTH,
+    chunker: Optional[Chunker] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ingests several PDFs through one pipeline, as :func:`ingest_document` does
+    for one.
+
+    Documents are read one after another, but their chunks are packed into
+    shared batches, so a corpus of small files needs far fewer embedding
+    requests than ingesting each file on its own. A document that fails to
+    load or embed is rolled back without affecting the others.
+
+    Args:
+        sources (List[IngestSource]): Documents to ingest, in reading order.
+        indexer (VectorStore): Index the vectors are appended to.
+        embedder (TextEmbedder, optional): Embedder to use; created if omitted.
+        progress (IngestProgress, optional): Counters summed over all documents.
+        batch_size (int): Number of chunks sent per embedding request.
+        embed_workers (int): Number of embedding requests in flight.
+        queue_depth (int): Number of batches buffered between two stages.
+        chunker (Chunker, optional): Chunker to use; defaults to ``CHUNK_MODE``.
+
+    Returns:
+        List[Dict[str, Any]]: One summary per source, in order; failed
+        documents have an ``error`` instead of chunk counts.
+    """
+    _run_pipeline(
+        sources,
+        indexer,
+        embedder,
+        progress,
+        batch_size,
+        embed_workers,
+        queue_depth,
+        chunker,
+    )
+    return [source.result() for source in sources]
+
+
+def _run_pipeline(
+    sources: List[IngestSource],
+    indexer: VectorStore,
+    embedder: Optional[TextEmbedder],
+    progress: Optional[IngestProgress],
+    batch_size: int,
+    embed_workers: int,
+    queue_depth: int,
+    chunker: Optional[Chunker],
+) -> None:
+    # Outcomes are recorded on the sources rather than raised
+    progress = progress or IngestProgress()
+    chunker = chunker or make_chunker()
+    embedder = embedder or TextEmbedder()
+    pipeline = _Pipeline(queue_depth)
+    for source in sources:
+        if source.previous:
+            source.reusable = indexer.document_fingerprints(source.previous)
+
+    threads = [
+        threading.Thread(
+            target=_produce_batches,
+            args=(pipeline, sources, chunker, batch_size, embed_workers, progress),
+            name="ingest-extract",
+            daemon=True,
+        )
+    ]
+    threads += [
+        threading.Thread(
+            target=_embed_batches,
+            args=(pipeline, embedder, progress),
+            name=f"ingest-embed-{i}",
+            daemon=True,
+        )
+        for i in range(embed_workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Stage 4: index vectors as they arrive, on the calling thread
+    remaining = embed_workers
+    try:
+        while remaining:
+            item = pipeline.get(pipeline.vectors)
+            if item is _DONE:
+                remaining -= 1
+                continue
+            owners, metadata, vectors, texts = item
+            # Skip documents that failed while this batch was in flight
+            keep = [i for i, owner in enumerate(owners) if owner.error is None]
+            if not keep:
+                continue
+            try:
+                added, _ = indexer.add_embeddings(
+                    vectors if len(keep) == len(owners) else vectors[keep],
+                    [metadata[i] for i in keep],
+                    [texts[i] for i in keep],
+                )
+            except Exception as e:
+                raise RuntimeError(f"Error indexing embeddings: {e}") from e
+            for i in keep:
+                owners[i].vectors += 1
+            progress.add(vectors=added)
+    except _Aborted:
+        pass
+    except Exception as e:
+        pipeline.fail(e)
+    finally:
+        for thread in threads:
+            thread.join()
+
+    for source in sources:
+        if pipeline.error is not None and source.error is None:
+            source.error = pipeline.error
+        if source.error is None and source.previous:
+            try:
+                source.removed = indexer.replace_document(
+                    source.previous,
+                    source.filename,
+                    source.carried,
+                    source.carried_texts,
+                )
+            except ValueError as e:
+                source.error = RuntimeError(f"Error replacing {source.previous}: {e}")
+        if source.error is not None and source.vectors:
+            indexer.remove_document(source.filename)
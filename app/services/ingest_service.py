@@ -0,0 +1,207 @@
+import os
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+from dotenv import load_dotenv
+
+from .embedder import get_embedder
+from .index_registry import get_indexer, persist_indexer
+from .ingest_jobs import (
+    DONE,
+    FAILED,
+    FileLocks,
+    IngestBatch,
+    IngestJob,
+    IngestJobManager,
+    IngestProgress,
+)
+from .ingest_pipeline import IngestSource, ingest_document, ingest_documents
+from .mongo_client import find_other_versions, update_file_status
+from .vector_store import VectorStore
+
+load_dotenv()
+
+# Where the upload route saves files
+UPLOAD_DIR = Path("data")
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "100"))
+
+# Held from the "already ingested" check until the file's vectors are saved
+_file_locks = FileLocks()
+
+
+def _previous_version(filename: str, indexer: VectorStore) -> Optional[str]:
+    # The newest earlier upload of the same document that is still indexed
+    for doc in find_other_versions(filename):
+        if indexer.has_document(doc["saved_as"]):
+            return str(doc["saved_as"])
+    return None
+
+
+def _run_ingest(
+    filename: str,
+    progress: IngestProgress,
+    data: Optional[bytes] = None,
+    incremental: bool = True,
+) -> dict:
+    with _file_locks.hold([filename]):
+        indexer = get_indexer()
+        if indexer.has_document(filename):
+            # e.g. a duplicate upload resolved to a file whose vectors exist,
+            # or another job ingested it while this one was queued
+            return {"filename": filename, "message": "Already ingested"}
+
+        previous = _previous_version(filename, indexer) if incremental else None
+        result: dict = ingest_document(
+            UPLOAD_DIR / filename,
+            filename,
+            indexer,
+            get_embedder(),
+            progress,
+            data=data,
+            previous=previous,
+        )
+        persist_indexer()
+    _mark_superseded(previous, filename)
+    return result
+
+
+def _run_ingest_group(
+    filenames: List[str], label: str, progress: IngestProgress, incremental: bool
+) -> dict:
+    # One batch job: ingests a group of files through a single shared pipeline.
+    # Each file's outcome is written to its own record; _sync_status leaves
+    # finished group jobs alone.
+    results: Dict[str, dict] = {}
+    sources: List[IngestSource] = []
+    skipped: Set[str] = set()
+    try:
+        with _file_locks.hold(filenames):
+            indexer = get_indexer()
+            for filename in filenames:
+                if indexer.has_document(filename):
+                    results[filename] = {
+                        "filename": filename,
+                        "message": "Already ingested",
+                    }
+                    skipped.add(filename)
+                    continue
+                previous = _previous_version(filename, indexer) if incremental else None
+                sources.append(
+                    IngestSource(UPLOAD_DIR / filename, filename, previous=previous)
+                )
+
+            if sources:
+                ingested = ingest_documents(sources, indexer, get_embedder(), progress)
+                for source, result in zip(sources, ingested):
+                    results[source.filename] = result
+                persist_indexer()
+    except Exception as e:
+        # Every file needs an outcome: _sync_status skips finished group jobs
+        for filename in filenames:
+            error = None if filename in skipped else str(e)
+            _set_file_outcome(filename, progress, error)
+        raise
+    for filename in filenames:
+        _set_file_outcome(filename, progress, results[filename].get("error"))
+    for source in sources:
+        if "error" not in results[source.filename]:
+            _mark_superseded(source.previous, source.filename)
+
+    files = [results[filename] for filename in filenames]
+    failed = sum(1 for result in files if "error" in result)
+    return {"files": files, "succeeded": len(files) - failed, "failed": failed}
+
+
+def _set_file_outcome(
+    filename: str, progress: IngestProgress, error: Optional[str]
+) -> None:
+    update_file_status(
+        filename,
+        {
+            "status": FAILED if error else DONE,
+            "progress": progress.to_dict(),
+            "ingest_error": error,
+        },
+    )
+
+
+def _mark_superseded(previous: Optional[str], filename: str) -> None:
+    if previous:
+        update_file_status(
+            previous, {"status": "superseded", "superseded_by": filename}
+        )
+
+
+def _sync_status(job: IngestJob) -> None:
+    # Mirror the job onto its files' records so /api/files/{id}/status reflects it
+    if job.group is None:
+        update_file_status(
+            job.filename,
+            {
+                "status": job.status,
+                "progress": job.progress.to_dict(),
+                "ingest_job_id": job.job_id,
+                "ingest_error": job.error,
+            },
+        )
+        return
+    # A group job's label isn't a file; its files' outcomes are written by
+    # _run_ingest_group and must not be overwritten by the group's status
+    if job.status in (DONE, FAILED):
+        return
+    for filename in job.group:
+        update_file_status(
+            filename,
+            {
+                "status": job.status,
+                "progress": job.progress.to_dict(),
+                "ingest_job_id": job.job_id,
+            },
+        )
+
+
+jobs = IngestJobManager(
+    runner=_run_ingest,
+    max_workers=INGEST_WORKERS,
+    max_pending=INGEST_MAX_PENDING,
+    on_update=_sync_status,
+)
+
+
+def submit_ingest(
+    filename: str, data: Optional[bytes] = None, incremental: bool = True
+) -> IngestJob:
+    """
+    Queues ingestion of a saved upload, parsing ``data`` directly if given.
+
+    With ``incremental``, an indexed earlier upload of the same document is
+    replaced: only its changed chunks are embedded and its stale vectors are
+    removed.
+
+    Raises:
+        JobQueueFullError: If too many jobs are already queued.
+    """
+    runner = partial(_run_ingest, data=data, incremental=incremental)
+    return jobs.submit(filename, runner=runner)
+
+
+def submit_ingest_batch(
+    groups: Sequence[List[str]], incremental: bool = True
+) -> IngestBatch:
+    """
+    Queues one job per group of saved uploads, each ingesting its files
+    through a single shared pipeline; see :func:`submit_ingest` for
+    ``incremental``.
+
+    Raises:
+        JobQueueFullError: If the jobs don't fit in the queue; none are
+            queued then.
+    """
+    work = [
+        (group, partial(_run_ingest_group, group, incremental=incremental))
+        for group in groups
+    ]
+    return jobs.submit_batch(work)
@@ -0,0 +1,423 @@
+import io
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Terms are runs of letters and digits; runs joined by - _ . / : (part
+# numbers, error codes, versions) are also indexed as one term
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[-_./:][^\W_]+)*")
+_SEPARATOR_RE = re.compile(r"[-_./:]")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in more than this fraction of chunks (and in more than
+# COMMON_TERM_MIN_CHUNKS) only rescore the chunks rarer terms match
+COMMON_TERM_FRACTION = 0.1
+COMMON_TERM_MIN_CHUNKS = 10_000
+# Decoded postings kept for the most recently queried terms
+DECODED_CACHE_TERMS = 4096
+
+Ids = Union[Sequence[int], np.ndarray]
+# How often each term occurs in a chunk
+TermCounts = Dict[str, int]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased terms of ``text``. A compound such as ``ERR-0x1f.4`` yields
+    itself and its parts, so it matches both exactly and piecewise.
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        if _SEPARATOR_RE.search(term):
+            terms.extend(_SEPARATOR_RE.split(term))
+    return terms
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over chunk texts, keyed by the stable
+    vector ids of :class:`MetadataStore`.
+
+    Each term's postings list is a byte string of varint-encoded pairs
+    ``(id gap, term frequency)``. Ids are handed out in increasing order, so
+    new chunks are appended to the end of their terms' lists without
+    re-encoding them, and gaps stay small. Encoding and decoding are
+    vectorised with NumPy, and recently queried lists are kept decoded.
+
+    Removed chunks are only marked dead; :meth:`compact` drops them from the
+    postings and refreshes the document frequencies.
+
+    Searches may run concurrently with each other (the decoded-postings
+    cache has its own lock), but not with changes.
+    """
+
+    def __init__(self) -> None:
+        self._terms: Dict[str, int] = {}
+        self._postings: List[bytearray] = []
+        self._last_id: List[int] = []
+        self._df: List[int] = []
+        self._doc_len = np.zeros(1024, dtype=np.int32)
+        self._live = np.zeros(1024, dtype=bool)
+        self._size = 0  # one past the largest id added
+        self._num_docs = 0
+        self._total_len = 0
+        self._decoded: "OrderedDict[int, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._decoded_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Number of live chunks indexed.
+        """
+        return self._num_docs
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the compressed postings lists.
+        """
+        return sum(len(postings) for postings in self._postings)
+
+    def add(self, ids: Ids, texts: Iterable[Optional[Union[str, TermCounts]]]) -> None:
+        """
+        Indexes chunk texts under their ids, which must be larger than any
+        id added before.
+
+        Args:
+            ids (Ids): Stable id of each chunk.
+            texts (Iterable[Optional[Union[str, TermCounts]]]): Each chunk's
+                text, or its term counts as returned by :meth:`term_counts`;
+                chunks whose text is None are skipped.
+
+        Raises:
+            ValueError: If an id is not larger than the previous ones.
+        """
+        pairs = [(i, text) for i, text in zip(ids, texts) if text is not None]
+        ids = np.asarray([i for i, _ in pairs], dtype=np.int64)
+        if not len(ids):
+            return
+        if np.any(np.diff(ids) <= 0) or ids[0] < self._size:
+            raise ValueError("Lexical index ids must be added in increasing order.")
+
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        freqs: List[int] = []
+        lengths = np.zeros(len(ids), dtype=np.int32)
+        for row, (doc_id, (_, text)) in enumerate(zip(ids.tolist(), pairs)):
+            counts = Counter(tokenize(text)) if isinstance(text, str) else text
+            for term, count in counts.items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = self._new_term(term)
+                term_ids.append(term_id)
+                freqs.append(count)
+            lengths[row] = sum(counts.values())
+            doc_ids.extend([doc_id] * len(counts))
+
+        self._size = int(ids[-1]) + 1
+        self._ensure_capacity(self._size)
+        self._doc_len[ids] = lengths
+        self._live[ids] = True
+        self._num_docs += len(ids)
+        self._total_len += int(lengths.sum())
+        self._append_postings(
+            np.asarray(term_ids, dtype=np.int64),
+            np.asarray(doc_ids, dtype=np.int64),
+            np.asarray(freqs, dtype=np.int64),
+        )
+
+    def contains(self, ids: Ids) -> np.ndarray:
+        """
+        Which of ``ids`` are live chunks of the index.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < self._size)
+        inside[inside] = self._live[ids[inside]]
+        return inside
+
+    def term_counts(self, ids: Ids) -> List[Optional[TermCounts]]:
+        """
+        Recovers the term counts of chunks from the postings, e.g. to move
+        them into another index; None for chunks that aren't indexed. Scans
+        every postings list, so it is meant for offline use.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        counts: List[TermCounts] = [{} for _ in range(len(ids))]
+        order = np.argsort(ids)
+        sorted_ids = ids[order]
+        for term, term_id in self._terms.items():
+            postings, freqs = self._decode(term_id, cache=False)
+            rows = np.searchsorted(sorted_ids, postings)
+            rows[rows == len(ids)] = 0
+            hit = sorted_ids[rows] == postings if len(ids) else rows < 0
+            for row, freq in zip(order[rows[hit]].tolist(), freqs[hit].tolist()):
+                counts[row][term] = freq
+        return [c if ok else None for c, ok in zip(counts, self.contains(ids))]
+
+    def remove(self, ids: Ids) -> int:
+        """
+        Marks chunks as removed; unknown or already removed ids are ignored.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        requested = np.asarray(ids, dtype=np.int64)
+        known = np.unique(requested[(requested >= 0) & (requested < len(self._live))])
+        removed = known[self._live[known]]
+        self._live[removed] = False
+        self._num_docs -= len(removed)
+        self._total_len -= int(self._doc_len[removed].sum())
+        return len(removed)
+
+    def search(
+        self, query: str, k: int = 5, allowed: Optional[Ids] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ranks live chunks by their BM25 score for ``query``.
+
+        Only the postings of the query's rarer terms are scanned in full;
+        the others just add to the scores of chunks the rarer terms
+        matched, as long as they couldn't lift another chunk into the top
+        ``k`` (MaxScore). Common terms (see ``COMMON_TERM_FRACTION``) never
+        add chunks of their own unless the query has nothing rarer, so a
+        part number next to a ubiquitous prefix stays cheap.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of chunks to return.
+            allowed (Ids, optional): Only rank these ids.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ids and scores of the top ``k``
+            chunks, best first; chunks sharing no term with the query are
+            not returned.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        found = {self._terms[t] for t in tokenize(query) if t in self._terms}
+        terms = sorted((t for t in found if self._df[t]), key=self._df.__getitem__)
+        if not terms or not self._num_docs or k <= 0:
+            return empty
+
+        idfs = [self._idf(t) for t in terms]
+        # Most a term can add to a chunk's score (as its frequency grows)
+        bounds = [idf * (BM25_K1 + 1) for idf in idfs]
+        common = max(self._num_docs * COMMON_TERM_FRACTION, COMMON_TERM_MIN_CHUNKS)
+        scanned = 1
+        while True:
+            candidates = np.unique(
+                np.concatenate([self._decode(t)[0] for t in terms[:scanned]])
+            )
+            keep = self._live[candidates]
+            if allowed is not None:
+                keep &= np.isin(candidates, np.asarray(allowed, dtype=np.int64))
+            candidates = candidates[keep]
+            scores = np.zeros(len(candidates))
+            for term, idf in zip(terms, idfs):
+                scores += self._term_scores(term, idf, candidates)
+
+            rest = sum(bounds[scanned:])
+            if scanned == len(terms) or self._df[terms[scanned]] > common:
+                break
+            if len(scores) >= k and -np.partition(-scores, k - 1)[k - 1] >= rest:
+                break
+            scanned += 1
+
+        if not len(candidates):
+            return empty
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return candidates[order], scores[order].astype(np.float32)
+
+    def compact(self) -> int:
+        """
+        Rewrites the postings lists without removed chunks.
+
+        Returns:
+            int: Number of postings dropped.
+        """
+        dropped = 0
+        for term_id in range(len(self._postings)):
+            ids, freqs = self._decode(term_id, cache=False)
+            live = self._live[ids]
+            if live.all():
+                continue
+            dropped += int((~live).sum())
+            ids, freqs = ids[live], freqs[live]
+            self._postings[term_id] = bytearray(_encode_postings(ids, freqs, -1))
+            self._last_id[term_id] = int(ids[-1]) if len(ids) else -1
+            self._df[term_id] = len(ids)
+        with self._decoded_lock:
+            self._decoded.clear()
+        return dropped
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialises the index (an ``.npz`` archive) for snapshots.
+        """
+        terms = sorted(self._terms, key=self._terms.__getitem__)
+        lengths = np.fromiter(
+            (len(p) for p in self._postings), dtype=np.int64, count=len(terms)
+        )
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+            postings=np.frombuffer(b"".join(self._postings), dtype=np.uint8),
+            lengths=lengths,
+            last_id=np.asarray(self._last_id, dtype=np.int64),
+            df=np.asarray(self._df, dtype=np.int64),
+            doc_len=self._doc_len[: self._size],
+            live=self._live[: self._size],
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LexicalIndex":
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            terms = json.loads(archive["terms"].tobytes())
+            postings = archive["postings"].tobytes()
+            ends = np.cumsum(archive["lengths"]).tolist()
+            index = cls()
+            index._terms = {term: i for i, term in enumerate(terms)}
+            index._postings = [
+                bytearray(postings[start:end])
+                for start, end in zip([0] + ends[:-1], ends)
+            ]
+            index._last_id = archive["last_id"].tolist()
+            index._df = archive["df"].tolist()
+            doc_len, live = archive["doc_len"], archive["live"]
+        index._size = len(doc_len)
+        index._ensure_capacity(index._size)
+        index._doc_len[: len(doc_len)] = doc_len
+        index._live[: len(live)] = live
+        index._num_docs = int(live.sum())
+        index._total_len = int(doc_len[live].sum())
+        return index
+
+    def _idf(self, term_id: int) -> float:
+        df = self._df[term_id]
+        return math.log(1 + (self._num_docs - df + 0.5) / (df + 0.5))
+
+    def _term_scores(
+        self, term_id: int, idf: float, candidates: np.ndarray
+    ) -> np.ndarray:
+        # BM25 contribution of one term to each candidate (0 if absent)
+        ids, freqs = self._decode(term_id)
+        found = np.searchsorted(ids, candidates)
+        found[found == len(ids)] = 0
+        tf = np.where(ids[found] == candidates, freqs[found], 0)
+        avg_len = self._total_len / self._num_docs
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[candidates] / avg_len)
+        scores: np.ndarray = idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def _new_term(self, term: str) -> int:
+        term_id = len(self._postings)
+        self._terms[term] = term_id
+        self._postings.append(bytearray())
+        self._last_id.append(-1)
+        self._df.append(0)
+        return term_id
+
+    def _ensure_capacity(self, size: int) -> None:
+        if size <= len(self._live):
+            return
+        capacity = max(size, 2 * len(self._live))
+        doc_len = np.zeros(capacity, dtype=np.int32)
+        doc_len[: len(self._doc_len)] = self._doc_len
+        live = np.zeros(capacity, dtype=bool)
+        live[: len(self._live)] = self._live
+        self._doc_len, self._live = doc_len, live
+
+    def _append_postings(
+        self, term_ids: np.ndarray, doc_ids: np.ndarray, freqs: np.ndarray
+    ) -> None:
+        # Group the batch's postings by term, ids ascending within each term,
+        # encode them all at once, then append each term's slice of bytes
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids, freqs = term_ids[order], doc_ids[order], freqs[order]
+        starts = np.flatnonzero(np.r_[True, term_ids[1:] != term_ids[:-1]])
+        ends = np.r_[starts[1:], len(term_ids)]
+        terms = term_ids[starts].tolist()
+
+        previous = np.r_[-1, doc_ids[:-1]]
+        previous[starts] = [self._last_id[t] for t in terms]
+        data, sizes = _encode_varints(_interleave(doc_ids - previous, freqs))
+        offsets = np.r_[0, np.cumsum(sizes[0::2] + sizes[1::2])][np.r_[starts, -1]]
+        view = memoryview(data)
+        for i, term_id in enumerate(terms):
+            self._postings[term_id] += view[offsets[i] : offsets[i + 1]]
+            self._last_id[term_id] = int(doc_ids[ends[i] - 1])
+            self._df[term_id] += int(ends[i] - starts[i])
+            with self._decoded_lock:
+                self._decoded.pop(term_id, None)
+
+    def _decode(
+        self, term_id: int, cache: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        with self._decoded_lock:
+            decoded = self._decoded.get(term_id)
+            if decoded is not None:
+                self._decoded.move_to_end(term_id)
+                return decoded
+        # Decoded outside the lock; concurrent misses may decode a term twice
+        values = _decode_varints(self._postings[term_id])
+        decoded = np.cumsum(values[0::2]) - 1, values[1::2]
+        if cache:
+            with self._decoded_lock:
+                self._decoded[term_id] = decoded
+                if len(self._decoded) > DECODED_CACHE_TERMS:
+                    self._decoded.popitem(last=False)
+        return decoded
+
+
+def _encode_postings(ids: np.ndarray, freqs: np.ndarray, last_id: int) -> bytes:
+    # Gaps are taken from `last_id`, so the first id of a list is stored + 1
+    data, _ = _encode_varints(_interleave(np.diff(ids, prepend=last_id), freqs))
+    return data
+
+
+def _interleave(gaps: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    values = np.empty(2 * len(gaps), dtype=np.int64)
+    values[0::2], values[1::2] = gaps, freqs
+    return values
+
+
+def _encode_varints(values: np.ndarray) -> Tuple[bytes, np.ndarray]:
+    # LEB128: 7 bits per byte, low bits first, high bit set on all but the
+    # last; also returns the number of bytes of each value
+    values = values.astype(np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    starts = np.cumsum(sizes) - sizes
+    for byte in range(int(sizes.max(initial=0))):
+        has = sizes > byte
+        bits = (values[has] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        more = (sizes[has] > byte + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + byte] = bits | more
+    return out.tobytes(), sizes
+
+
+def _decode_varints(data: Union[bytes, bytearray]) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        return np.empty(0, dtype=np.int64)
+    last = (raw & 0x80) == 0
+    ends = np.flatnonzero(last)
+    starts = np.r_[0, ends[:-1] + 1]
+    # Position of each byte within its value gives its shift
+    shifts = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    parts = (raw & 0x7F).astype(np.int64) << (7 * shifts)
+    return np.add.reduceat(parts, starts)
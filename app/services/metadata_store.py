@@ -0,0 +1,462 @@
+import io
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+import numpy as np
+
+# One fixed-size record per vector; `flags` says which fields the entry has
+_ROW = np.dtype(
+    [
+        ("doc", "<i4"),
+        ("chunk_id", "<i4"),
+        ("page", "<i4"),
+        ("start", "<i4"),
+        ("end_page", "<i4"),
+        ("end", "<i4"),
+        ("fingerprint", "<u8"),
+        ("flags", "u1"),
+    ]
+)
+_INT_FIELDS = ("chunk_id", "page", "start", "end_page", "end")
+_FILENAME = 1
+_FINGERPRINT = 2
+_INT_FLAGS = {name: 4 << i for i, name in enumerate(_INT_FIELDS)}
+_TOMBSTONE = 128  # deleted, but still present until the store is compacted
+_INT32_MIN, _INT32_MAX = -(2**31), 2**31 - 1
+_FINGERPRINT_RE = re.compile(r"[0-9a-f]{16}")
+
+Positions = Union[Sequence[int], np.ndarray]
+
+
+class MetadataStore:
+    """
+    Columnar store for per-vector metadata, addressed by vector position.
+
+    The fields the ingest pipeline writes (filename, chunk_id, fingerprint,
+    page, start, end_page, end) live in one NumPy record array, with each
+    filename stored once in an interned string table. Any other keys are kept
+    in a sparse side table. Entries read back as plain dicts, so callers see
+    the same metadata they added.
+
+    Every entry also gets a stable 64-bit id that, unlike its position, never
+    changes. Ids are handed out in increasing order and deletions keep the
+    order, so the id column stays sorted and ids map to positions by binary
+    search. Entries can be tombstoned: they then no longer belong to their
+    document but keep their position until :meth:`delete` compacts them away.
+
+    Each entry can also carry its chunk's text, kept UTF-8 encoded in one
+    buffer outside the metadata dicts and read back with :meth:`texts`, so
+    retrieved passages are served without going back to their documents.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity (int): Number of rows allocated up front; grows as needed.
+        """
+        self._rows = np.zeros(max(1, capacity), dtype=_ROW)
+        self._ids = np.zeros(len(self._rows), dtype=np.int64)
+        self._size = 0
+        self._next_id = 0
+        self._tombstones = 0
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self._doc_counts: Dict[int, int] = {}
+        self._extras: Dict[int, Dict[str, Any]] = {}
+        # Offset and length of each entry's text in _text; length -1 if none
+        self._text_starts = np.zeros(len(self._rows), dtype=np.int64)
+        self._text_lengths = np.full(len(self._rows), -1, dtype=np.int64)
+        self._text = bytearray()
+
+    @classmethod
+    def from_dicts(cls, entries: Sequence[Dict[str, Any]]) -> "MetadataStore":
+        store = cls(capacity=len(entries))
+        store.extend(entries)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self[i]
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("metadata position out of range")
+        return self._decode(position, self._rows[position].tolist())
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the record array (including spare capacity) and the
+        chunk texts.
+        """
+        return int(
+            self._rows.nbytes
+            + self._ids.nbytes
+            + self._text_starts.nbytes
+            + self._text_lengths.nbytes
+            + len(self._text)
+        )
+
+    @property
+    def tombstones(self) -> int:
+        """
+        Number of tombstoned entries still taking up a position.
+        """
+        return self._tombstones
+
+    def extend(
+        self, entries: Iterable[Dict[str, Any]], texts: Optional[Iterable[Any]] = None
+    ) -> np.ndarray:
+        """
+        Appends one row per entry, in order.
+
+        Args:
+            entries (Iterable[Dict[str, Any]]): Metadata entries.
+            texts (Iterable, optional): Each entry's chunk text; anything that
+                isn't a string (e.g. None) leaves the entry without one.
+
+        Returns:
+            np.ndarray: The stable ids given to the new entries.
+        """
+        first = self._next_id
+        text_iter = iter(texts) if texts is not None else None
+        for entry in entries:
+            if self._size == len(self._rows):
+                self._grow()
+            self._rows[self._size] = self._encode(self._size, entry)
+            self._ids[self._size] = self._next_id
+            text = next(text_iter, None) if text_iter is not None else None
+            if isinstance(text, str):
+                encoded = text.encode("utf-8")
+                self._text_starts[self._size] = len(self._text)
+                self._text_lengths[self._size] = len(encoded)
+                self._text += encoded
+            else:
+                self._text_lengths[self._size] = -1
+            self._size += 1
+            self._next_id += 1
+        return np.arange(first, self._next_id, dtype=np.int64)
+
+    def set(self, position: int, entry: Dict[str, Any]) -> None:
+        """
+        Replaces the entry at ``position``.
+        """
+        if not 0 <= position < self._size:
+            raise IndexError("metadata position out of range")
+        row = self._rows[position]
+        if row["flags"] & _TOMBSTONE:
+            self._tombstones -= 1
+        elif row["flags"] & _FILENAME:
+            self._uncount(int(row["doc"]), 1)
+        self._extras.pop(position, None)
+        self._rows[position] = self._encode(position, entry)
+
+    def gather(self, positions: Positions) -> List[Dict[str, Any]]:
+        """
+        Returns the entries at ``positions`` (e.g. a top-k result), reading all
+        rows with one vectorised take.
+
+        Raises:
+            IndexError: If a position is out of range.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size and (positions.min() < 0 or positions.max() >= self._size):
+            raise IndexError("metadata position out of range")
+        rows = self._rows[positions].tolist()
+        return [self._decode(int(p), row) for p, row in zip(positions, rows)]
+
+    def texts(self, positions: Positions) -> List[Optional[str]]:
+        """
+        Chunk texts of the entries at ``positions``; None where there is none.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self._text_starts[positions].tolist()
+        lengths = self._text_lengths[positions].tolist()
+        return [
+            self._text[start : start + length].decode("utf-8") if length >= 0 else None
+            for start, length in zip(starts, lengths)
+        ]
+
+    def ids(self, positions: Positions) -> np.ndarray:
+        """
+        Stable ids of the entries at ``positions``.
+        """
+        return self._ids[np.asarray(positions, dtype=np.int64)]
+
+    def lookup(self, ids: Positions) -> np.ndarray:
+        """
+        Current positions of the entries with stable ``ids``; -1 for ids that
+        are unknown or have been deleted or tombstoned.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        live = self._ids[: self._size]
+        positions = np.searchsorted(live, ids)
+        found = positions < self._size
+        found[found] = live[positions[found]] == ids[found]
+        found[found] = (self._rows["flags"][positions[found]] & _TOMBSTONE) == 0
+        return np.where(found, positions, -1)
+
+    def has_document(self, filename: str) -> bool:
+        name_id = self._name_ids.get(filename)
+        return name_id is not None and self._doc_counts.get(name_id, 0) > 0
+
+    def document_size(self, filename: str) -> int:
+        """
+        Number of live entries for ``filename``.
+        """
+        name_id = self._name_ids.get(filename)
+        return 0 if name_id is None else self._doc_counts.get(name_id, 0)
+
+    def filenames(self, positions: Positions) -> Set[str]:
+        """
+        The distinct filenames of the entries at ``positions``.
+        """
+        rows = self._rows[np.asarray(positions, dtype=np.int64)]
+        named = np.unique(rows["doc"][(rows["flags"] & _FILENAME) > 0])
+        return {self._names[name_id] for name_id in named.tolist()}
+
+    def positions(self, *filenames: str) -> np.ndarray:
+        """
+        Positions of every live entry for any of ``filenames``, in ascending
+        order.
+        """
+        name_ids = [self._name_ids[f] for f in filenames if f in self._name_ids]
+        if not name_ids:
+            return np.empty(0, dtype=np.int64)
+        rows = self._rows[: self._size]
+        flags = rows["flags"] & (_FILENAME | _TOMBSTONE)
+        return np.flatnonzero(np.isin(rows["doc"], name_ids) & (flags == _FILENAME))
+
+    def live_mask(self) -> np.ndarray:
+        """
+        Boolean array, one element per position, False where tombstoned.
+        """
+        flags = self._rows["flags"][: self._size]
+        return np.asarray((flags & _TOMBSTONE) == 0)
+
+    def tombstone(self, positions: Positions) -> int:
+        """
+        Marks the entries at ``positions`` deleted without moving any entry.
+        They no longer count towards their document; :meth:`delete` removes
+        them for good.
+
+        Returns:
+            int: Number of entries newly tombstoned.
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if positions.size and (positions[0] < 0 or positions[-1] >= self._size):
+            raise IndexError("metadata position out of range")
+        rows = self._rows[positions]
+        fresh = (rows["flags"] & _TOMBSTONE) == 0
+        self._uncount_rows(rows[fresh])
+        self._rows["flags"][positions[fresh]] |= _TOMBSTONE
+        self._tombstones += int(fresh.sum())
+        return int(fresh.sum())
+
+    def tombstoned(self) -> np.ndarray:
+        """
+        Positions of every tombstoned entry, in ascending order.
+        """
+        return np.flatnonzero(~self.live_mask())
+
+    def fingerprints(self, positions: Positions) -> List[Optional[str]]:
+        """
+        Fingerprints of the entries at ``positions``; None where there is none.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        rows = self._rows[positions]
+        return [
+            f"{fp:016x}"
+            if flags & _FINGERPRINT
+            else self._extras.get(p, {}).get("fingerprint")
+            for p, fp, flags in zip(
+                positions.tolist(),
+                rows["fingerprint"].tolist(),
+                rows["flags"].tolist(),
+            )
+        ]
+
+    def delete(self, positions: Positions) -> None:
+        """
+        Removes the entries at ``positions``; later entries move up to close
+        the gaps, keeping their relative order.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if not positions.size:
+            return
+        keep = np.ones(self._size, dtype=bool)
+        keep[positions] = False
+
+        dropped = self._rows[: self._size][~keep]
+        dead = (dropped["flags"] & _TOMBSTONE) > 0
+        self._uncount_rows(dropped[~dead])
+        self._tombstones -= int(dead.sum())
+
+        if self._extras:
+            new_positions = np.cumsum(keep) - 1
+            self._extras = {
+                int(new_positions[p]): extra
+                for p, extra in self._extras.items()
+                if keep[p]
+            }
+        self._rows = self._rows[: self._size][keep]
+        self._ids = self._ids[: self._size][keep]
+        self._compact_texts(keep)
+        self._size = len(self._rows)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialises the store (an ``.npz`` archive) for snapshots.
+        """
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            rows=self._rows[: self._size],
+            ids=self._ids[: self._size],
+            next_id=np.int64(self._next_id),
+            names=_json_array(self._names),
+            extras=_json_array({str(p): e for p, e in self._extras.items()}),
+            text_starts=self._text_starts[: self._size],
+            text_lengths=self._text_lengths[: self._size],
+            text=np.frombuffer(self._text, dtype=np.uint8),
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MetadataStore":
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            rows = archive["rows"]
+            names = json.loads(archive["names"].tobytes())
+            extras = json.loads(archive["extras"].tobytes())
+            # Snapshots written before stable ids existed number them in order
+            if "ids" in archive:
+                ids, next_id = archive["ids"], int(archive["next_id"])
+            else:
+                ids, next_id = np.arange(len(rows), dtype=np.int64), len(rows)
+            # ... and those written before chunk texts were stored have none
+            text = None
+            if "text" in archive:
+                text_starts = archive["text_starts"]
+                text_lengths = archive["text_lengths"]
+                text = archive["text"].tobytes()
+
+        store = cls(capacity=len(rows))
+        store._rows[: len(rows)] = rows
+        store._ids[: len(rows)] = ids
+        store._size = len(rows)
+        store._next_id = next_id
+        store._names = names
+        store._name_ids = {name: i for i, name in enumerate(names)}
+        store._extras = {int(p): e for p, e in extras.items()}
+        if text is not None:
+            store._text_starts[: len(rows)] = text_starts
+            store._text_lengths[: len(rows)] = text_lengths
+            store._text = bytearray(text)
+        dead = (rows["flags"] & _TOMBSTONE) > 0
+        store._tombstones = int(dead.sum())
+        named = rows[~dead]
+        named = named["doc"][(named["flags"] & _FILENAME) > 0]
+        for name_id, count in zip(*np.unique(named, return_counts=True)):
+            store._doc_counts[int(name_id)] = int(count)
+        return store
+
+    def _grow(self) -> None:
+        capacity = max(1024, len(self._rows) * 2)
+        rows = np.zeros(capacity, dtype=_ROW)
+        rows[: self._size] = self._rows[: self._size]
+        self._rows = rows
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._ids = ids
+        starts = np.zeros(capacity, dtype=np.int64)
+        starts[: self._size] = self._text_starts[: self._size]
+        self._text_starts = starts
+        lengths = np.full(capacity, -1, dtype=np.int64)
+        lengths[: self._size] = self._text_lengths[: self._size]
+        self._text_lengths = lengths
+
+    def _compact_texts(self, keep: np.ndarray) -> None:
+        # Drops the texts of deleted rows and closes the gaps they leave
+        starts = self._text_starts[: len(keep)][keep]
+        lengths = self._text_lengths[: len(keep)][keep]
+        view = memoryview(self._text)
+        text = bytearray()
+        new_starts = np.zeros(len(starts), dtype=np.int64)
+        for i, (start, length) in enumerate(zip(starts.tolist(), lengths.tolist())):
+            if length >= 0:
+                new_starts[i] = len(text)
+                text += view[start : start + length]
+        view.release()
+        self._text = text
+        self._text_starts = new_starts
+        self._text_lengths = lengths
+
+    def _uncount_rows(self, rows: np.ndarray) -> None:
+        named = rows["doc"][(rows["flags"] & _FILENAME) > 0]
+        for name_id, count in zip(*np.unique(named, return_counts=True)):
+            self._uncount(int(name_id), int(count))
+
+    def _uncount(self, name_id: int, count: int) -> None:
+        remaining = self._doc_counts.get(name_id, 0) - count
+        if remaining > 0:
+            self._doc_counts[name_id] = remaining
+        else:
+            self._doc_counts.pop(name_id, None)
+
+    def _encode(self, position: int, entry: Dict[str, Any]) -> tuple:
+        # Values that don't fit their column are kept as extras instead
+        doc, fingerprint, flags = 0, 0, 0
+        ints = dict.fromkeys(_INT_FIELDS, 0)
+        extras: Dict[str, Any] = {}
+        for key, value in entry.items():
+            if key == "filename" and isinstance(value, str):
+                doc = self._name_ids.get(value, -1)
+                if doc < 0:
+                    doc = self._name_ids[value] = len(self._names)
+                    self._names.append(value)
+                self._doc_counts[doc] = self._doc_counts.get(doc, 0) + 1
+                flags |= _FILENAME
+            elif (
+                key == "fingerprint"
+                and isinstance(value, str)
+                and _FINGERPRINT_RE.fullmatch(value)
+            ):
+                fingerprint = int(value, 16)
+                flags |= _FINGERPRINT
+            elif (
+                key in ints and type(value) is int and _INT32_MIN <= value <= _INT32_MAX
+            ):
+                ints[key] = value
+                flags |= _INT_FLAGS[key]
+            else:
+                extras[key] = value
+        if extras:
+            self._extras[position] = extras
+        return (doc, *ints.values(), fingerprint, flags)
+
+    def _decode(self, position: int, row: tuple) -> Dict[str, Any]:
+        doc, chunk_id, page, start, end_page, end, fingerprint, flags = row
+        entry: Dict[str, Any] = {}
+        if flags & _FILENAME:
+            entry["filename"] = self._names[doc]
+        if flags & _INT_FLAGS["chunk_id"]:
+            entry["chunk_id"] = chunk_id
+        if flags & _FINGERPRINT:
+            entry["fingerprint"] = f"{fingerprint:016x}"
+        for name, value in zip(_INT_FIELDS[1:], (page, start, end_page, end)):
+            if flags & _INT_FLAGS[name]:
+                entry[name] = value
+        extras = self._extras.get(position)
+        if extras:
+            entry.update(extras)
+        return entry
+
+
+def _json_array(value: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(value).encode("utf-8"), dtype=np.uint8)
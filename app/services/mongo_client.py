@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from bson import ObjectId
 from dotenv import load_dotenv
@@ -18,6 +18,52 @@ db = client["docuwise"]
 metadata_collection = db["file_metadata"]
 
 
+def ensure_indexes() -> None:
+    """
+    Creates the indexes the upload and ingest routes rely on, if missing.
+    Called at application start-up rather than on import, so importing this
+    module doesn't need a reachable MongoDB.
+    """
+    # One record per distinct file content; older records without a hash are exempt
+    metadata_collection.create_index(
+        "sha256", name="uniq_sha256", unique=True, sparse=True
+    )
+    # Revisions of a document share its original filename
+    metadata_collection.create_index("original_filename", name="idx_original_filename")
+
+
 def save_metadata(metadata: Dict[str, Any]) -> ObjectId:
     result = metadata_collection.insert_one(metadata)
     return result.inserted_id
+
+
+def find_by_sha256(sha256: str) -> Optional[Dict[str, Any]]:
+    return metadata_collection.find_one({"sha256": sha256})
+
+
+def update_file_status(saved_as: str, fields: Dict[str, Any]) -> None:
+    """
+    Sets ``fields`` (e.g. ingestion status and progress) on the file's record.
+    """
+    metadata_collection.update_one({"saved_as": saved_as}, {"$set": fields})
+
+
+def find_other_versions(saved_as: str) -> List[Dict[str, Any]]:
+    """
+    Returns the other uploads sharing this upload's original filename,
+    newest first.
+    """
+    record = metadata_collection.find_one(
+        {"saved_as": saved_as}, {"original_filename": 1}
+    )
+    if not record or not record.get("original_filename"):
+        return []
+    return list(
+        metadata_collection.find(
+            {
+                "original_filename": record["original_filename"],
+                "saved_as": {"$ne": saved_as},
+            },
+            {"saved_as": 1, "timestamp": 1},
+        ).sort("timestamp", -1)
+    )
@@ -1,12 +1,81 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Literal, Union, overload
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+)
 
 import fitz  # PyMuPDF
 
+# Below this many pages, process start-up and IPC cost more than they save
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = 16
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process: each worker opens its own handle on the file
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the shared extraction pool, so repeated loads reuse warm workers.
+    """
+    with _pool_lock:
+        if workers not in _pools:
+            # "spawn" is safe to use from the API's threaded worker processes
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pools[workers]
+
 
 class PDFLoader:
-    def __init__(self, file_path: Union[str, Path]):
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        workers: int = EXTRACT_WORKERS,
+        parallel_min_pages: int = PARALLEL_MIN_PAGES,
+        stream: Optional[bytes] = None,
+    ):
+        """
+        Args:
+            file_path (Union[str, Path]): Location of the PDF, or just its name
+                when ``stream`` is given.
+            workers (int): Processes used to extract large documents; 1 disables
+                parallel extraction.
+            parallel_min_pages (int): Documents with fewer pages are read serially.
+            stream (bytes, optional): PDF content already in memory, e.g. a fresh
+                upload; read directly instead of from ``file_path``.
+        """
         self.file_path = Path(file_path)
+        self.workers = workers
+        self.parallel_min_pages = parallel_min_pages
+        self.stream = stream
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = "document.pdf") -> "PDFLoader":
+        """
+        Creates a loader over an in-memory PDF, avoiding a round trip to disk.
+        """
+        return cls(name, stream=data)
 
     @overload
     def load_text(self, by_page: Literal[True]) -> List[str]: ...
@@ -28,11 +97,89 @@ class PDFLoader:
         Raises:
             FileNotFoundError: If the specified file does not exist.
         """
+        pages = [text for _, text in self.iter_pages()]
+        if by_page:
+            return pages
+        else:
+            return "\n".join(pages)
+
+    def load_pages(self, page_numbers: Iterable[int]) -> Dict[int, str]:
+        """
+        Extracts the text of only the given pages, e.g. to read a few
+        retrieved chunks without parsing the whole document.
+
+        Args:
+            page_numbers (Iterable[int]): Zero-based page numbers.
+
+        Returns:
+            Dict[int, str]: Text of each page, by page number.
+
+        Raises:
+            FileNotFoundError: If the specified file does not exist.
+            IndexError: If a page number is out of range.
+        """
+        if self.stream is not None:
+            doc = fitz.open(stream=self.stream, filetype="pdf")
+        elif not self.file_path.exists():
+            raise FileNotFoundError(f"File not found: {self.file_path}")
+        else:
+            doc = fitz.open(self.file_path)
+        with doc:
+            return {number: doc[number].get_text() for number in set(page_numbers)}
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """
+        Lazily yields the text of each page, keeping the document open only
+        while the iterator is consumed.
+
+        Files with at least ``parallel_min_pages`` pages are split into page
+        ranges extracted by a process pool; pages are still yielded in order,
+        with only a few ranges in flight at a time. In-memory documents are
+        always read serially, since every worker would need its own copy.
+
+        Yields:
+            Tuple[int, str]: Zero-based page number and the page's text.
+
+        Raises:
+            FileNotFoundError: If the specified file does not exist.
+        """
+        if self.stream is not None:
+            with fitz.open(stream=self.stream, filetype="pdf") as doc:
+                for page_number, page in enumerate(doc):
+                    yield page_number, page.get_text()
+            return
+
         if not self.file_path.exists():
             raise FileNotFoundError(f"File not found: {self.file_path}")
 
         with fitz.open(self.file_path) as doc:
-            if by_page:
-                return [page.get_text() for page in doc]
-            else:
-                return "\n".join([page.get_text() for page in doc])
+            page_count = doc.page_count
+            if self.workers <= 1 or page_count < self.parallel_min_pages:
+                for page_number, page in enumerate(doc):
+                    yield page_number, page.get_text()
+                return
+
+        yield from self._iter_pages_parallel(page_count)
+
+    def _iter_pages_parallel(self, page_count: int) -> Iterator[Tuple[int, str]]:
+        pool = _get_pool(self.workers)
+        ranges = deque(
+            (start, min(start + PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PAGES_PER_TASK)
+        )
+        in_flight: Deque[Tuple[int, "Future[List[str]]"]] = deque()
+        try:
+            while ranges or in_flight:
+                # Keep every worker busy with one more range queued each, but no more
+                while ranges and len(in_flight) < self.workers * 2:
+                    start, stop = ranges.popleft()
+                    future = pool.submit(
+                        _extract_page_range, str(self.file_path), start, stop
+                    )
+                    in_flight.append((start, future))
+                start, future = in_flight.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield start + offset, text
+        finally:
+            for _, future in in_flight:
+                future.cancel()
@@ -0,0 +1,392 @@
+import os
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient, models
+
+from .vector_store import Vectors, VectorStore
+
+load_dotenv()
+
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "docuwise")
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+SCROLL_PAGE_SIZE = 1024
+
+# Payload fields the collection is filtered and sorted on, with their index
+# type; metadata "filename"/"chunk_id" are stored under these names
+PAYLOAD_INDEXES = {
+    "doc_id": models.PayloadSchemaType.KEYWORD,
+    "chunk_index": models.PayloadSchemaType.INTEGER,
+}
+_RENAMED = {"filename": "doc_id", "chunk_id": "chunk_index"}
+_RESTORED = {v: k for k, v in _RENAMED.items()}
+# Payload field holding the chunk's text, returned as the hit's ``text``
+TEXT_FIELD = "text"
+
+
+class QdrantStore(VectorStore):
+    """
+    Stores chunk embeddings in a Qdrant collection.
+
+    Vectors are compared by Euclidean distance, reported squared so scores
+    match :class:`FAISSIndexer`'s. Each point's payload is the chunk's
+    metadata, with ``filename`` and ``chunk_id`` stored as the ``doc_id`` and
+    ``chunk_index`` fields, which get payload indexes so filtered queries
+    and document lookups don't scan the collection.
+
+    Qdrant persists every change itself, so :meth:`save` has nothing to do.
+    Chunk texts are stored in the payload, so hits carry them, but are not
+    indexed: :meth:`search_text` raises ValueError and :meth:`hybrid_search`
+    falls back to vector search.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        dim: int = 1536,
+        collection: str = QDRANT_COLLECTION,
+        batch_size: int = QDRANT_UPSERT_BATCH_SIZE,
+    ):
+        """
+        Creates the collection and its payload indexes if they don't exist.
+
+        Args:
+            client (QdrantClient): Client of the Qdrant server, or of a local
+                ``:memory:`` / on-disk instance.
+            dim (int): Dimensionality of the embedding vectors.
+            collection (str): Name of the collection.
+            batch_size (int): Points sent per upsert request.
+
+        Raises:
+            ValueError: If the collection exists with another vector size or
+                distance.
+        """
+        self.client = client
+        self.dim = dim
+        self.collection = collection
+        self.batch_size = batch_size
+        self._warned_hybrid = False
+        self._ensure_collection()
+
+    def add_embeddings(
+        self,
+        embeddings: Vectors,
+        metadata: List[Dict[str, Any]],
+        texts: Optional[Sequence[Any]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Upserts embeddings as new points, in batches of ``batch_size``.
+
+        Batches are pipelined: all but the last are sent without waiting for
+        Qdrant to apply them, and the last waits, so the call returns once
+        every point is searchable. Qdrant applies a collection's updates in
+        order. ``texts`` that are strings are stored in the payload.
+
+        Returns:
+            Tuple[int, int]: Number of vectors and metadata entries added.
+
+        Raises:
+            ValueError: If lengths don't match or inputs are empty.
+        """
+        if len(embeddings) == 0 or not metadata:
+            raise ValueError("Vectors and metadata must not be empty.")
+        if len(embeddings) != len(metadata):
+            raise ValueError("Vectors and metadata must be of same length.")
+
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        chunk_texts = list(texts) if texts is not None else [None] * len(metadata)
+        for start in range(0, len(vectors), self.batch_size):
+            end = start + self.batch_size
+            batch = models.Batch(
+                ids=[str(uuid.uuid4()) for _ in range(len(vectors[start:end]))],
+                vectors=vectors[start:end].tolist(),
+                payloads=[
+                    _to_payload(entry, text)
+                    for entry, text in zip(metadata[start:end], chunk_texts[start:end])
+                ],
+            )
+            self.client.upsert(self.collection, points=batch, wait=end >= len(vectors))
+        return len(embeddings), len(metadata)
+
+    def search(
+        self,
+        queries: Vectors,
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Finds the ``k`` nearest chunks to each query, all queries in one
+        request; ``filter`` is applied by Qdrant on the ``doc_id`` index.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, its hits nearest
+            first, each with the point ``id``, ``score`` (squared L2
+            distance), the chunk's ``metadata`` and its ``text`` (None if
+            it was added without one).
+        """
+        vectors = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        query_filter = None
+        if filter is not None:
+            filenames = list(filter)
+            if not filenames:
+                return [[] for _ in range(len(vectors))]
+            query_filter = _documents_filter(*filenames)
+
+        responses = self.client.query_batch_points(
+            self.collection,
+            requests=[
+                models.QueryRequest(
+                    query=vector,
+                    filter=query_filter,
+                    limit=k,
+                    with_payload=True,
+                )
+                for vector in vectors.tolist()
+            ],
+        )
+        return [
+            [
+                {
+                    "id": point.id,
+                    "score": point.score**2,
+                    "metadata": _from_payload(point.payload or {}),
+                    "text": (point.payload or {}).get(TEXT_FIELD),
+                }
+                for point in response.points
+            ]
+            for response in responses
+        ]
+
+    def search_text(
+        self, query: str, k: int = 5, filter: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Raises:
+            ValueError: Always; the collection keeps no keyword index.
+        """
+        raise ValueError(
+            f"Qdrant collection {self.collection} has no keyword index; "
+            "use vector or hybrid search"
+        )
+
+    def hybrid_search(
+        self,
+        query_vector: Vectors,
+        query: str,
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Without a keyword index this is a vector search for ``query_vector``
+        alone; a warning is logged the first time.
+
+        Returns:
+            List[Dict[str, Any]]: Hits nearest first, as returned by
+            :meth:`search`.
+        """
+        if not self._warned_hybrid:
+            self._warned_hybrid = True
+            print(
+                f"[QDRANT] Collection {self.collection} has no keyword index; "
+                "hybrid search falls back to vector search."
+            )
+        vector = np.asarray(query_vector, dtype=np.float32).reshape(1, self.dim)
+        [hits] = self.search(vector, k, filter)
+        return hits
+
+    def has_document(self, filename: str) -> bool:
+        return self._count(filename) > 0
+
+    def document_fingerprints(self, filename: str) -> Counter[str]:
+        """
+        Counts the chunk fingerprints indexed for ``filename``; chunks indexed
+        without a fingerprint are not counted.
+        """
+        return Counter(
+            fingerprint
+            for _, fingerprint in self._scroll_fingerprints(filename)
+            if fingerprint is not None
+        )
+
+    def remove_document(self, filename: str) -> int:
+        """
+        Deletes every point indexed for ``filename``.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        removed = self._count(filename)
+        if removed:
+            self.client.delete(
+                self.collection,
+                points_selector=models.FilterSelector(
+                    filter=_documents_filter(filename)
+                ),
+            )
+        return removed
+
+    def remove_ids(self, ids: List[Union[int, str]]) -> int:
+        """
+        Deletes the points with the given ids; unknown ids are ignored.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        found = self.client.retrieve(self.collection, ids, with_payload=False)
+        if found:
+            self.client.delete(
+                self.collection,
+                points_selector=models.PointIdsList(points=[p.id for p in found]),
+            )
+        return len(found)
+
+    def replace_document(
+        self,
+        previous: str,
+        filename: str,
+        carried: List[Dict[str, Any]],
+        texts: Optional[Sequence[str]] = None,
+    ) -> int:
+        """
+        Retires ``previous`` in favour of its new version ``filename``.
+
+        The points of ``previous`` whose fingerprint matches a ``carried``
+        entry get that entry (and its text from ``texts``) as their payload,
+        keeping their vectors; the other points of ``previous`` are deleted.
+        Both updates go in one request, which Qdrant applies in order.
+
+        Returns:
+            int: Number of stale vectors removed.
+
+        Raises:
+            ValueError: If a carried fingerprint is no longer indexed for
+                ``previous``; nothing is changed in that case.
+        """
+        available: Dict[str, List[Union[int, str]]] = {}
+        for point_id, fingerprint in self._scroll_fingerprints(previous):
+            available.setdefault(fingerprint or "", []).append(point_id)
+
+        operations: List[Any] = []
+        chunk_texts: List[Optional[str]] = (
+            list(texts) if texts is not None else [None] * len(carried)
+        )
+        for entry, text in zip(carried, chunk_texts):
+            matches = available.get(entry["fingerprint"])
+            if not matches:
+                raise ValueError(
+                    f"Chunk {entry['fingerprint']} is no longer indexed for {previous}."
+                )
+            operations.append(
+                models.OverwritePayloadOperation(
+                    overwrite_payload=models.SetPayload(
+                        payload=_to_payload({**entry, "filename": filename}, text),
+                        points=[matches.pop()],
+                    )
+                )
+            )
+        stale = [point_id for ids in available.values() for point_id in ids]
+        if stale:
+            operations.append(
+                models.DeleteOperation(delete=models.PointIdsList(points=stale))
+            )
+        if operations:
+            self.client.batch_update_points(self.collection, operations)
+        return len(stale)
+
+    def save(self, directory: Union[str, Path]) -> int:
+        """
+        Nothing to write: Qdrant persists each change as it is applied.
+
+        Returns:
+            int: Always 0.
+        """
+        return 0
+
+    def _ensure_collection(self) -> None:
+        if not self.client.collection_exists(self.collection):
+            self.client.create_collection(
+                self.collection,
+                vectors_config=models.VectorParams(
+                    size=self.dim, distance=models.Distance.EUCLID
+                ),
+            )
+        info = self.client.get_collection(self.collection)
+        params = info.config.params.vectors
+        if not isinstance(params, models.VectorParams):
+            raise ValueError(f"Collection {self.collection} has named vectors.")
+        if params.size != self.dim or params.distance != models.Distance.EUCLID:
+            raise ValueError(
+                f"Collection {self.collection} has {params.size}-dimensional "
+                f"{params.distance.value} vectors, expected {self.dim}-dimensional "
+                "Euclid."
+            )
+        for field, schema in PAYLOAD_INDEXES.items():
+            if field not in (info.payload_schema or {}):
+                self.client.create_payload_index(
+                    self.collection, field_name=field, field_schema=schema
+                )
+
+    def _count(self, filename: str) -> int:
+        result = self.client.count(
+            self.collection, count_filter=_documents_filter(filename), exact=True
+        )
+        return int(result.count)
+
+    def _scroll_fingerprints(
+        self, filename: str
+    ) -> Iterator[Tuple[Union[int, str], Optional[str]]]:
+        # (point id, fingerprint) of each point of `filename`, in id order
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                self.collection,
+                scroll_filter=_documents_filter(filename),
+                limit=SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=["fingerprint"],
+            )
+            for point in points:
+                yield point.id, (point.payload or {}).get("fingerprint")
+            if offset is None:
+                return
+
+
+def _documents_filter(*filenames: str) -> models.Filter:
+    match: Union[models.MatchValue, models.MatchAny]
+    if len(filenames) == 1:
+        match = models.MatchValue(value=filenames[0])
+    else:
+        match = models.MatchAny(any=list(filenames))
+    return models.Filter(must=[models.FieldCondition(key="doc_id", match=match)])
+
+
+def _to_payload(entry: Dict[str, Any], text: Any = None) -> Dict[str, Any]:
+    payload = {
+        _RENAMED.get(key, key): value.item() if isinstance(value, np.generic) else value
+        for key, value in entry.items()
+    }
+    if isinstance(text, str):
+        payload[TEXT_FIELD] = text
+    return payload
+
+
+def _from_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        _RESTORED.get(key, key): value
+        for key, value in payload.items()
+        if key != TEXT_FIELD
+    }
@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .embedder import TextEmbedder
+from .embedding_cache import EmbeddingCache
+
+load_dotenv()
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))  # questions
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # seconds
+# Also keep question embeddings in the shared SQLite embedding cache, so
+# every worker process reuses them
+QUERY_CACHE_SHARED = os.getenv("QUERY_CACHE_SHARED", "1") == "1"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Folds trivial differences between questions: Unicode compatibility
+    forms, letter case and runs of whitespace.
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Embeds questions through a bounded in-process cache, so a repeated
+    question costs a dict lookup instead of an embedding request.
+
+    Questions are keyed on their normalised text (see
+    :func:`normalize_question`) plus the deployment and dimensions, so
+    trivially different questions share an entry; the first question seen
+    with a key is embedded as asked. Entries expire ``ttl`` seconds after
+    they were embedded and the least recently used are evicted beyond
+    ``max_entries``. Misses go to the optional shared :class:`EmbeddingCache`
+    tier before the embedding API; that tier is bounded by size, not age.
+    """
+
+    def __init__(
+        self,
+        embedder: TextEmbedder,
+        max_entries: int = QUERY_CACHE_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+        shared: Optional[EmbeddingCache] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            embedder (TextEmbedder): Embedder used on a miss; its own cache
+                is bypassed in favour of ``shared``.
+            max_entries (int): Questions kept in memory.
+            ttl (float): Seconds an in-memory entry stays valid.
+            shared (EmbeddingCache, optional): On-disk tier shared with other
+                processes.
+            clock (Callable[[], float]): Time source, in seconds.
+        """
+        self.embedder = embedder
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.clock = clock
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_array(self, questions: List[str]) -> np.ndarray:
+        """
+        Embeds questions like :meth:`TextEmbedder.embed_array`, serving
+        cached ones from memory or the shared tier.
+
+        Returns:
+            np.ndarray: Array of shape ``(len(questions), dim)``.
+
+        Raises:
+            RuntimeError: If the embedding request fails.
+        """
+        keys = [
+            EmbeddingCache.make_key(
+                normalize_question(question),
+                self.embedder.deployment or "",
+                self.embedder.dimensions,
+            )
+            for question in questions
+        ]
+        found: Dict[bytes, np.ndarray] = {}
+        now = self.clock()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+            self.hits += sum(1 for key in keys if key in found)
+
+        # Embed each missing question once, even if it repeats
+        missing: Dict[bytes, str] = {}
+        for key, question in zip(keys, questions):
+            if key not in found:
+                missing.setdefault(key, question)
+        fresh: Dict[bytes, np.ndarray] = {}
+        if missing and self.shared is not None:
+            fresh = self.shared.get_many(list(missing))
+        unknown = {key: text for key, text in missing.items() if key not in fresh}
+        if unknown:
+            vectors = self.embedder.embed_array(list(unknown.values()), use_cache=False)
+            embedded = dict(zip(unknown, vectors))
+            if self.shared is not None:
+                self.shared.put_many(embedded)
+            fresh.update(embedded)
+
+        if missing:
+            expires = self.clock() + self.ttl
+            with self._lock:
+                self.shared_hits += len(missing) - len(unknown)
+                self.misses += len(unknown)
+                for key, vector in fresh.items():
+                    self._entries[key] = (vector, expires)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+            found.update(fresh)
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        out: np.ndarray = np.stack([found[key] for key in keys]).astype(
+            np.float32, copy=False
+        )
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Lookup counters since start-up: questions served from memory
+        (``hits``), from the shared tier (``shared_hits``) and embedded
+        (``misses``), with the fraction that avoided the embedding API.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from dotenv import load_dotenv
+
+from .chunker import span_text
+from .embedder import TextEmbedder, get_embedder
+from .embedding_cache import get_embedding_cache
+from .index_registry import get_indexer
+from .pdf_loader import PDFLoader
+from .query_cache import QUERY_CACHE_SHARED, QueryEmbeddingCache
+from .vector_store import VectorStore
+
+load_dotenv()
+
+UPLOAD_DIR = Path("data")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# How passages are ranked: by embedding distance alone ("vector"), or by
+# fusing it with keyword matches ("hybrid", see VectorStore.hybrid_search)
+VECTOR = "vector"
+HYBRID = "hybrid"
+RETRIEVAL_MODES = (VECTOR, HYBRID)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", VECTOR)
+# Page texts kept in memory for slicing retrieved chunks out of
+PAGE_CACHE_MB = int(os.getenv("QUERY_PAGE_CACHE_MB", "64"))
+
+# Stage name -> milliseconds
+Timings = Dict[str, float]
+
+
+class PageCache:
+    """
+    LRU cache of page texts by ``(filename, page)``, so the chunks of
+    recently retrieved pages are sliced out of memory instead of parsing
+    their PDF again. Only the pages a chunk spans are read from a PDF.
+    """
+
+    def __init__(
+        self, directory: Path = UPLOAD_DIR, max_chars: int = PAGE_CACHE_MB * 2**20
+    ):
+        """
+        Args:
+            directory (Path): Directory the indexed PDFs were uploaded to.
+            max_chars (int): Total length of the cached page texts.
+        """
+        self.directory = directory
+        self.max_chars = max_chars
+        self.size = 0
+        self._pages: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename: str, page_numbers: Iterable[int]) -> Dict[int, str]:
+        """
+        Texts of the given pages of ``filename``, by page number.
+
+        Raises:
+            FileNotFoundError: If a page isn't cached and the PDF is gone.
+            IndexError: If a page number is out of range.
+        """
+        found: Dict[int, str] = {}
+        missing = []
+        with self._lock:
+            for number in set(page_numbers):
+                text = self._pages.get((filename, number))
+                if text is None:
+                    missing.append(number)
+                else:
+                    self._pages.move_to_end((filename, number))
+                    found[number] = text
+        if not missing:
+            return found
+
+        loaded = PDFLoader(self.directory / filename).load_pages(missing)
+        found.update(loaded)
+        with self._lock:
+            for number, text in loaded.items():
+                previous = self._pages.pop((filename, number), None)
+                if previous is not None:
+                    self.size -= len(previous)
+                self._pages[(filename, number)] = text
+                self.size += len(text)
+            while self.size > self.max_chars and self._pages:
+                _, text = self._pages.popitem(last=False)
+                self.size -= len(text)
+        return found
+
+
+class Retriever:
+    """
+    Answers a question with the indexed chunks closest to it: embeds the
+    question, searches the vector store and returns each hit with the text
+    stored alongside it. Chunks indexed without their text are read back
+    from their PDF through the span recorded at ingestion.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        embedder: Union[TextEmbedder, QueryEmbeddingCache],
+        pages: Optional[PageCache] = None,
+        mode: str = RETRIEVAL_MODE,
+    ):
+        """
+        Args:
+            store (VectorStore): Store the documents were ingested into.
+            embedder (Union[TextEmbedder, QueryEmbeddingCache]): Embedder of
+                the same deployment, usually behind a question cache.
+            pages (PageCache, optional): Source of page texts; defaults to a
+                cache over ``UPLOAD_DIR``.
+            mode (str): Default ranking, one of ``RETRIEVAL_MODES``.
+
+        Raises:
+            ValueError: If ``mode`` is unknown.
+        """
+        self.store = store
+        self.embedder = embedder
+        self.pages = pages or PageCache()
+        self.mode = _check_mode(mode)
+
+    def retrieve(
+        self,
+        question: str,
+        k: int = RETRIEVAL_TOP_K,
+        filter: Optional[Iterable[str]] = None,
+        mode: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Timings]:
+        """
+        Finds the ``k`` chunks that best answer ``question``.
+
+        Args:
+            question (str): The question.
+            k (int): Number of passages.
+            filter (Iterable[str], optional): Only search these filenames.
+            mode (str, optional): Ranking for this question, one of
+                ``RETRIEVAL_MODES``; defaults to the retriever's ``mode``.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Timings]: Passages nearest first (see
+            :meth:`passages`), and the milliseconds spent embedding the
+            question (``embed``), searching (``search``) and reading the
+            passages' text (``fetch``).
+
+        Raises:
+            ValueError: If ``mode`` is unknown.
+            RuntimeError: If the question can't be embedded.
+        """
+        mode = _check_mode(mode or self.mode)
+        t0 = time.perf_counter()
+        query = self.embedder.embed_array([question])
+        t1 = time.perf_counter()
+        if mode == HYBRID:
+            hits = self.store.hybrid_search(query[0], question, k, filter)
+        else:
+            [hits] = self.store.search(query, k, filter)
+        t2 = time.perf_counter()
+        passages = self.passages(hits)
+        t3 = time.perf_counter()
+        timings = {
+            "embed": (t1 - t0) * 1e3,
+            "search": (t2 - t1) * 1e3,
+            "fetch": (t3 - t2) * 1e3,
+        }
+        return passages, timings
+
+    def passages(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        The ``filename``, ``chunk_id``, ``page``, ``score`` and ``text`` of
+        each hit; ``score`` is a distance for vector hits and a fused score
+        (higher is better) for hybrid ones. Hits without a stored ``text``
+        are sliced out of their PDF; ``text`` is None for those indexed
+        without a span or whose PDF is no longer available.
+        """
+        pages_by_file: Dict[str, Set[int]] = {}
+        for hit in hits:
+            if hit.get("text") is not None:
+                continue
+            span = _span(hit["metadata"])
+            if span is not None:
+                pages = pages_by_file.setdefault(hit["metadata"]["filename"], set())
+                pages.update(range(span[0], span[2] + 1))
+
+        texts: Dict[str, Dict[int, str]] = {}
+        for filename, numbers in pages_by_file.items():
+            try:
+                texts[filename] = self.pages.get(filename, numbers)
+            except (FileNotFoundError, IndexError):
+                continue
+
+        passages = []
+        for hit in hits:
+            metadata = hit["metadata"]
+            filename = metadata.get("filename")
+            span = _span(metadata)
+            text = hit.get("text")
+            if text is None and span is not None and filename in texts:
+                text = span_text(texts[filename], span)
+            passages.append(
+                {
+                    "filename": filename,
+                    "chunk_id": metadata.get("chunk_id"),
+                    "page": metadata.get("page"),
+                    "score": hit["score"],
+                    "text": text,
+                }
+            )
+        return passages
+
+
+def _check_mode(mode: str) -> str:
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(
+            f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}."
+        )
+    return mode
+
+
+def _span(metadata: Dict[str, Any]) -> Optional[Tuple[int, int, int, int]]:
+    fields = ("page", "start", "end_page", "end")
+    if not isinstance(metadata.get("filename"), str):
+        return None
+    if any(not isinstance(metadata.get(f), int) for f in fields):
+        return None
+    page, start, end_page, end = (metadata[f] for f in fields)
+    return page, start, end_page, end
+
+
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Retriever:
+    """
+    Returns the process-wide retriever over the process-wide vector store
+    and embedder, creating them on first use. Questions are embedded
+    through a :class:`QueryEmbeddingCache`, backed by the shared embedding
+    cache unless ``QUERY_CACHE_SHARED`` is off.
+
+    Raises:
+        ValueError: If no embedding deployment is configured, or
+            ``RETRIEVAL_MODE`` is unknown.
+    """
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            shared = get_embedding_cache() if QUERY_CACHE_SHARED else None
+            queries = QueryEmbeddingCache(get_embedder(), shared=shared)
+            _retriever = Retriever(get_indexer(), queries)
+        return _retriever
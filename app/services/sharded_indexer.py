@@ -0,0 +1,511 @@
+import heapq
+import itertools
+import json
+import threading
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from . import index_factory
+from .document_index import DOC_INDEX_CACHE_MB
+from .indexer import (
+    COMPACT_TOMBSTONE_FRACTION,
+    CURRENT_FILE,
+    FAISSIndexer,
+    _atomic_write_bytes,
+)
+from .lexical_index import TermCounts
+from .vector_store import VectorStore
+from .write_ahead_log import wal_generations, wal_path
+
+MANIFEST_FILE = "shards.json"
+
+
+class ShardedIndexer(VectorStore):
+    """
+    Splits the corpus over several :class:`FAISSIndexer` shards, assigning
+    each document to a shard by a hash of its filename, and searches all
+    shards in parallel, merging their top-k hits into a global top-k.
+
+    Shards are searched on a thread pool: FAISS releases the GIL while it
+    searches, so the shards run on separate cores without their vectors
+    being copied into other processes. Each shard is persisted in its own
+    directory and can be loaded on its own with :meth:`load_shard`.
+
+    Hit ids are global: a shard-local id ``i`` of shard ``s`` is reported as
+    ``i * num_shards + s``.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        num_shards: int = 4,
+        storage: str = index_factory.VECTOR_STORAGE,
+        compact_fraction: float = COMPACT_TOMBSTONE_FRACTION,
+    ):
+        """
+        Args:
+            dim (int): Dimensionality of the embedding vectors.
+            num_shards (int): Number of shards.
+            storage (str): Vector storage mode of each shard; see
+                :class:`FAISSIndexer`.
+            compact_fraction (float): Tombstone fraction at which a shard is
+                compacted in the background.
+
+        Raises:
+            ValueError: If num_shards is less than 1.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        shards = [
+            FAISSIndexer(dim, storage=storage, compact_fraction=compact_fraction)
+            for _ in range(num_shards)
+        ]
+        self._attach(dim, shards, dirty=set(range(num_shards)))
+
+    @classmethod
+    def _from_shards(
+        cls, dim: int, shards: List[FAISSIndexer], dirty: Set[int]
+    ) -> "ShardedIndexer":
+        # Wraps loaded shards without building empty ones first
+        indexer = cls.__new__(cls)
+        indexer._attach(dim, shards, dirty)
+        return indexer
+
+    def _attach(self, dim: int, shards: List[FAISSIndexer], dirty: Set[int]) -> None:
+        self.dim = dim
+        self.shards = shards
+        self._share_doc_index_budget()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(shards), thread_name_prefix="index-shard"
+        )
+        self._lock = threading.Lock()
+        # Shards changed since they were last saved
+        self._dirty: Set[int] = dirty
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, filename: str) -> int:
+        """
+        Shard holding ``filename``; stable across processes and restarts.
+        """
+        return zlib.crc32(filename.encode("utf-8")) % self.num_shards
+
+    @property
+    def index_type(self) -> str:
+        return self.shards[0].index_type
+
+    @property
+    def vector_storage(self) -> str:
+        return self.shards[0].vector_storage
+
+    @property
+    def tombstone_fraction(self) -> float:
+        total = sum(len(shard.metadata_store) for shard in self.shards)
+        dead = sum(shard.metadata_store.tombstones for shard in self.shards)
+        return dead / total if total else 0.0
+
+    @property
+    def wal_bytes(self) -> int:
+        return sum(shard.wal_bytes for shard in self.shards)
+
+    def add_embeddings(
+        self,
+        embeddings: Union[List[List[float]], np.ndarray],
+        metadata: List[Dict[str, Any]],
+        texts: Optional[Sequence[Optional[Union[str, TermCounts]]]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Adds each embedding, and its text when given, to the shard of its
+        ``filename``; entries without a filename go to shard 0.
+
+        Returns:
+            Tuple[int, int]: Number of vectors and metadata entries added.
+
+        Raises:
+            ValueError: If lengths don't match or inputs are empty.
+        """
+        if len(embeddings) == 0 or not metadata:
+            raise ValueError("Vectors and metadata must not be empty.")
+        if len(embeddings) != len(metadata):
+            raise ValueError("Vectors and metadata must be of same length.")
+        if texts is not None and len(texts) != len(metadata):
+            raise ValueError("Texts and metadata must be of same length.")
+
+        vectors = np.asarray(embeddings, dtype="float32")
+        groups: Dict[int, List[int]] = {}
+        for i, entry in enumerate(metadata):
+            filename = entry.get("filename")
+            shard = self.shard_for(filename) if isinstance(filename, str) else 0
+            groups.setdefault(shard, []).append(i)
+        for shard, rows in groups.items():
+            self._mark_dirty(shard)
+            self.shards[shard].add_embeddings(
+                vectors[rows],
+                [metadata[i] for i in rows],
+                None if texts is None else [texts[i] for i in rows],
+            )
+        return len(embeddings), len(metadata)
+
+    def search(
+        self,
+        queries: Union[List[List[float]], np.ndarray],
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Searches every shard in parallel (only the shards holding ``filter``'s
+        documents, when given) and merges their hits.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, the global top ``k``
+            hits nearest first, as returned by :meth:`FAISSIndexer.search`
+            with a global ``id`` and the ``shard`` they came from.
+        """
+        vectors = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.dim)
+        targets: Dict[int, Optional[List[str]]] = {}
+        if filter is None:
+            targets = dict.fromkeys(range(self.num_shards))
+        else:
+            for filename in filter:
+                names = targets.setdefault(self.shard_for(filename), [])
+                if names is not None:
+                    names.append(filename)
+        if not targets:
+            return [[] for _ in range(len(vectors))]
+
+        futures = {
+            shard: self._executor.submit(
+                self.shards[shard].search, vectors, k, names, nprobe, ef_search
+            )
+            for shard, names in targets.items()
+        }
+        per_shard = []
+        for shard, future in futures.items():
+            hits = future.result()
+            for query_hits in hits:
+                for hit in query_hits:
+                    hit["id"] = hit["id"] * self.num_shards + shard
+                    hit["shard"] = shard
+            per_shard.append(hits)
+
+        # Each shard's hits are sorted already, so a k-way merge suffices
+        return [
+            list(
+                itertools.islice(
+                    heapq.merge(*query_hits, key=lambda hit: hit["score"]), k
+                )
+            )
+            for query_hits in zip(*per_shard)
+        ]
+
+    def search_text(
+        self, query: str, k: int = 5, filter: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyword-searches every shard in parallel (only the shards holding
+        ``filter``'s documents, when given) and merges their hits. BM25
+        statistics are per shard, which with documents spread by hash
+        matches corpus-wide statistics closely enough for ranking.
+
+        Returns:
+            List[Dict[str, Any]]: The global top ``k`` hits best first, as
+            returned by :meth:`FAISSIndexer.search_text` with a global
+            ``id`` and the ``shard`` they came from.
+        """
+        targets: Dict[int, Optional[List[str]]] = {}
+        if filter is None:
+            targets = dict.fromkeys(range(self.num_shards))
+        else:
+            for filename in filter:
+                names = targets.setdefault(self.shard_for(filename), [])
+                if names is not None:
+                    names.append(filename)
+
+        futures = {
+            shard: self._executor.submit(
+                self.shards[shard].search_text, query, k, names
+            )
+            for shard, names in targets.items()
+        }
+        per_shard = []
+        for shard, future in futures.items():
+            hits = future.result()
+            for hit in hits:
+                hit["id"] = hit["id"] * self.num_shards + shard
+                hit["shard"] = shard
+            per_shard.append(hits)
+        return list(
+            itertools.islice(heapq.merge(*per_shard, key=lambda hit: -hit["score"]), k)
+        )
+
+    def has_document(self, filename: str) -> bool:
+        return self._shard(filename).has_document(filename)
+
+    def document_fingerprints(self, filename: str) -> Counter[str]:
+        return self._shard(filename).document_fingerprints(filename)
+
+    def remove_document(self, filename: str) -> int:
+        self._mark_dirty(self.shard_for(filename))
+        return self._shard(filename).remove_document(filename)
+
+    def remove_ids(self, ids: Union[List[int], np.ndarray]) -> int:
+        """
+        Deletes the vectors with the given global ids.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        removed = 0
+        for shard in np.unique(ids % self.num_shards).tolist():
+            self._mark_dirty(shard)
+            local = ids[ids % self.num_shards == shard] // self.num_shards
+            removed += self.shards[shard].remove_ids(local)
+        return removed
+
+    def replace_document(
+        self,
+        previous: str,
+        filename: str,
+        carried: List[Dict[str, Any]],
+        texts: Optional[Sequence[str]] = None,
+    ) -> int:
+        """
+        Retires ``previous`` in favour of ``filename``, like
+        :meth:`FAISSIndexer.replace_document`. When the two versions live on
+        different shards, the carried vectors are copied to the new
+        version's shard, with ``texts`` (the carried chunks' texts) for its
+        keyword index, before the old version is removed.
+
+        Across shards this is not atomic: searches may briefly see both
+        versions. If removing the old version fails, the copies are removed
+        again before the error is raised.
+
+        Returns:
+            int: Number of stale vectors removed.
+
+        Raises:
+            ValueError: If a carried fingerprint is no longer indexed for
+                ``previous``; nothing is changed in that case.
+        """
+        source, target = self.shard_for(previous), self.shard_for(filename)
+        self._mark_dirty(source)
+        if source == target:
+            return self.shards[source].replace_document(
+                previous, filename, carried, texts
+            )
+
+        self._mark_dirty(target)
+        copies = None
+        if carried:
+            vectors = self.shards[source].carried_vectors(previous, carried)
+            entries = [{**entry, "filename": filename} for entry in carried]
+            shard = self.shards[target]
+            # Held so the copies' positions are known to be the last ones
+            with shard._lock.write():
+                shard.add_embeddings(vectors, entries, texts)
+                end = len(shard.metadata_store)
+                copies = shard.metadata_store.ids(np.arange(end - len(carried), end))
+        try:
+            return self.shards[source].remove_document(previous) - len(carried)
+        except Exception:
+            if copies is not None:
+                self.shards[target].remove_ids(copies)
+            raise
+
+    def compact(self) -> int:
+        """
+        Compacts every shard.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        return sum(shard.compact() for shard in self.shards)
+
+    def rebuild(
+        self,
+        index_type: str = index_factory.AUTO,
+        train_size: Optional[int] = None,
+        storage: str = index_factory.VECTOR_STORAGE,
+    ) -> List[str]:
+        """
+        Rebuilds every shard; ``auto`` picks a type per shard from its size.
+
+        Returns:
+            List[str]: The factory string of each shard's new index.
+        """
+        specs = []
+        for shard, indexer in enumerate(self.shards):
+            self._mark_dirty(shard)
+            specs.append(indexer.rebuild(index_type, train_size, storage))
+        return specs
+
+    def save(self, directory: Union[str, Path]) -> int:
+        """
+        Persists every shard changed since the last save, each as a snapshot
+        in its own ``shard-<n>`` directory, plus a manifest of the layout.
+
+        Returns:
+            int: Number of shards written.
+        """
+        directory = Path(directory)
+        self._write_manifest(directory, self.dim, self.num_shards)
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        written = 0
+        try:
+            for shard, indexer in enumerate(self.shards):
+                shard_dir = self.shard_directory(directory, shard)
+                if shard in dirty or not (shard_dir / "CURRENT").exists():
+                    indexer.save(shard_dir)
+                    written += 1
+                dirty.discard(shard)
+        except Exception:
+            # The shards not yet written still need saving
+            with self._lock:
+                self._dirty |= dirty
+            raise
+        return written
+
+    @classmethod
+    def load(
+        cls, directory: Union[str, Path], mmap: bool = True, wal: bool = False
+    ) -> "ShardedIndexer":
+        """
+        Reopens every shard saved by :meth:`save`, replaying each shard's
+        write-ahead log.
+
+        Args:
+            directory (Union[str, Path]): Directory holding the shards.
+            mmap (bool): Memory-map the vectors.
+            wal (bool): Keep logging each shard's changes; see
+                :meth:`FAISSIndexer.open`.
+
+        Raises:
+            FileNotFoundError: If ``directory`` holds no sharded index.
+        """
+        directory = Path(directory)
+        manifest = json.loads((directory / MANIFEST_FILE).read_text())
+        dim, num_shards = manifest["dim"], manifest["num_shards"]
+        # Shards with logged changes get a new snapshot on the next save, so
+        # their logs aren't replayed again on every start
+        dirty = {
+            shard
+            for shard in range(num_shards)
+            if cls._has_logged_changes(cls.shard_directory(directory, shard))
+        }
+        shards = [
+            cls.load_shard(directory, shard, dim=dim, mmap=mmap, wal=wal)
+            for shard in range(num_shards)
+        ]
+        return cls._from_shards(dim, shards, dirty)
+
+    @classmethod
+    def load_shard(
+        cls,
+        directory: Union[str, Path],
+        shard: int,
+        dim: int = 1536,
+        mmap: bool = True,
+        wal: bool = False,
+    ) -> FAISSIndexer:
+        """
+        Loads a single shard, e.g. to serve it from its own process.
+        """
+        shard_dir = cls.shard_directory(directory, shard)
+        return FAISSIndexer.open(shard_dir, dim, mmap, wal=wal)
+
+    @classmethod
+    def open(
+        cls,
+        directory: Union[str, Path],
+        dim: int = 1536,
+        num_shards: int = 4,
+        mmap: bool = True,
+    ) -> "ShardedIndexer":
+        """
+        Loads the sharded index in ``directory`` or starts an empty one.
+        Every shard logs its changes to a write-ahead log in its directory.
+
+        Raises:
+            ValueError: If the persisted index has a different dimensionality
+                or shard count, or isn't sharded.
+        """
+        directory = Path(directory)
+        if not (directory / MANIFEST_FILE).exists():
+            if (directory / CURRENT_FILE).exists() or wal_generations(directory):
+                raise ValueError(
+                    f"{directory} holds an unsharded index; reshard it with "
+                    "scripts/migrate_index.py --shards."
+                )
+            # Record the layout before the shards log anything
+            cls._write_manifest(directory, dim, num_shards)
+        indexer = cls.load(directory, mmap=mmap, wal=True)
+        if indexer.dim != dim:
+            raise ValueError(f"Persisted index has dim={indexer.dim}, expected {dim}.")
+        if indexer.num_shards != num_shards:
+            raise ValueError(
+                f"Persisted index has {indexer.num_shards} shards, expected "
+                f"{num_shards}; reshard it with scripts/migrate_index.py --shards."
+            )
+        return indexer
+
+    @classmethod
+    def from_indexers(
+        cls, indexers: Iterable[FAISSIndexer], dim: int, num_shards: int
+    ) -> "ShardedIndexer":
+        """
+        Redistributes the live vectors of ``indexers`` (an unsharded index,
+        or the shards of a sharded one) with their texts (or keyword index
+        entries) over ``num_shards`` new flat shards. Vectors get new ids.
+        """
+        sharded = cls(dim=dim, num_shards=num_shards)
+        for indexer in indexers:
+            for vectors, metadata, texts in indexer.live_batches():
+                if metadata:
+                    sharded.add_embeddings(vectors, metadata, texts)
+        return sharded
+
+    @staticmethod
+    def shard_directory(directory: Union[str, Path], shard: int) -> Path:
+        return Path(directory) / f"shard-{shard}"
+
+    @staticmethod
+    def _has_logged_changes(shard_dir: Path) -> bool:
+        return any(
+            wal_path(shard_dir, generation).stat().st_size
+            for generation in wal_generations(shard_dir)
+        )
+
+    @staticmethod
+    def _write_manifest(directory: Path, dim: int, num_shards: int) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {"num_shards": num_shards, "dim": dim}
+        _atomic_write_bytes(directory / MANIFEST_FILE, json.dumps(manifest).encode())
+
+    def _share_doc_index_budget(self) -> None:
+        # Documents are spread evenly, so each shard gets an even share of
+        # the memory for per-document sub-indexes
+        for shard in self.shards:
+            shard.doc_indexes.max_bytes = DOC_INDEX_CACHE_MB * 2**20 // self.num_shards
+
+    def _shard(self, filename: str) -> FAISSIndexer:
+        return self.shards[self.shard_for(filename)]
+
+    def _mark_dirty(self, shard: int) -> None:
+        with self._lock:
+            self._dirty.add(shard)
+
+
+# Either kind of index, for code that works with both
+Indexer = Union[FAISSIndexer, ShardedIndexer]
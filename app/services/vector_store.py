@@ -0,0 +1,211 @@
+import os
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Embedding vectors, one per row
+Vectors = Union[List[List[float]], np.ndarray]
+
+# Hits taken from each ranking before fusing them in hybrid_search
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Rank offset of reciprocal rank fusion; damps the weight of the top ranks
+RRF_K = 60
+
+
+class VectorStore(ABC):
+    """
+    Abstract base class for the stores chunk embeddings are indexed in: the
+    in-process FAISS indexes and a Qdrant collection.
+
+    Every vector carries its chunk's metadata, whose ``filename`` names the
+    document it belongs to. Hits are dicts with the vector's ``id``, its
+    ``score`` (squared L2 distance, lower is closer), the chunk's
+    ``metadata`` and its ``text``, or None if it was added without one.
+
+    Stores that keep a keyword index of the chunk texts answer
+    :meth:`search_text`, which :meth:`hybrid_search` fuses with
+    :meth:`search`; stores without one reject it and override
+    :meth:`hybrid_search`.
+    """
+
+    @abstractmethod
+    def add_embeddings(
+        self,
+        embeddings: Vectors,
+        metadata: List[Dict[str, Any]],
+        texts: Optional[Sequence[Any]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Adds embeddings and the metadata of each, and each chunk's text to
+        the keyword index of stores that keep one.
+
+        Returns:
+            Tuple[int, int]: Number of vectors and metadata entries added.
+
+        Raises:
+            ValueError: If lengths don't match or inputs are empty.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        queries: Vectors,
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Finds the ``k`` nearest chunks to each query.
+
+        Args:
+            queries (Vectors): Query vectors, one per row.
+            k (int): Number of hits per query.
+            filter (Iterable[str], optional): Only return chunks of these
+                filenames.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, its hits nearest first.
+        """
+
+    @abstractmethod
+    def search_text(
+        self, query: str, k: int = 5, filter: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds the ``k`` chunks whose text best matches ``query``'s words.
+
+        Returns:
+            List[Dict[str, Any]]: Hits best first; their ``score`` is higher
+            for better matches.
+
+        Raises:
+            ValueError: If the store keeps no keyword index.
+        """
+
+    def hybrid_search(
+        self,
+        query_vector: Vectors,
+        query: str,
+        k: int = 5,
+        filter: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds the ``k`` best chunks for one query by fusing the nearest
+        vectors with the best keyword matches, so a chunk that quotes an
+        exact part number or error code ranks well even if its embedding
+        isn't among the nearest.
+
+        Args:
+            query_vector (Vectors): Embedding of ``query``.
+            query (str): Query text.
+            k (int): Number of hits.
+            filter (Iterable[str], optional): Only return chunks of these
+                filenames.
+
+        Returns:
+            List[Dict[str, Any]]: Hits best first, as returned by
+            :meth:`search` or :meth:`search_text`, with ``score`` replaced
+            by the fused score (higher is better).
+        """
+        if filter is not None:
+            filter = list(filter)
+        depth = max(k, HYBRID_CANDIDATES)
+        [vector_hits] = self.search(
+            np.asarray(query_vector, dtype=np.float32).reshape(1, -1), depth, filter
+        )
+        text_hits = self.search_text(query, depth, filter)
+        return reciprocal_rank_fusion([vector_hits, text_hits], k)
+
+    @abstractmethod
+    def has_document(self, filename: str) -> bool:
+        """
+        Whether any vectors for ``filename`` are indexed.
+        """
+
+    @abstractmethod
+    def document_fingerprints(self, filename: str) -> Counter[str]:
+        """
+        Counts the chunk fingerprints indexed for ``filename``.
+        """
+
+    @abstractmethod
+    def remove_document(self, filename: str) -> int:
+        """
+        Deletes every vector indexed for ``filename``.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+
+    @abstractmethod
+    def replace_document(
+        self,
+        previous: str,
+        filename: str,
+        carried: List[Dict[str, Any]],
+        texts: Optional[Sequence[str]] = None,
+    ) -> int:
+        """
+        Retires ``previous`` in favour of its new version ``filename``: the
+        vectors matching a ``carried`` entry's fingerprint are relabelled
+        with that entry and the rest of ``previous`` is removed. ``texts``
+        are the carried chunks' texts, for stores that need to re-add them
+        to a keyword index.
+
+        Returns:
+            int: Number of stale vectors removed.
+
+        Raises:
+            ValueError: If a carried fingerprint is no longer indexed for
+                ``previous``; nothing is changed in that case.
+        """
+
+    @abstractmethod
+    def save(self, directory: Union[str, Path]) -> int:
+        """
+        Snapshots the store to ``directory``, for stores kept in memory.
+
+        Returns:
+            int: The snapshot generation written, or for a sharded index the
+            number of shards written.
+        """
+
+    @property
+    def wal_bytes(self) -> int:
+        """
+        Size of the changes logged since the last :meth:`save`.
+        """
+        return 0
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[List[Dict[str, Any]]], limit: int, rrf_k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Fuses rankings of the same store's hits: each hit scores
+    ``1 / (rrf_k + rank)`` in every ranking it appears in (ranks from 1),
+    summed. Only ranks count, so scores on different scales (distances,
+    BM25) need no normalising.
+
+    Args:
+        rankings (Iterable[List[Dict[str, Any]]]): Hit lists, best first;
+            hits are matched across lists by ``id``.
+        limit (int): Number of hits to return.
+        rrf_k (int): Rank offset.
+
+    Returns:
+        List[Dict[str, Any]]: The best ``limit`` hits, best first, each the
+        hit from the first ranking it appeared in with ``score`` set to its
+        fused score.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "score": 0.0}
+            entry["score"] += 1.0 / (rrf_k + rank)
+    # sorted() is stable, so ties keep the order hits were first seen in
+    return sorted(fused.values(), key=lambda hit: -hit["score"])[:limit]
@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Iterator, List, Tuple, Union
+
+import numpy as np
+
+# Record kinds
+ADD = 1  # header: metadata entries and texts; payload: their float32 vectors
+REMOVE = 2  # header: stable ids of the removed vectors
+RELABEL = 3  # header: stable ids and the metadata that replaces theirs
+
+# Frame: kind, header length, payload length, CRC-32 of header + payload
+_FRAME = struct.Struct("<BIII")
+_WAL_NAME = re.compile(r"wal-(\d+)\.log$")
+
+Record = Tuple[int, Any, bytes]
+
+
+def wal_path(directory: Union[str, Path], generation: int) -> Path:
+    """
+    Log of the changes made after snapshot ``generation`` was taken.
+    """
+    return Path(directory) / f"wal-{generation}.log"
+
+
+def wal_generations(directory: Union[str, Path]) -> List[int]:
+    """
+    Generations of the logs in ``directory``, oldest first.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    found = (_WAL_NAME.match(path.name) for path in directory.iterdir())
+    return sorted(int(match.group(1)) for match in found if match)
+
+
+class WriteAheadLog:
+    """
+    Append-only log of the changes made to an index since its last snapshot.
+
+    Each record is framed with its length and a CRC-32 and is fsynced before
+    :meth:`append` returns, so an acknowledged change survives the process
+    being killed. A record torn by a crash mid-write is detected on
+    :meth:`replay` and cut off, together with anything after it.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path (Union[str, Path]): Log file; created if missing, appended to
+                otherwise.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "ab")
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes logged so far.
+        """
+        with self._lock:
+            return self._file.tell()
+
+    def append(
+        self, kind: int, header: Any, payload: Union[bytes, memoryview] = b""
+    ) -> None:
+        """
+        Durably appends one record.
+
+        Args:
+            kind (int): ``ADD``, ``REMOVE`` or ``RELABEL``.
+            header (Any): JSON-serialisable description of the change.
+            payload (Union[bytes, memoryview]): Raw data that goes with it,
+                e.g. a view of a C-contiguous vector array, written without
+                copying it.
+        """
+        payload = memoryview(payload).cast("B")
+        header_bytes = json.dumps(
+            header, separators=(",", ":"), default=_json_default
+        ).encode("utf-8")
+        crc = zlib.crc32(payload, zlib.crc32(header_bytes))
+        frame = _FRAME.pack(kind, len(header_bytes), len(payload), crc)
+        with self._lock:
+            self._file.write(frame)
+            self._file.write(header_bytes)
+            self._file.write(payload)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def replay(path: Union[str, Path]) -> Iterator[Record]:
+        """
+        Yields the intact records of a log in the order they were written.
+        If the log ends in a torn or corrupt record, the file is truncated to
+        the last intact one once the records have been consumed.
+
+        Yields:
+            Tuple[int, Any, bytes]: Kind, decoded header and payload.
+        """
+        path = Path(path)
+        data = path.read_bytes()
+        offset = 0
+        while offset + _FRAME.size <= len(data):
+            kind, header_len, payload_len, crc = _FRAME.unpack_from(data, offset)
+            start = offset + _FRAME.size
+            end = start + header_len + payload_len
+            if end > len(data):
+                break
+            header_bytes = data[start : start + header_len]
+            payload = data[start + header_len : end]
+            if zlib.crc32(payload, zlib.crc32(header_bytes)) != crc:
+                break
+            yield kind, json.loads(header_bytes), payload
+            offset = end
+        if offset < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+
+
+def _json_default(value: Any) -> Any:
+    # Metadata may hold NumPy scalars, e.g. span offsets
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
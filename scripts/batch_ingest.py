@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+DocuWise batch ingest CLI
+
+Queues many saved files for ingestion in one request and waits for them:
+  - POST /api/ingest/batch  {"filenames": [...]} or {"directory": "<dir>"}
+  - Poll GET /api/ingest/batches/<batch_id> until done/failed
+  - Print one line per file; exit 1 if any file failed
+
+Filenames and directories are relative to the server's upload directory.
+
+Examples:
+  python scripts/batch_ingest.py policy_20250803_233323.pdf manual_20250804.pdf
+  python scripts/batch_ingest.py --directory corpus
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, NoReturn
+
+import requests
+
+ROOT: str = os.getenv("ROOT_URL", "http://localhost:8000").rstrip("/")
+INGEST_EP: str = os.getenv("INGEST_EP", "/api/ingest")
+INGEST_TIMEOUT: float = float(os.getenv("INGEST_TIMEOUT", "3600"))
+
+
+def die(msg: str, code: int = 1) -> NoReturn:
+    print(f"❌ {msg}")
+    sys.exit(code)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingest many saved PDFs at once.")
+    parser.add_argument("filenames", nargs="*", help="Saved filenames to ingest")
+    parser.add_argument("--directory", help="Ingest every PDF under this directory")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every chunk instead of reusing a previous version's",
+    )
+    parser.add_argument(
+        "--poll", type=float, default=2.0, help="Seconds between status checks"
+    )
+    args = parser.parse_args()
+    if not args.filenames and args.directory is None:
+        parser.error("give filenames or --directory")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    body: Dict[str, Any] = {
+        "filenames": args.filenames,
+        "directory": args.directory,
+        "incremental": not args.full,
+    }
+
+    batch_url = f"{ROOT}{INGEST_EP}/batch"
+    t0 = time.time()
+    r = requests.post(batch_url, json=body, timeout=60)
+    if not r.ok:
+        die(f"Batch ingest failed: {r.status_code} {r.text}")
+    batch: Dict[str, Any] = r.json()
+    total = batch.get("total_files", 0)
+    print(f"⚙️  Queued {total} files in {len(batch.get('jobs', []))} jobs")
+
+    status_url = f"{ROOT}{INGEST_EP}/batches/{batch.get('batch_id')}"
+    while batch.get("status") not in ("done", "failed"):
+        if time.time() - t0 > INGEST_TIMEOUT:
+            die(f"Batch did not finish within {INGEST_TIMEOUT:.0f}s")
+        time.sleep(args.poll)
+        r = requests.get(status_url, timeout=10)
+        if not r.ok:
+            die(f"Batch status failed: {r.status_code} {r.text}")
+        batch = r.json()
+        print(
+            f"   status={batch.get('status')} "
+            f"finished={batch.get('succeeded', 0) + batch.get('failed', 0)}/{total}"
+        )
+    dt = time.time() - t0
+
+    files: List[Dict[str, Any]] = batch.get("files", [])
+    for result in files:
+        if "error" in result:
+            print(f"❌ {result.get('filename')}: {result.get('error')}")
+        else:
+            print(
+                f"✅ {result.get('filename')}: {result.get('message')} "
+                f"chunks={result.get('chunks_ingested', 0)} "
+                f"reused={result.get('chunks_reused', 0)}"
+            )
+    for job in batch.get("jobs", []):
+        if job.get("status") == "failed":
+            print(f"❌ job {job.get('filename')}: {job.get('error')}")
+
+    print(
+        f"📦 {batch.get('succeeded', 0)} succeeded, {batch.get('failed', 0)} failed "
+        f"of {total} in {dt:.1f}s"
+    )
+    if batch.get("status") == "failed" or batch.get("failed") or len(files) < total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
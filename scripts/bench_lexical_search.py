@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Keyword search benchmark: LexicalIndex build time, size and query latency.
+
+Indexes a synthetic corpus of chunks of 60 words drawn from a Zipf-
+distributed vocabulary (as natural text is), each ending in a unique part
+number, and reports:
+  - the time to index it and the size of the compressed postings lists
+    against the raw text
+  - per-query latency for an exact part number, a part number mixed with
+    common and rare words, and a query of only the most common words (the
+    slow case: every postings list read is long)
+
+Usage:
+  python scripts/bench_lexical_search.py [num_chunks] [--k 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from app.services.lexical_index import LexicalIndex
+
+VOCABULARY = 50_000
+WORDS_PER_CHUNK = 60
+BATCH_SIZE = 10_000
+REPEATS = 100
+
+
+def make_texts(rng: np.random.Generator, start: int, count: int) -> List[str]:
+    ranks = np.minimum(rng.zipf(1.2, (count, WORDS_PER_CHUNK)), VOCABULARY) - 1
+    return [
+        " ".join(f"w{r}" for r in row) + f" part PN-{start + i:07d}"
+        for i, row in enumerate(ranks.tolist())
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("num_chunks", nargs="?", type=int, default=200_000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = LexicalIndex()
+    text_bytes = 0
+    build = 0.0
+    for start in range(0, args.num_chunks, BATCH_SIZE):
+        count = min(BATCH_SIZE, args.num_chunks - start)
+        texts = make_texts(rng, start, count)
+        text_bytes += sum(len(t) for t in texts)
+        t0 = time.perf_counter()
+        index.add(np.arange(start, start + count), texts)
+        build += time.perf_counter() - t0
+    print(
+        f"Chunks: {args.num_chunks:,}, built in {build:.1f}s, postings "
+        f"{index.nbytes / 2**20:.1f} MB (text {text_bytes / 2**20:.1f} MB)"
+    )
+
+    last = args.num_chunks - 1
+    queries = [
+        f"PN-{last // 2:07d}",
+        f"error pn-{last:07d} w40000",
+        "w0 w1 w2",
+    ]
+    print(f"{'query':<32}{'ms':>8}  top ids")
+    for query in queries:
+        index.search(query, args.k)
+        t0 = time.perf_counter()
+        for _ in range(REPEATS):
+            ids, _ = index.search(query, args.k)
+        ms = (time.perf_counter() - t0) / REPEATS * 1e3
+        print(f"{query:<32}{ms:>8.2f}  {ids[:3].tolist()}")
+
+
+if __name__ == "__main__":
+    main()
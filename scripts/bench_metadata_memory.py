@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Metadata memory benchmark: bytes per vector for the index metadata.
+
+Builds the same synthetic metadata (the fields the ingest pipeline writes,
+spread over documents of 200 chunks) twice:
+  - as a list of dicts, the store FAISSIndexer used before
+  - as a MetadataStore (columnar arrays + interned filenames)
+and reports the memory each one allocates, measured with tracemalloc, plus
+the time to gather a top-10 result.
+
+Usage:
+  python scripts/bench_metadata_memory.py [num_vectors]
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import pathlib
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from app.services.metadata_store import MetadataStore
+
+CHUNKS_PER_DOC = 200
+
+
+def make_entries(n: int) -> List[Dict[str, Any]]:
+    entries = []
+    for i in range(n):
+        doc, chunk = divmod(i, CHUNKS_PER_DOC)
+        entries.append(
+            {
+                "filename": f"policy_{doc:06d}_20250803_233323.pdf",
+                "chunk_id": chunk,
+                "fingerprint": hashlib.sha256(str(i).encode()).hexdigest()[:16],
+                "page": chunk // 3,
+                "start": (chunk % 3) * 450,
+                "end_page": chunk // 3,
+                "end": (chunk % 3) * 450 + 500,
+            }
+        )
+    return entries
+
+
+def measure(build: Callable[[], Any]) -> Tuple[Any, int]:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Vectors: {n:,} ({n // CHUNKS_PER_DOC:,} documents)")
+
+    # Filenames come from a shared source in both cases, as they would when
+    # read back from a snapshot; only the per-entry structures are counted.
+    source = make_entries(n)
+
+    def as_dicts() -> List[Dict[str, Any]]:
+        return [
+            {
+                **entry,
+                "filename": "".join(entry["filename"]),  # a fresh str per entry
+                "fingerprint": "".join(entry["fingerprint"]),
+            }
+            for entry in source
+        ]
+
+    dicts, dict_bytes = measure(as_dicts)
+    store, store_bytes = measure(lambda: MetadataStore.from_dicts(source))
+
+    ids = np.random.default_rng(0).integers(0, n, size=10)
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        [dicts[i] for i in ids]
+    dict_gather = (time.perf_counter() - t0) / 1000
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        store.gather(ids)
+    store_gather = (time.perf_counter() - t0) / 1000
+
+    print(f"{'store':<18}{'bytes/vector':>14}{'total MB':>12}{'top-10 gather':>16}")
+    for name, total, gather in (
+        ("list of dicts", dict_bytes, dict_gather),
+        ("MetadataStore", store_bytes, store_gather),
+    ):
+        print(
+            f"{name:<18}{total / n:>14.1f}{total / 2**20:>12.1f}"
+            f"{gather * 1e6:>13.1f} µs"
+        )
+    print(f"Reduction: {dict_bytes / store_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
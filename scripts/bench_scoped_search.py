@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Scoped search benchmark: latency of searches filtered to one document.
+
+Builds flat indexes of growing size over synthetic documents of 200 chunks
+and times single-query searches restricted to one document:
+  - through the document's sub-index (the default)
+  - through the main index with an ID selector (sub-indexes disabled),
+    which still scans every vector
+Results are checked to match.
+
+Usage:
+  python scripts/bench_scoped_search.py [max_vectors] [--dim 384] [--k 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import faiss
+import numpy as np
+
+from app.services.indexer import FAISSIndexer
+
+CHUNKS_PER_DOC = 200
+NUM_QUERIES = 200
+
+
+def make_metadata(start: int, n: int) -> List[Dict[str, Any]]:
+    return [
+        {"filename": f"doc_{i // CHUNKS_PER_DOC:06d}.pdf", "chunk_id": i}
+        for i in range(start, start + n)
+    ]
+
+
+def measure_ms(
+    indexer: FAISSIndexer, queries: np.ndarray, k: int, filenames: List[str]
+) -> float:
+    t0 = time.perf_counter()
+    for query, filename in zip(queries, filenames):
+        indexer.search_vectors(query[None, :], k, filter=[filename])
+    return (time.perf_counter() - t0) / len(queries) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("max_vectors", nargs="?", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    indexer = FAISSIndexer(dim=args.dim)
+    print(f"Documents of {CHUNKS_PER_DOC} chunks, {args.dim} dims, k={args.k}")
+    print(f"{'vectors':>10}{'sub-index ms':>14}{'main index ms':>15}")
+
+    size = 0
+    target = 10_000
+    while target <= args.max_vectors:
+        n = target - size
+        vectors = rng.random((n, args.dim), dtype="float32")
+        indexer.add_embeddings(vectors, make_metadata(size, n))
+        size = target
+
+        queries = rng.random((NUM_QUERIES, args.dim), dtype="float32")
+        docs = rng.integers(0, size // CHUNKS_PER_DOC, NUM_QUERIES)
+        filenames = [f"doc_{d:06d}.pdf" for d in docs.tolist()]
+        # Build the sub-indexes of documents that were evicted or predate them
+        measure_ms(indexer, queries, args.k, filenames)
+        scoped = measure_ms(indexer, queries, args.k, filenames)
+        expected = indexer.search_vectors(queries[:1], args.k, filter=filenames[:1])
+
+        budget = indexer.doc_indexes.max_bytes
+        indexer.doc_indexes.max_bytes = 0
+        indexer.doc_indexes.clear()
+        full = measure_ms(indexer, queries, args.k, filenames)
+        found = indexer.search_vectors(queries[:1], args.k, filter=filenames[:1])
+        indexer.doc_indexes.max_bytes = budget
+        if not np.array_equal(found[1], expected[1]):
+            print("⚠️  sub-index and main index returned different neighbours")
+
+        print(f"{size:>10,}{scoped:>14.3f}{full:>15.3f}")
+        target *= 10
+
+
+if __name__ == "__main__":
+    main()
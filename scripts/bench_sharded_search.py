@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Sharded search benchmark: queries per second vs shard count.
+
+Splits the same synthetic corpus (documents of 200 chunks) over 1, 2, 4, ...
+shards of a ShardedIndexer, up to the number of cores, and measures:
+  - QPS of single-query searches issued one after another (latency-bound:
+    each query is split across the shards and runs on several cores)
+  - QPS with several concurrent clients
+FAISS's own OpenMP threading is disabled so the scaling comes from sharding.
+Results are checked to match the single-shard top-k.
+
+Usage:
+  python scripts/bench_sharded_search.py [num_vectors] [--dim 384] [--k 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import faiss
+import numpy as np
+
+from app.services.sharded_indexer import ShardedIndexer
+
+CHUNKS_PER_DOC = 200
+NUM_QUERIES = 200
+CLIENTS = 8
+
+
+def make_metadata(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"filename": f"doc_{i // CHUNKS_PER_DOC:06d}.pdf", "chunk_id": i}
+        for i in range(n)
+    ]
+
+
+def measure_qps(
+    indexer: ShardedIndexer, queries: np.ndarray, k: int, clients: int
+) -> float:
+    def run(q: np.ndarray) -> None:
+        indexer.search(q[None, :], k=k)
+
+    t0 = time.perf_counter()
+    if clients == 1:
+        for q in queries:
+            run(q)
+    else:
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(run, queries))
+    return len(queries) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("num_vectors", nargs="?", type=int, default=500_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    vectors = rng.random((args.num_vectors, args.dim), dtype="float32")
+    queries = rng.random((NUM_QUERIES, args.dim), dtype="float32")
+    metadata = make_metadata(args.num_vectors)
+    print(
+        f"Vectors: {args.num_vectors:,} x {args.dim} dims, k={args.k}, "
+        f"{os.cpu_count()} cores"
+    )
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_shards:
+        counts.append(counts[-1] * 2)
+
+    baseline = None
+    print(
+        f"{'shards':>7}{'QPS (1 client)':>16}"
+        f"{f'QPS ({CLIENTS} clients)':>18}{'speedup':>9}"
+    )
+    for num_shards in counts:
+        indexer = ShardedIndexer(dim=args.dim, num_shards=num_shards)
+        indexer.add_embeddings(vectors, metadata)
+
+        found = [
+            [h["metadata"]["chunk_id"] for h in hits]
+            for hits in indexer.search(queries[:20], k=args.k)
+        ]
+        if baseline is None:
+            baseline = found
+        elif found != baseline:
+            print(f"⚠️  {num_shards} shards returned different neighbours")
+
+        serial = measure_qps(indexer, queries, args.k, 1)
+        concurrent = measure_qps(indexer, queries, args.k, CLIENTS)
+        if num_shards == 1:
+            single = serial
+        print(
+            f"{num_shards:>7}{serial:>16.1f}{concurrent:>18.1f}{serial / single:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
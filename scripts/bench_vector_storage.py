@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Vector storage report: memory vs recall of quantised storage modes.
+
+Indexes the same synthetic embeddings (unit vectors around a few hundred
+topic centroids, like text embeddings) in a flat index with each storage
+mode FAISSIndexer supports:
+  - float32 (IndexFlatL2, the baseline)
+  - fp16    (SQfp16, 2 bytes per dimension)
+  - sq8     (SQ8, 1 byte per dimension, ranges trained on the corpus)
+and reports bytes per vector, recall@k of each mode against the float32
+results, and the time per query.
+
+Usage:
+  python scripts/bench_vector_storage.py [num_vectors] [--dim 1536] [--k 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import faiss
+import numpy as np
+
+from app.services import index_factory
+
+NUM_TOPICS = 256
+NUM_QUERIES = 200
+
+
+def make_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((NUM_TOPICS, dim), dtype="float32")
+    vectors = centroids[rng.integers(0, NUM_TOPICS, n)]
+    vectors += 0.5 * rng.standard_normal((n, dim), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(f, e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("num_vectors", nargs="?", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    n, dim, k = args.num_vectors, args.dim, args.k
+    vectors = make_vectors(n + NUM_QUERIES, dim)
+    corpus, queries = vectors[:n], vectors[n:]
+    print(f"Vectors: {n:,} x {dim} dims, {NUM_QUERIES} queries, k={k}")
+
+    baseline = None
+    print(
+        f"{'storage':<10}{'bytes/vector':>14}{'total MB':>12}{'recall':>9}{'query':>12}"
+    )
+    for storage in (index_factory.FLOAT32, index_factory.FP16, index_factory.SQ8):
+        # SQ8 is trained on a sample of the whole corpus, as a migration would
+        spec = index_factory.index_spec(index_factory.FLAT, dim, n, storage)
+        index = index_factory.build_index(spec, corpus)
+        size = len(faiss.serialize_index(index))
+
+        t0 = time.perf_counter()
+        _, found = index.search(queries, k)
+        per_query = (time.perf_counter() - t0) / NUM_QUERIES
+        if baseline is None:
+            baseline = found
+        print(
+            f"{storage:<10}{size / n:>14.1f}{size / 2**20:>12.1f}"
+            f"{recall(found, baseline):>9.3f}{per_query * 1e3:>9.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ DocuWise Ingest E2E (tailored to your API, mypy-clean)
 Flow:
   - GET /health
   - POST /api/upload (multipart/form-data; field 'file')
-  - POST /api/ingest?filename=<saved_as>
+  - POST /api/ingest?filename=<saved_as>  (202 Accepted + job)
+  - Poll GET /api/ingest/jobs/<job_id> until done/failed
   - Assert: 'message' == 'Ingestion successful' and chunks_ingested > 0
 """
 
@@ -24,6 +25,7 @@ ROOT: str = os.getenv("ROOT_URL", "http://localhost:8000").rstrip("/")
 SAMPLE_PATH: str = os.getenv("SAMPLE_PATH", "data/sample.pdf")
 UPLOAD_EP: str = os.getenv("UPLOAD_EP", "/api/upload")
 INGEST_EP: str = os.getenv("INGEST_EP", "/api/ingest")
+INGEST_TIMEOUT: float = float(os.getenv("INGEST_TIMEOUT", "300"))
 
 SAMPLE = pathlib.Path(SAMPLE_PATH)
 
@@ -83,18 +85,33 @@ def main() -> None:
     params: Dict[str, str] = {"filename": saved_as}
     print(f"⚙️  Ingesting via {ingest_url} ? {params}")
     t0 = time.time()
-    r = requests.post(ingest_url, params=params, timeout=120)
-    dt = time.time() - t0
+    r = requests.post(ingest_url, params=params, timeout=30)
     if not r.ok:
         die(f"Ingest failed: {r.status_code} {r.text}")
 
     try:
-        ing: Dict[str, Any] = r.json()
+        job: Dict[str, Any] = r.json()
     except Exception:
         die(f"Ingest returned non-JSON: {r.text[:200]}")
 
-    print("📦 Ingest response:")
-    print(json.dumps(ing, indent=2, ensure_ascii=False))
+    job_url = f"{ingest_url}/jobs/{job.get('job_id')}"
+    print(f"⏳ Polling {job_url} …")
+    while job.get("status") not in ("done", "failed"):
+        if time.time() - t0 > INGEST_TIMEOUT:
+            die(f"Ingest job did not finish within {INGEST_TIMEOUT:.0f}s: {job}")
+        time.sleep(1)
+        r = requests.get(job_url, timeout=10)
+        if not r.ok:
+            die(f"Job status failed: {r.status_code} {r.text}")
+        job = r.json()
+        print(f"   status={job.get('status')} progress={job.get('progress')}")
+    dt = time.time() - t0
+
+    print("📦 Ingest job:")
+    print(json.dumps(job, indent=2, ensure_ascii=False))
+    if job.get("status") == "failed":
+        die(f"Ingest job failed: {job.get('error')}")
+    ing: Dict[str, Any] = job.get("result") or {}
 
     # 5) assertions
     msg = str(ing.get("message", "")).lower()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Migrates the persisted FAISS index to another index type or shard count.
+
+Loads the current snapshot and replays its write-ahead log, rebuilds the
+vectors into the requested index (IVF lists are trained on a sample of the
+vectors), and saves the result as a new snapshot generation, which retires
+the log. Vector positions and metadata are unchanged, so the server picks
+the new index up on its next start.
+
+With --shards, the live vectors are first redistributed over that many
+shards (1 merges a sharded index back into one); they get new ids. Set
+FAISS_SHARDS to the same count for the server.
+
+Run it while the server is stopped: changes it logs meanwhile would be lost.
+
+Examples:
+  python scripts/migrate_index.py                 # pick from the vector count
+  python scripts/migrate_index.py ivf_flat
+  python scripts/migrate_index.py flat --storage fp16
+  python scripts/migrate_index.py "IVF16384,PQ96" --train-size 500000
+  python scripts/migrate_index.py --shards 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.services import index_factory
+from app.services.indexer import FAISSIndexer
+from app.services.sharded_indexer import (
+    MANIFEST_FILE,
+    Indexer,
+    ShardedIndexer,
+)
+
+INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "data/index")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS index.")
+    parser.add_argument(
+        "index_type",
+        nargs="?",
+        default=os.getenv("FAISS_INDEX_TYPE", index_factory.AUTO),
+        help="auto, flat, ivf_flat, ivf_pq, hnsw or a faiss index_factory string",
+    )
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--train-size", type=int, help="Training sample size")
+    parser.add_argument(
+        "--storage",
+        default=index_factory.VECTOR_STORAGE,
+        choices=[index_factory.FLOAT32, index_factory.FP16, index_factory.SQ8],
+        help="Store vectors as float32, or quantised to fp16 or int8",
+    )
+    parser.add_argument("--shards", type=int, help="Redistribute over N shards")
+    return parser.parse_args()
+
+
+def load(index_dir: str) -> Indexer:
+    if (pathlib.Path(index_dir) / MANIFEST_FILE).exists():
+        return ShardedIndexer.load(index_dir, mmap=False)
+    return FAISSIndexer.load(index_dir, mmap=False)
+
+
+def shards_of(indexer: Indexer) -> List[FAISSIndexer]:
+    return indexer.shards if isinstance(indexer, ShardedIndexer) else [indexer]
+
+
+def reshard(indexer: Indexer, num_shards: int) -> Indexer:
+    if num_shards > 1:
+        return ShardedIndexer.from_indexers(shards_of(indexer), indexer.dim, num_shards)
+    merged = FAISSIndexer(dim=indexer.dim)
+    for shard in shards_of(indexer):
+        for vectors, metadata, texts in shard.live_batches():
+            if metadata:
+                merged.add_embeddings(vectors, metadata, texts)
+    return merged
+
+
+def main() -> None:
+    args = parse_args()
+    t0 = time.perf_counter()
+    indexer = load(args.index_dir)
+    shards = shards_of(indexer)
+    print(
+        f"Loaded {sum(s.index.ntotal for s in shards):,} vectors in "
+        f"{len(shards)} shard(s) ({indexer.index_type}, {indexer.vector_storage}) "
+        f"in {time.perf_counter() - t0:.1f}s"
+    )
+
+    if args.shards is not None and args.shards != len(shards):
+        t0 = time.perf_counter()
+        indexer = reshard(indexer, args.shards)
+        print(f"Resharded into {args.shards} in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    try:
+        specs = indexer.rebuild(
+            args.index_type, train_size=args.train_size, storage=args.storage
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    spec = ", ".join(sorted({specs} if isinstance(specs, str) else set(specs)))
+    print(f"Built {spec} in {time.perf_counter() - t0:.1f}s")
+
+    if isinstance(indexer, ShardedIndexer):
+        written = indexer.save(args.index_dir)
+        print(f"✅ Saved {written} shard(s) to {args.index_dir}")
+    else:
+        (pathlib.Path(args.index_dir) / MANIFEST_FILE).unlink(missing_ok=True)
+        generation = indexer.save(args.index_dir)
+        print(f"✅ Saved snapshot generation {generation} to {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
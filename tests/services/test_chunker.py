@@ -1,6 +1,12 @@
 import pytest
 
-from app.services.chunker import TextChunker
+from app.services.chunker import (
+    ChunkSpans,
+    TextChunker,
+    TokenChunker,
+    estimate_tokens,
+    make_chunker,
+)
 
 
 def test_chunker_splits_text_with_overlap():
@@ -51,3 +57,81 @@ def test_chunker_handles_short_texts():
 
     assert len(chunks) == 1
     assert chunks[0] == short_text
+
+
+def test_token_chunker_cuts_at_sentence_ends():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(40))
+    chunker = TokenChunker(max_tokens=30, overlap_tokens=0)
+    chunks = chunker.chunk([text])
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 30 + 5 for chunk in chunks)
+    assert all(chunk.endswith("ends here.") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_token_chunker_merges_page_tails():
+    pages = ["First page body. Short tail.", "", "Second page continues."]
+    chunks = TokenChunker(max_tokens=100).chunk(pages)
+
+    assert chunks == ["First page body. Short tail.\nSecond page continues."]
+    assert TokenChunker(max_tokens=100).chunk_spans(pages)[0] == (0, 0, 2, 22)
+
+
+def test_token_chunker_prefers_paragraph_ends():
+    text = "A" * 120 + ".\n\nNext paragraph starts here."
+    chunks = TokenChunker(max_tokens=40).chunk([text])
+
+    assert chunks == ["A" * 120 + ".", "Next paragraph starts here."]
+
+
+def test_token_chunker_overlaps_whole_sentences():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven."
+    chunks = TokenChunker(max_tokens=12, overlap_tokens=4).chunk([text])
+
+    assert chunks == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine. Ten eleven.",
+    ]
+
+
+def test_token_chunker_splits_long_sentences_at_words():
+    text = "word " * 500
+    chunks = TokenChunker(max_tokens=50).chunk([text])
+
+    assert all(len(chunk) <= 50 * 4 for chunk in chunks)
+    assert all(not chunk.startswith(" ") for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_token_chunker_raises_on_invalid_config():
+    with pytest.raises(ValueError):
+        TokenChunker(max_tokens=10, overlap_tokens=10)
+
+
+def test_make_chunker_modes():
+    assert isinstance(make_chunker("chars"), TextChunker)
+    assert isinstance(make_chunker("tokens"), TokenChunker)
+    with pytest.raises(ValueError):
+        make_chunker("words")
+
+
+def test_chunk_spans_point_into_pages():
+    pages = ["abcdefghij" * 30, "", "klmnopqrst" * 10]
+    chunker = TextChunker(chunk_size=200, overlap=50)
+    spans = chunker.chunk_spans(pages)
+
+    assert isinstance(spans, ChunkSpans)
+    assert spans.spans.dtype == "int32"
+    assert spans.page.tolist() == [0, 0, 2]
+    assert spans[1] == (0, 150, 0, 300)
+    assert list(spans.texts(pages)) == chunker.chunk(pages)
+
+
+def test_chunk_spans_from_generator_keep_page_numbers():
+    pages = ["", "Only the second page has text."]
+    chunker = TextChunker(chunk_size=100, overlap=10)
+
+    assert list(chunker.iter_spans_with_text(iter(pages))) == [
+        ((1, 0, 1, 30), "Only the second page has text.")
+    ]
@@ -1,5 +1,10 @@
+import base64
+import threading
+import time
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 
 from app.services.embedder import TextEmbedder
@@ -38,8 +43,9 @@ def test_embed_returns_embeddings(mock_env):
     embedder = TextEmbedder(embedding_client=mock_client)
     result = embedder.embed(["Hello world", "Test embedding"])
 
-    assert result == [[0.1, 0.2], [0.3, 0.4]]
+    assert result == [pytest.approx([0.1, 0.2]), pytest.approx([0.3, 0.4])]
     mock_client.create.assert_called_once()
+    assert mock_client.create.call_args.kwargs["encoding_format"] == "base64"
 
 
 @patch(
@@ -53,3 +59,97 @@ def test_embed_raises_on_failure(mock_env):
 
     with pytest.raises(RuntimeError, match=r"Embedding failed: API error"):
         embedder.embed(["fail this"])
+
+
+def _fake_client(delay: float = 0.0):
+    """Client returning [position-in-request, len(text)] vectors, shuffled."""
+    state = {"in_flight": 0, "max_in_flight": 0, "calls": 0}
+    lock = threading.Lock()
+
+    def create(model, input, **kwargs):
+        with lock:
+            state["calls"] += 1
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        time.sleep(delay)
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text))])
+            for i, text in enumerate(input)
+        ]
+        with lock:
+            state["in_flight"] -= 1
+        return SimpleNamespace(data=list(reversed(data)))
+
+    return SimpleNamespace(create=create), state
+
+
+def test_embed_splits_batches_and_keeps_input_order(mock_env):
+    client, state = _fake_client(delay=0.01)
+    embedder = TextEmbedder(
+        embedding_client=client, max_batch_size=3, max_concurrency=2
+    )
+    texts = ["x" * n for n in range(1, 11)]
+
+    result = embedder.embed(texts)
+
+    assert result == [[float(n)] for n in range(1, 11)]
+    assert state["calls"] == 4
+    assert state["max_in_flight"] <= 2
+
+
+def test_split_batches_respects_token_budget(mock_env):
+    embedder = TextEmbedder(
+        embedding_client=MagicMock(), max_batch_size=100, max_batch_tokens=30
+    )
+    texts = ["a" * 40, "b" * 40, "c" * 400, "d" * 4]
+
+    batches = embedder.split_batches(texts)
+
+    # 11 estimated tokens each for the first two, the oversized text alone
+    assert batches == [["a" * 40, "b" * 40], ["c" * 400], ["d" * 4]]
+
+
+def test_embed_empty_input_makes_no_request(mock_env):
+    client = MagicMock()
+    assert TextEmbedder(embedding_client=client).embed([]) == []
+    client.create.assert_not_called()
+
+
+def test_embed_array_decodes_base64_into_one_array(mock_env):
+    vectors = np.arange(12, dtype="<f4").reshape(4, 3)
+
+    def create(model, input, encoding_format=None):
+        assert encoding_format == "base64"
+        start = int(input[0])
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(
+                    index=i, embedding=base64.b64encode(vectors[start + i]).decode()
+                )
+                for i in range(len(input))
+            ]
+        )
+
+    embedder = TextEmbedder(
+        embedding_client=SimpleNamespace(create=create), max_batch_size=2
+    )
+
+    result = embedder.embed_array(["0", "1", "2", "3"])
+
+    assert result.dtype == np.float32 and result.flags.c_contiguous
+    np.testing.assert_array_equal(result, vectors)
+    # Later calls know the dimension and decode into a preallocated array
+    np.testing.assert_array_equal(embedder.embed_array(["2"]), vectors[2:3])
+
+
+@pytest.mark.parametrize("indexes", [[0, 0, 2], [0, 1, 3], [-1, 0, 1]])
+def test_embed_rejects_responses_with_wrong_indexes(mock_env, indexes):
+    def create(model, input, **kwargs):
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[1.0]) for i in indexes]
+        )
+
+    embedder = TextEmbedder(embedding_client=SimpleNamespace(create=create))
+
+    with pytest.raises(RuntimeError, match="one embedding per input index 0-2"):
+        embedder.embed_array(["a", "b", "c"], use_cache=False)
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.embedder import TextEmbedder
+from app.services.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    yield cache
+    cache.close()
+
+
+def test_cache_roundtrip_and_counters(cache):
+    key = EmbeddingCache.make_key("hello", "docuwise-embeddings")
+    assert cache.get_many([key]) == {}
+
+    cache.put_many({key: [0.5, 0.25]})
+
+    assert cache.get_many([key])[key].tolist() == [0.5, 0.25]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == 8
+
+
+def test_key_depends_on_deployment_and_dimensions():
+    base = EmbeddingCache.make_key("hello", "small")
+    assert base != EmbeddingCache.make_key("hello", "large")
+    assert base != EmbeddingCache.make_key("hello", "small", dimensions=256)
+    assert base == EmbeddingCache.make_key("hello", "small")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_bytes=40)
+    keys = [EmbeddingCache.make_key(str(i), "d") for i in range(4)]
+    cache.put_many({keys[0]: [0.0] * 4, keys[1]: [1.0] * 4})
+    cache.get_many([keys[0]])  # keys[1] is now the least recently used
+    cache.put_many({keys[2]: [2.0] * 4, keys[3]: [3.0] * 4})
+
+    remaining = cache.get_many(keys)
+    assert keys[1] not in remaining
+    assert cache.stats()["bytes"] <= 40
+    cache.close()
+
+
+def test_embedder_only_requests_uncached_texts(cache, monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "docuwise-embeddings")
+    requested = []
+
+    def create(model, input, **kwargs):
+        requested.extend(input)
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(index=i, embedding=[float(len(t))])
+                for i, t in enumerate(input)
+            ]
+        )
+
+    embedder = TextEmbedder(
+        embedding_client=SimpleNamespace(create=create), cache=cache
+    )
+
+    assert embedder.embed(["aa", "bbb", "aa"]) == [[2.0], [3.0], [2.0]]
+    assert requested == ["aa", "bbb"]
+
+    assert embedder.embed(["bbb", "cccc"]) == [[3.0], [4.0]]
+    assert requested == ["aa", "bbb", "cccc"]
+
+    assert embedder.embed_array(["aa"], use_cache=False).tolist() == [[2.0]]
+    assert requested == ["aa", "bbb", "cccc", "aa"]
@@ -0,0 +1,196 @@
+# tests/services/test_index_factory.py
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services import index_factory
+from app.services.indexer import FAISSIndexer
+
+
+def _vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype="float32")
+
+
+def _indexer(vectors):
+    indexer = FAISSIndexer(dim=vectors.shape[1])
+    indexer.add_embeddings(
+        vectors.tolist(),
+        [{"filename": f"doc{i % 5}.pdf", "chunk_id": i} for i in range(len(vectors))],
+    )
+    return indexer
+
+
+def test_choose_index_type_by_vector_count():
+    assert index_factory.choose_index_type(1000) == index_factory.FLAT
+    flat_max = index_factory.FLAT_MAX_VECTORS
+    assert index_factory.choose_index_type(flat_max + 1) == index_factory.IVF_FLAT
+    ivf_max = index_factory.IVF_FLAT_MAX_VECTORS
+    assert index_factory.choose_index_type(ivf_max + 1) == index_factory.IVF_PQ
+
+
+def test_index_spec_sizes_lists_and_subquantizers():
+    assert index_factory.index_spec("auto", 1536, 1000) == "Flat"
+    assert index_factory.index_spec("ivf_flat", 1536, 1_000_000) == "IVF4096,Flat"
+    assert index_factory.index_spec("ivf_pq", 1536, 1_000_000) == "IVF4096,PQ96"
+    # Every list keeps enough points to train on
+    assert index_factory.nlist_for(1000) * index_factory.MIN_POINTS_PER_LIST <= 1000
+    assert index_factory.index_spec("IVF8,SQ8", 16, 1000) == "IVF8,SQ8"
+
+
+def test_training_sample_is_bounded():
+    vectors = _vectors(500)
+    sample = index_factory.training_sample(vectors, 100)
+    assert sample.shape == (100, 16)
+    assert len(index_factory.training_sample(vectors, 1000)) == 500
+
+
+def test_build_index_rejects_too_few_training_vectors():
+    with pytest.raises(ValueError, match="needs at least"):
+        index_factory.build_index("IVF64,Flat", _vectors(100))
+
+
+def test_rebuild_to_ivf_keeps_positions_and_metadata():
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    _, exact = indexer.search_vectors(vectors[:20], k=1)
+
+    spec = indexer.rebuild("ivf_flat")
+
+    assert spec.startswith("IVF")
+    assert indexer.index_type == index_factory.IVF_FLAT
+    assert indexer.index.ntotal == 2000
+    # Visiting every list is exact
+    nlist = index_factory.nlist_for(2000)
+    _, found = indexer.search_vectors(vectors[:20], k=1, nprobe=nlist)
+    assert (found == exact).all()
+    assert indexer.metadata_store[int(found[3, 0])]["chunk_id"] == 3
+
+
+def test_search_params_per_query():
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    indexer.rebuild("ivf_flat")
+
+    params = index_factory.search_params(indexer.index, nprobe=4)
+    assert params.nprobe == 4
+    assert index_factory.search_params(indexer.index, ef_search=32) is None
+
+    indexer.rebuild("hnsw")
+    params = index_factory.search_params(indexer.index, ef_search=32)
+    assert params.efSearch == 32
+    _, found = indexer.search_vectors(vectors[:5], k=1, ef_search=128)
+    assert found[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq", "hnsw"])
+def test_compaction_renumbers_ann_indexes(index_type):
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    indexer.rebuild(index_type)
+
+    assert indexer.remove_document("doc1.pdf") == 400
+    indexer.compact()
+
+    assert indexer.index.ntotal == 1600
+    kept = [i for i in range(2000) if i % 5 != 1]
+    _, found = indexer.search_vectors(vectors[kept[:50]], k=1, nprobe=64, ef_search=256)
+    positions = found[:, 0].tolist()
+    hits = sum(
+        indexer.metadata_store[p]["chunk_id"] == kept[i]
+        for i, p in enumerate(positions)
+    )
+    assert hits >= (40 if index_type == "ivf_pq" else 50)
+
+
+def test_ivf_snapshot_reloads_writable(tmp_path):
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    indexer.rebuild("ivf_flat")
+    indexer.save(tmp_path)
+
+    loaded = FAISSIndexer.load(tmp_path)
+    assert loaded.index_type == index_factory.IVF_FLAT
+    loaded.add_embeddings(
+        _vectors(1, seed=1).tolist(), [{"filename": "new.pdf", "chunk_id": 0}]
+    )
+    assert loaded.index.ntotal == 2001
+
+
+def test_index_spec_storage_modes():
+    assert index_factory.index_spec("flat", 16, 1000, "fp16") == "SQfp16"
+    assert index_factory.index_spec("flat", 16, 1000, "sq8") == "SQ8"
+    assert index_factory.index_spec("ivf_flat", 16, 1000, "sq8") == "IVF16,SQ8"
+    assert index_factory.index_spec("hnsw", 16, 1000, "fp16").endswith("_SQfp16")
+    with pytest.raises(ValueError, match="Unknown vector storage"):
+        index_factory.index_spec("flat", 16, 1000, "int4")
+
+
+@pytest.mark.parametrize("storage", ["fp16", "sq8"])
+def test_quantised_storage_indexes_and_removes(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(index_factory, "QUANTIZER_TRAIN_MIN_VECTORS", 100)
+    vectors = _vectors(500)
+    indexer = FAISSIndexer(dim=16, storage=storage)
+    indexer.add_embeddings(
+        vectors.tolist(),
+        [{"filename": f"doc{i % 5}.pdf", "chunk_id": i} for i in range(500)],
+    )
+    assert indexer.vector_storage == storage
+    assert indexer.index_type == index_factory.FLAT
+
+    indexer.remove_document("doc1.pdf")
+    indexer.save(tmp_path)
+    loaded = FAISSIndexer.load(tmp_path)
+
+    assert loaded.vector_storage == storage
+    kept = [i for i in range(500) if i % 5 != 1]
+    _, found = loaded.search_vectors(vectors[kept], k=1)
+    chunk_ids = [loaded.metadata_store[p]["chunk_id"] for p in found[:, 0].tolist()]
+    assert sum(c == i for c, i in zip(chunk_ids, kept)) >= 0.95 * len(kept)
+
+
+def test_sq8_trains_on_corpus_not_tiny_first_batch():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5000, 64)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    indexer = FAISSIndexer(dim=64, storage="sq8")
+    metadata = [{"filename": "doc.pdf", "chunk_id": i} for i in range(5000)]
+    indexer.add_embeddings(vectors[:1], metadata[:1])
+    assert indexer.vector_storage == "float32"
+    indexer.add_embeddings(vectors[1:], metadata[1:])
+    assert indexer.vector_storage == "sq8"
+
+    queries = vectors[:100] + 0.05 * rng.standard_normal((100, 64)).astype("float32")
+    exact = faiss.IndexFlatL2(64)
+    exact.add(vectors)
+    _, expected = exact.search(queries, 10)
+    _, found = indexer.search_vectors(queries, k=10)
+    recall = np.mean([len(set(e) & set(f)) / 10 for e, f in zip(expected, found)])
+    assert recall >= 0.9
+
+
+def test_rebuild_changes_storage():
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    indexer.rebuild("ivf_flat", storage="sq8")
+    assert indexer.vector_storage == "sq8"
+    assert indexer.index_type == index_factory.IVF_FLAT
+    indexer.rebuild("flat", storage="float32")
+    assert isinstance(indexer.index, faiss.IndexFlat)
+
+
+def test_filtered_search_keeps_index_settings():
+    vectors = _vectors(2000)
+    indexer = _indexer(vectors)
+    indexer.rebuild("ivf_flat")
+    indexer.index.nprobe = 7
+
+    selector = faiss.IDSelectorBatch(np.arange(10, dtype="int64"))
+    params = index_factory.search_params(indexer.index, selector=selector)
+    assert params.nprobe == 7
+
+    nlist = index_factory.nlist_for(2000)
+    hits = indexer.search(vectors[:3], k=5, filter=["doc2.pdf"], nprobe=nlist)
+    for query_hits in hits:
+        assert len(query_hits) == 5
+        assert {h["metadata"]["filename"] for h in query_hits} == {"doc2.pdf"}
@@ -1,5 +1,9 @@
 # tests/services/test_indexer.py
 
+import threading
+
+import faiss
+import numpy as np
 import pytest
 
 from app.services.indexer import FAISSIndexer
@@ -20,7 +24,7 @@ def test_indexer_adds_embeddings_and_metadata():
     assert num_vectors == 2
     assert num_metadata == 2
     assert indexer.index.ntotal == 2
-    assert indexer.metadata_store == metadata
+    assert list(indexer.metadata_store) == metadata
 
 
 def test_indexer_raises_on_length_mismatch():
@@ -38,3 +42,484 @@ def test_indexer_empty_input():
     indexer = FAISSIndexer(dim=4)
     with pytest.raises(ValueError):
         indexer.add_embeddings([], [])
+
+
+def test_indexer_save_and_load_roundtrip(tmp_path):
+    embeddings = [[0.1, 0.2, 0.3, 0.4], [0.4, 0.3, 0.2, 0.1]]
+    metadata = [
+        {"filename": "sample.pdf", "chunk_id": 0},
+        {"filename": "sample.pdf", "chunk_id": 1},
+    ]
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(embeddings, metadata)
+    indexer.save(tmp_path)
+
+    loaded = FAISSIndexer.load(tmp_path)
+    assert loaded.index.ntotal == 2
+    assert list(loaded.metadata_store) == metadata
+
+    # Appending to a memory-mapped index and saving again replaces the snapshot
+    loaded.add_embeddings(
+        [[0.0, 0.0, 0.0, 1.0]], [{"filename": "b.pdf", "chunk_id": 0}]
+    )
+    assert loaded.save(tmp_path) == 2
+    assert FAISSIndexer.load(tmp_path).index.ntotal == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "CURRENT",
+        "index-2.faiss",
+        "metadata-2.npz",
+    ]
+
+
+def test_indexer_concurrent_saves_write_distinct_generations(tmp_path):
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings([[0.1, 0.2, 0.3, 0.4]], [{"filename": "a.pdf"}])
+    generations = []
+    threads = [
+        threading.Thread(target=lambda: generations.append(indexer.save(tmp_path)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(generations) == [1, 2, 3, 4]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "CURRENT",
+        "index-4.faiss",
+        "metadata-4.npz",
+    ]
+
+
+def test_indexer_open_creates_empty_index(tmp_path):
+    indexer = FAISSIndexer.open(tmp_path / "missing", dim=4)
+    assert indexer.index.ntotal == 0
+
+    with pytest.raises(FileNotFoundError):
+        FAISSIndexer.load(tmp_path / "missing")
+
+
+def test_indexer_open_rejects_dim_mismatch(tmp_path):
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings([[0.1, 0.2, 0.3, 0.4]], [{"filename": "a.pdf"}])
+    indexer.save(tmp_path)
+
+    with pytest.raises(ValueError):
+        FAISSIndexer.open(tmp_path, dim=8)
+
+
+def test_indexer_open_recovers_changes_from_write_ahead_log(tmp_path):
+    indexer = FAISSIndexer.open(tmp_path, dim=4)
+    indexer.add_embeddings(
+        [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]],
+        [
+            {"filename": "v1.pdf", "chunk_id": 0, "fingerprint": "a"},
+            {"filename": "v1.pdf", "chunk_id": 1, "fingerprint": "b"},
+        ],
+    )
+    assert indexer.save(tmp_path) == 1
+    assert indexer.wal_bytes == 0
+    # Changes after the snapshot are only in the log when the process dies
+    indexer.add_embeddings(
+        [[0.0, 0.0, 1.0, 0.0]], [{"filename": "other.pdf", "fingerprint": "c"}]
+    )
+    carried = [{"filename": "v2.pdf", "chunk_id": 0, "fingerprint": "a"}]
+    indexer.replace_document("v1.pdf", "v2.pdf", carried)
+    indexer.remove_document("other.pdf")
+    assert indexer.wal_bytes > 0
+
+    recovered = FAISSIndexer.open(tmp_path, dim=4)
+    assert not recovered.has_document("v1.pdf")
+    assert not recovered.has_document("other.pdf")
+    assert recovered.document_fingerprints("v2.pdf") == {"a": 1}
+    [[hit]] = recovered.search([[1.0, 0.0, 0.0, 0.0]], k=1)
+    assert hit["metadata"] == carried[0]
+
+    assert recovered.save(tmp_path) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "CURRENT",
+        "index-2.faiss",
+        "metadata-2.npz",
+        "wal-2.log",
+    ]
+
+
+def test_indexer_open_drops_torn_log_record(tmp_path):
+    indexer = FAISSIndexer.open(tmp_path, dim=4)
+    indexer.add_embeddings([[1.0, 0.0, 0.0, 0.0]], [{"filename": "a.pdf"}])
+    size = indexer.wal_bytes
+    indexer.add_embeddings([[0.0, 1.0, 0.0, 0.0]], [{"filename": "b.pdf"}])
+    # A crash mid-append leaves a partial record at the end
+    wal = tmp_path / "wal-0.log"
+    wal.write_bytes(wal.read_bytes()[:-3])
+
+    recovered = FAISSIndexer.open(tmp_path, dim=4)
+    assert recovered.has_document("a.pdf")
+    assert not recovered.has_document("b.pdf")
+    assert wal.stat().st_size == size
+
+
+def test_indexer_has_document():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings([[0.1, 0.2, 0.3, 0.4]], [{"filename": "a.pdf"}])
+
+    assert indexer.has_document("a.pdf")
+    assert not indexer.has_document("b.pdf")
+
+
+def test_indexer_replace_document_keeps_unchanged_vectors():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]],
+        [
+            {"filename": "v1.pdf", "chunk_id": 0, "fingerprint": "a"},
+            {"filename": "v1.pdf", "chunk_id": 1, "fingerprint": "b"},
+            {"filename": "other.pdf", "chunk_id": 0, "fingerprint": "a"},
+        ],
+    )
+    indexer.add_embeddings(
+        [[0.0, 0.0, 0.0, 1.0]],
+        [{"filename": "v2.pdf", "chunk_id": 1, "fingerprint": "c"}],
+    )
+    assert indexer.document_fingerprints("v1.pdf") == {"a": 1, "b": 1}
+
+    carried = [{"filename": "v2.pdf", "chunk_id": 0, "fingerprint": "a"}]
+    assert indexer.replace_document("v1.pdf", "v2.pdf", carried) == 1
+
+    indexer.compact()
+    assert indexer.index.ntotal == 3
+    assert not indexer.has_document("v1.pdf")
+    assert indexer.metadata_store[0] == carried[0]
+    assert indexer.index.reconstruct(0).tolist() == [1.0, 0.0, 0.0, 0.0]
+    assert [m["filename"] for m in indexer.metadata_store] == [
+        "v2.pdf",
+        "other.pdf",
+        "v2.pdf",
+    ]
+
+
+def test_indexer_replace_document_rejects_missing_fingerprint():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        [[1.0, 0.0, 0.0, 0.0]],
+        [{"filename": "v1.pdf", "chunk_id": 0, "fingerprint": "a"}],
+    )
+    carried = [{"filename": "v2.pdf", "chunk_id": 0, "fingerprint": "z"}]
+
+    with pytest.raises(ValueError):
+        indexer.replace_document("v1.pdf", "v2.pdf", carried)
+    assert indexer.has_document("v1.pdf")
+
+
+def test_indexer_remove_document():
+    indexer = FAISSIndexer(dim=4, compact_fraction=1.0)
+    indexer.add_embeddings(
+        [[0.1, 0.2, 0.3, 0.4], [0.4, 0.3, 0.2, 0.1]],
+        [{"filename": "a.pdf"}, {"filename": "b.pdf"}],
+    )
+
+    assert indexer.remove_document("a.pdf") == 1
+    # Tombstoned: gone from searches at once, still in memory
+    assert not indexer.has_document("a.pdf")
+    assert indexer.index.ntotal == 2
+    assert indexer.tombstone_fraction == 0.5
+    hits = indexer.search([[0.1, 0.2, 0.3, 0.4]], k=2)
+    assert [h["metadata"]["filename"] for h in hits[0]] == ["b.pdf"]
+
+    assert indexer.compact() == 1
+    assert indexer.index.ntotal == 1
+    assert list(indexer.metadata_store) == [{"filename": "b.pdf"}]
+    assert indexer.tombstone_fraction == 0.0
+
+
+def test_indexer_ids_survive_compaction(tmp_path):
+    indexer = FAISSIndexer(dim=4, compact_fraction=1.0)
+    indexer.add_embeddings(
+        [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]],
+        [{"filename": "a.pdf"}, {"filename": "b.pdf"}, {"filename": "c.pdf"}],
+    )
+    [[hit]] = indexer.search([[0.0, 0.0, 1.0, 0.0]], k=1)
+    assert (hit["id"], hit["position"]) == (2, 2)
+
+    assert indexer.remove_ids([0, 7]) == 1
+    assert indexer.remove_ids([0]) == 0
+    indexer.compact()
+    indexer.save(tmp_path)
+    loaded = FAISSIndexer.load(tmp_path)
+
+    [[hit]] = loaded.search([[0.0, 0.0, 1.0, 0.0]], k=1)
+    assert (hit["id"], hit["position"]) == (2, 1)
+    loaded.add_embeddings([[0.0, 0.0, 0.0, 1.0]], [{"filename": "d.pdf"}])
+    assert loaded.metadata_store.ids([2]).tolist() == [3]
+
+
+def test_indexer_compacts_in_background():
+    indexer = FAISSIndexer(dim=4, compact_fraction=0.5)
+    indexer.add_embeddings(
+        [[float(i), 0.0, 0.0, 0.0] for i in range(4)],
+        [{"filename": f"{i % 2}.pdf"} for i in range(4)],
+    )
+
+    indexer.remove_document("0.pdf")
+    indexer.wait_for_compaction()
+
+    assert indexer.index.ntotal == 2
+    assert [m["filename"] for m in indexer.metadata_store] == ["1.pdf", "1.pdf"]
+
+
+@pytest.mark.parametrize("factory", ["Flat", "IVF4,Flat", "HNSW8"])
+def test_indexer_compaction_keeps_vectors_added_meanwhile(factory):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((300, 8), dtype="float32")
+    indexer = FAISSIndexer(dim=8, compact_fraction=1.0)
+    indexer.add_embeddings(
+        vectors[:200], [{"filename": f"{i % 2}.pdf"} for i in range(200)]
+    )
+    if factory != "Flat":
+        indexer.rebuild(factory)
+    indexer.remove_document("0.pdf")
+
+    drop_positions = indexer._drop_positions
+
+    def add_while_compacting(index, positions):
+        # Runs outside the lock: the index takes changes meanwhile
+        indexer.add_embeddings(vectors[200:], [{"filename": "2.pdf"}] * 100)
+        drop_positions(index, positions)
+
+    indexer._drop_positions = add_while_compacting
+    assert indexer.compact() == 100
+
+    assert indexer.index.ntotal == len(indexer.metadata_store) == 200
+    kept = np.r_[1:200:2, 200:300]
+    _, positions = indexer.search_vectors(vectors[kept], k=1, nprobe=4)
+    assert indexer.metadata_store.ids(positions[:, 0]).tolist() == kept.tolist()
+
+
+def test_indexer_searches_share_the_lock():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        [[1.0, 0.0, 0.0, 0.0]], [{"filename": "a.pdf"}], ["Relay E4711 failed"]
+    )
+    found = []
+
+    def search():
+        found.extend(indexer.search([[1.0, 0.0, 0.0, 0.0]], k=1))
+        found.append(indexer.search_text("E4711", k=1))
+
+    with indexer._lock.read():
+        # Another search is running; these needn't wait for it
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert [hits[0]["metadata"] for hits in found] == [{"filename": "a.pdf"}] * 2
+
+
+def test_indexer_loads_json_metadata_snapshots(tmp_path):
+    import json
+
+    import faiss
+    import numpy as np
+
+    index = faiss.IndexFlatL2(4)
+    index.add(np.ones((1, 4), dtype="float32"))
+    faiss.write_index(index, str(tmp_path / "index-1.faiss"))
+    metadata = [{"filename": "old.pdf", "chunk_id": 0}]
+    (tmp_path / "metadata-1.json").write_text(json.dumps(metadata))
+    (tmp_path / "CURRENT").write_text("1")
+
+    loaded = FAISSIndexer.load(tmp_path)
+    assert list(loaded.metadata_store) == metadata
+    assert loaded.has_document("old.pdf")
+
+
+def _search_indexer():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        [
+            [1.0, 0.0, 0.0, 0.0],
+            [0.9, 0.1, 0.0, 0.0],
+            [0.0, 1.0, 0.0, 0.0],
+            [0.0, 0.0, 1.0, 0.0],
+        ],
+        [
+            {"filename": "a.pdf", "chunk_id": 0},
+            {"filename": "b.pdf", "chunk_id": 0},
+            {"filename": "a.pdf", "chunk_id": 1},
+            {"filename": "c.pdf", "chunk_id": 0},
+        ],
+    )
+    return indexer
+
+
+def test_indexer_search_returns_hits_per_query():
+    indexer = _search_indexer()
+
+    hits = indexer.search([[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]], k=2)
+
+    assert [h["position"] for h in hits[0]] == [0, 1]
+    assert hits[0][0]["score"] == pytest.approx(0.0)
+    assert hits[0][1]["metadata"] == {"filename": "b.pdf", "chunk_id": 0}
+    assert hits[1][0]["metadata"] == {"filename": "c.pdf", "chunk_id": 0}
+
+
+def test_indexer_search_filters_by_filename():
+    indexer = _search_indexer()
+
+    hits = indexer.search([[1.0, 0.0, 0.0, 0.0]], k=3, filter=["a.pdf", "c.pdf"])
+
+    # The filter is applied inside FAISS: b.pdf doesn't use up a slot
+    assert [h["position"] for h in hits[0]] == [0, 2, 3]
+    assert indexer.search([[1.0, 0.0, 0.0, 0.0]], k=3, filter=["x.pdf"]) == [[]]
+
+
+def _manuals_indexer(indexer):
+    indexer.add_embeddings(
+        [
+            [1.0, 0.0, 0.0, 0.0],
+            [0.9, 0.1, 0.0, 0.0],
+            [0.0, 1.0, 0.0, 0.0],
+            [0.0, 0.0, 1.0, 0.0],
+        ],
+        [
+            {"filename": "a.pdf", "chunk_id": 0},
+            {"filename": "a.pdf", "chunk_id": 1},
+            {"filename": "b.pdf", "chunk_id": 0},
+            {"filename": "b.pdf", "chunk_id": 1},
+        ],
+        [
+            "Check the pump pressure before starting.",
+            "Pump maintenance schedule.",
+            "Relay PN-4471-B trips on overload; see the pump wiring.",
+            "Torque the head bolts.",
+        ],
+    )
+    return indexer
+
+
+def test_indexer_search_text_finds_exact_terms():
+    indexer = _manuals_indexer(FAISSIndexer(dim=4))
+
+    [hit] = indexer.search_text("pn-4471-b")
+    assert hit["metadata"] == {"filename": "b.pdf", "chunk_id": 0}
+    assert hit["score"] > 0
+    hits = indexer.search_text("pump", k=5, filter=["a.pdf"])
+    assert [h["metadata"]["filename"] for h in hits] == ["a.pdf", "a.pdf"]
+
+    indexer.remove_document("b.pdf")
+    assert indexer.search_text("pn-4471-b") == []
+    indexer.compact()
+    assert [h["position"] for h in indexer.search_text("pump maintenance")] == [1, 0]
+
+
+def test_indexer_hybrid_search_fuses_rankings():
+    indexer = _manuals_indexer(FAISSIndexer(dim=4))
+
+    # The vector points at a.pdf, the text at the relay in b.pdf; b.pdf's
+    # chunk 0 is the only one ranked well by both
+    hits = indexer.hybrid_search([0.6, 0.8, 0.0, 0.0], "pump relay PN-4471-B", k=3)
+
+    assert [h["metadata"] for h in hits] == [
+        {"filename": "b.pdf", "chunk_id": 0},
+        {"filename": "a.pdf", "chunk_id": 1},
+        {"filename": "a.pdf", "chunk_id": 0},
+    ]
+    assert hits[0]["score"] == pytest.approx(2 / 61)
+    filtered = indexer.hybrid_search(
+        [0.0, 1.0, 0.0, 0.0], "pump", k=3, filter=["a.pdf"]
+    )
+    assert {h["metadata"]["filename"] for h in filtered} == {"a.pdf"}
+
+
+def test_indexer_keyword_index_survives_restart(tmp_path):
+    indexer = _manuals_indexer(FAISSIndexer.open(tmp_path, dim=4))
+    indexer.save(tmp_path)
+    indexer.add_embeddings(
+        [[0.0, 0.0, 0.0, 1.0]], [{"filename": "c.pdf"}], ["Error E042: pump dry."]
+    )
+    indexer.remove_document("b.pdf")
+
+    recovered = FAISSIndexer.open(tmp_path, dim=4)
+
+    assert [h["metadata"]["filename"] for h in recovered.search_text("e042")] == [
+        "c.pdf"
+    ]
+    assert recovered.search_text("pn-4471-b") == []
+    assert len(recovered.search_text("pump", k=5)) == 3
+
+
+def _documents_corpus(num_docs=6, chunks=20, dim=8, seed=0):
+    vectors = np.random.default_rng(seed).random((num_docs * chunks, dim))
+    metadata = [
+        {"filename": f"doc{i % num_docs}.pdf", "chunk_id": i // num_docs}
+        for i in range(num_docs * chunks)
+    ]
+    return vectors.astype("float32"), metadata
+
+
+def test_indexer_scoped_search_uses_document_indexes():
+    vectors, metadata = _documents_corpus()
+    indexer = FAISSIndexer(dim=8)
+    indexer.add_embeddings(vectors, metadata)
+    # Every document got a sub-index as it was added
+    assert len(indexer.doc_indexes) == 6
+    queries = vectors[:3] + 0.01
+
+    for filter in (["doc1.pdf"], ["doc2.pdf", "doc4.pdf"], ["doc0.pdf", "x.pdf"]):
+        scoped = indexer.search_vectors(queries, k=25, filter=filter)
+        allowed = indexer.metadata_store.positions(*filter)
+        expected = indexer.index.search(
+            queries,
+            25,
+            params=faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed)),
+        )
+        np.testing.assert_array_equal(scoped[1], expected[1])
+        np.testing.assert_allclose(scoped[0], expected[0], rtol=1e-5)
+
+    indexer.remove_ids(indexer.metadata_store.ids([1]))
+    assert "doc1.pdf" not in indexer.doc_indexes
+    hits = indexer.search(vectors[1:2], k=30, filter=["doc1.pdf"])[0]
+    assert "doc1.pdf" in indexer.doc_indexes
+    assert len(hits) == 19 and 1 not in [h["position"] for h in hits]
+
+
+def test_indexer_document_indexes_follow_replacements():
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        np.eye(4, dtype="float32")[:3],
+        [
+            {"filename": "v1.pdf", "chunk_id": 0, "fingerprint": f"{0:016x}"},
+            {"filename": "v1.pdf", "chunk_id": 1, "fingerprint": f"{1:016x}"},
+            {"filename": "v1.pdf", "chunk_id": 2, "fingerprint": f"{2:016x}"},
+        ],
+    )
+    indexer.add_embeddings(
+        [[0.0, 0.0, 0.0, 1.0]],
+        [{"filename": "v2.pdf", "chunk_id": 1, "fingerprint": f"{3:016x}"}],
+    )
+    carried = [{"filename": "v2.pdf", "chunk_id": 0, "fingerprint": f"{1:016x}"}]
+    indexer.replace_document("v1.pdf", "v2.pdf", carried)
+
+    [hits] = indexer.search([[0.0, 1.0, 0.0, 0.0]], k=5, filter=["v2.pdf"])
+    assert [h["metadata"]["chunk_id"] for h in hits] == [0, 1]
+    assert indexer.search([[1.0, 0.0, 0.0, 0.0]], k=5, filter=["v1.pdf"]) == [[]]
+
+
+def test_indexer_document_indexes_stay_within_budget():
+    vectors, metadata = _documents_corpus()
+    indexer = FAISSIndexer(dim=8)
+    # Room for two documents of 20 vectors
+    indexer.doc_indexes.max_bytes = 40 * (8 * 4 + 8)
+    indexer.add_embeddings(vectors, metadata)
+    assert len(indexer.doc_indexes) == 2
+
+    indexer.search(vectors[:1], k=3, filter=["doc0.pdf"])
+    assert "doc0.pdf" in indexer.doc_indexes
+    assert indexer.doc_indexes.nbytes <= indexer.doc_indexes.max_bytes
+    # Three documents don't fit, so the main index answers
+    [hits] = indexer.search(
+        vectors[:1], k=60, filter=["doc0.pdf", "doc1.pdf", "doc2.pdf"]
+    )
+    assert len(hits) == 60
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from app.services.ingest_jobs import (
+    DONE,
+    FAILED,
+    QUEUED,
+    FileLocks,
+    IngestJobManager,
+    JobQueueFullError,
+)
+
+
+def test_job_runs_in_background_and_reports_progress():
+    updates = []
+
+    def runner(filename, progress):
+        progress.add(pages=3)
+        progress.add(chunks=5, vectors=5)
+        return {"filename": filename, "chunks_ingested": 5}
+
+    manager = IngestJobManager(
+        runner, on_update=lambda job: updates.append(job.status), update_interval=0
+    )
+    job = manager.submit("sample.pdf")
+    manager.shutdown()
+
+    assert job.status == DONE
+    assert job.result == {"filename": "sample.pdf", "chunks_ingested": 5}
+    assert job.progress.to_dict() == {
+        "pages_extracted": 3,
+        "chunks_embedded": 5,
+        "vectors_indexed": 5,
+    }
+    assert updates[0] == QUEUED
+    assert "running" in updates
+    assert updates[-1] == DONE
+    assert manager.get(job.job_id) is job
+
+
+def test_job_failure_is_recorded():
+    def runner(filename, progress):
+        raise RuntimeError("Error loading PDF: boom")
+
+    manager = IngestJobManager(runner)
+    job = manager.submit("broken.pdf")
+    manager.shutdown()
+
+    assert job.status == FAILED
+    assert job.error == "Error loading PDF: boom"
+
+
+def test_submit_rejects_when_queue_is_full():
+    release = threading.Event()
+    started = threading.Event()
+
+    def runner(filename, progress):
+        started.set()
+        release.wait(timeout=5)
+        return {}
+
+    manager = IngestJobManager(runner, max_workers=1, max_pending=1)
+    manager.submit("running.pdf")
+    started.wait(timeout=5)
+    manager.submit("queued.pdf")
+
+    with pytest.raises(JobQueueFullError):
+        manager.submit("rejected.pdf")
+
+    release.set()
+    manager.shutdown()
+
+
+def test_invalid_pool_size():
+    with pytest.raises(ValueError):
+        IngestJobManager(lambda filename, progress: {}, max_workers=0)
+
+
+def test_submit_batch_runs_groups_and_reports_status():
+    def runner(label, progress):
+        return {"files": [{"filename": label}]}
+
+    manager = IngestJobManager(runner, max_workers=2)
+    batch = manager.submit_batch([(["a.pdf"], runner), (["b.pdf", "c.pdf"], runner)])
+    manager.shutdown()
+
+    assert batch.status == DONE
+    assert batch.total_files == 3
+    assert [job.filename for job in batch.jobs] == ["a.pdf", "b.pdf (+1)"]
+    assert manager.get_batch(batch.batch_id) is batch
+
+
+def test_submit_batch_is_all_or_nothing():
+    manager = IngestJobManager(lambda filename, progress: {}, max_pending=1)
+    runner = manager.runner
+
+    with pytest.raises(JobQueueFullError):
+        manager.submit_batch([(["a.pdf"], runner), (["b.pdf"], runner)])
+    assert manager.jobs == {}
+    manager.shutdown()
+
+
+def test_file_locks_serialise_holders_of_the_same_file():
+    locks = FileLocks()
+    order = []
+
+    def hold(names, tag):
+        with locks.hold(names):
+            order.append(tag)
+
+    with locks.hold(["b.pdf", "a.pdf"]):
+        waiter = threading.Thread(target=hold, args=(["a.pdf"], "waiter"))
+        waiter.start()
+        # A different file isn't blocked
+        hold(["c.pdf"], "other")
+        waiter.join(0.1)
+        assert waiter.is_alive()
+        order.append("holder")
+    waiter.join(5)
+
+    assert order == ["other", "holder", "waiter"]
+    assert locks._locks == {}
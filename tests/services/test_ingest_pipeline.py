@@ -0,0 +1,170 @@
+import fitz
+import numpy as np
+import pytest
+
+from app.services.chunker import TokenChunker, span_text
+from app.services.indexer import FAISSIndexer
+from app.services.ingest_jobs import IngestProgress
+from app.services.ingest_pipeline import IngestSource, ingest_document, ingest_documents
+
+
+class FakeEmbedder:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+        self.texts = []
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("Embedding failed: API error")
+        self.texts.extend(texts)
+        return [[float(len(t)), 0.0, 0.0, 1.0] for t in texts]
+
+    def embed_array(self, texts):
+        return np.array(self.embed(texts), dtype="float32")
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pages = [f"Page {i} " + "lorem ipsum " * 20 for i in range(5)]
+    return _write_pdf(tmp_path / "manual.pdf", pages)
+
+
+def test_pipeline_streams_batches_into_index(pdf_path):
+    indexer = FAISSIndexer(dim=4)
+    embedder = FakeEmbedder()
+    progress = IngestProgress()
+
+    result = ingest_document(
+        pdf_path, "manual.pdf", indexer, embedder, progress, batch_size=2
+    )
+
+    assert result["message"] == "Ingestion successful"
+    assert result["chunks_ingested"] == indexer.index.ntotal > 0
+    assert embedder.calls > 1
+    chunk_ids = sorted(m["chunk_id"] for m in indexer.metadata_store)
+    assert chunk_ids == list(range(result["chunks_ingested"]))
+    assert progress.to_dict() == {
+        "pages_extracted": 5,
+        "chunks_embedded": result["chunks_ingested"],
+        "vectors_indexed": result["chunks_ingested"],
+    }
+
+
+def test_pipeline_reports_failing_stage(pdf_path):
+    with pytest.raises(RuntimeError, match="Error generating embeddings"):
+        ingest_document(
+            pdf_path, "manual.pdf", FAISSIndexer(dim=4), FakeEmbedder(fail=True)
+        )
+
+
+def test_pipeline_reports_missing_file(tmp_path):
+    with pytest.raises(RuntimeError, match="Error loading PDF"):
+        ingest_document(
+            tmp_path / "missing.pdf", "missing.pdf", FAISSIndexer(dim=4), FakeEmbedder()
+        )
+
+
+def test_pipeline_reingests_only_changed_chunks(tmp_path, pdf_path):
+    indexer = FAISSIndexer(dim=4)
+    ingest_document(pdf_path, "manual.pdf", indexer, FakeEmbedder())
+    pages = [f"Page {i} " + "lorem ipsum " * 20 for i in range(5)]
+    pages[2] = "Page 2 was rewritten"
+    revised = _write_pdf(tmp_path / "manual_v2.pdf", pages)
+
+    embedder = FakeEmbedder()
+    result = ingest_document(
+        revised, "manual_v2.pdf", indexer, embedder, previous="manual.pdf"
+    )
+
+    assert [t.strip() for t in embedder.texts] == ["Page 2 was rewritten"]
+    assert result["chunks_reused"] == 4
+    assert result["chunks_removed"] == 1
+    assert indexer.compact() + indexer.index.ntotal == 6
+    assert result["chunks_ingested"] == indexer.index.ntotal == 5
+    assert not indexer.has_document("manual.pdf")
+    chunk_ids = sorted(m["chunk_id"] for m in indexer.metadata_store)
+    assert chunk_ids == list(range(5))
+    # Reused and re-embedded chunks alike stay keyword-searchable
+    assert [h["metadata"]["chunk_id"] for h in indexer.search_text("rewritten")] == [2]
+    assert len(indexer.search_text("lorem", k=10)) == 4
+
+
+def test_pipeline_rolls_back_failed_reingest(tmp_path, pdf_path):
+    indexer = FAISSIndexer(dim=4)
+    ingest_document(pdf_path, "manual.pdf", indexer, FakeEmbedder())
+    before = list(indexer.metadata_store)
+    revised = _write_pdf(tmp_path / "manual_v2.pdf", ["Only one new page"])
+
+    with pytest.raises(RuntimeError, match="Error generating embeddings"):
+        ingest_document(
+            revised,
+            "manual_v2.pdf",
+            indexer,
+            FakeEmbedder(fail=True),
+            previous="manual.pdf",
+        )
+    assert list(indexer.metadata_store) == before
+
+
+def test_pipeline_packs_documents_into_shared_batches(tmp_path):
+    sources = [
+        IngestSource(
+            _write_pdf(tmp_path / f"memo{i}.pdf", [f"Memo {i}"]), f"memo{i}.pdf"
+        )
+        for i in range(4)
+    ]
+    sources.insert(2, IngestSource(tmp_path / "missing.pdf", "missing.pdf"))
+    indexer = FAISSIndexer(dim=4)
+    embedder = FakeEmbedder()
+
+    results = ingest_documents(sources, indexer, embedder, batch_size=8)
+
+    assert embedder.calls == 1
+    assert [r["filename"] for r in results] == [s.filename for s in sources]
+    assert "Error loading PDF" in results[2]["error"]
+    assert [r.get("chunks_ingested") for r in results] == [1, 1, None, 1, 1]
+    assert indexer.index.ntotal == 4
+
+
+def test_pipeline_reports_embedded_tokens(pdf_path):
+    chars = ingest_document(pdf_path, "a.pdf", FAISSIndexer(dim=4), FakeEmbedder())
+    tokens = ingest_document(
+        pdf_path,
+        "b.pdf",
+        FAISSIndexer(dim=4),
+        FakeEmbedder(),
+        chunker=TokenChunker(max_tokens=256),
+    )
+
+    assert chars["tokens_embedded"] > 0
+    assert tokens["chunks_ingested"] < chars["chunks_ingested"]
+    assert tokens["tokens_embedded"] < chars["tokens_embedded"]
+
+
+def test_pipeline_records_chunk_spans(pdf_path):
+    indexer = FAISSIndexer(dim=4)
+    embedder = FakeEmbedder()
+    ingest_document(pdf_path, "manual.pdf", indexer, embedder)
+
+    with fitz.open(pdf_path) as doc:
+        pages = [page.get_text() for page in doc]
+    for metadata, text in zip(indexer.metadata_store, embedder.texts):
+        span = (
+            metadata["page"],
+            metadata["start"],
+            metadata["end_page"],
+            metadata["end"],
+        )
+        assert span_text(pages, span) == text
+    assert [m["page"] for m in indexer.metadata_store] == [0, 1, 2, 3, 4]
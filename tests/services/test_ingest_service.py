@@ -0,0 +1,127 @@
+import threading
+from functools import partial
+from unittest.mock import DEFAULT, patch
+
+import pytest
+
+from app.services import ingest_service
+from app.services.ingest_jobs import IngestJobManager
+
+
+@pytest.fixture
+def statuses():
+    # Every update written to a file record, in order, by filename
+    written = {}
+
+    def record(filename, fields):
+        written.setdefault(filename, []).append(fields)
+
+    with patch.multiple(
+        ingest_service,
+        update_file_status=DEFAULT,
+        find_other_versions=DEFAULT,
+        get_indexer=DEFAULT,
+        get_embedder=DEFAULT,
+        persist_indexer=DEFAULT,
+    ) as mocks:
+        mocks["update_file_status"].side_effect = record
+        mocks["find_other_versions"].return_value = []
+        mocks["get_indexer"].return_value.has_document.return_value = False
+        yield written
+
+
+def _run_batch(groups, results):
+    manager = IngestJobManager(
+        ingest_service._run_ingest,
+        on_update=ingest_service._sync_status,
+        update_interval=0,
+    )
+    work = [
+        (group, partial(ingest_service._run_ingest_group, group, incremental=False))
+        for group in groups
+    ]
+    with patch.object(ingest_service, "ingest_documents", return_value=results):
+        batch = manager.submit_batch(work)
+        manager.shutdown()
+    return batch
+
+
+def test_failed_file_of_one_file_group_stays_failed(statuses):
+    _run_batch([["a.pdf"]], [{"filename": "a.pdf", "error": "Error loading PDF"}])
+
+    assert [fields["status"] for fields in statuses["a.pdf"]] == [
+        "queued",
+        "running",
+        "failed",
+    ]
+    assert statuses["a.pdf"][-1]["ingest_error"] == "Error loading PDF"
+
+
+def test_group_updates_each_member_file(statuses):
+    results = [
+        {"filename": "a.pdf", "chunks_ingested": 3},
+        {"filename": "b.pdf", "error": "boom"},
+    ]
+    batch = _run_batch([["a.pdf", "b.pdf"]], results)
+
+    assert batch.jobs[0].filename == "a.pdf (+1)"
+    assert set(statuses) == {"a.pdf", "b.pdf"}
+    assert statuses["a.pdf"][0]["status"] == "queued"
+    assert statuses["a.pdf"][-1]["status"] == "done"
+    assert statuses["b.pdf"][-1] == {
+        "status": "failed",
+        "progress": statuses["b.pdf"][-1]["progress"],
+        "ingest_error": "boom",
+    }
+
+
+def test_group_failing_before_ingestion_fails_every_file(statuses):
+    # e.g. the index can't be loaded or the version lookup fails
+    indexer = ingest_service.get_indexer.return_value
+    indexer.has_document.side_effect = lambda name: name == "a.pdf"
+    ingest_service.find_other_versions.side_effect = RuntimeError("db down")
+    manager = IngestJobManager(
+        ingest_service._run_ingest,
+        on_update=ingest_service._sync_status,
+        update_interval=0,
+    )
+    group = ["a.pdf", "b.pdf"]
+    batch = manager.submit_batch(
+        [(group, partial(ingest_service._run_ingest_group, group, incremental=True))]
+    )
+    manager.shutdown()
+
+    assert batch.jobs[0].status == "failed"
+    assert statuses["a.pdf"][-1]["status"] == "done"
+    assert statuses["b.pdf"][-1]["status"] == "failed"
+    assert statuses["b.pdf"][-1]["ingest_error"] == "db down"
+
+
+def test_duplicate_jobs_ingest_a_file_once(statuses):
+    indexed = set()
+    indexer = ingest_service.get_indexer.return_value
+    indexer.has_document.side_effect = lambda name: name in indexed
+    started = threading.Event()
+    release = threading.Event()
+
+    def ingest_document(path, filename, *args, **kwargs):
+        started.set()
+        release.wait(5)
+        indexed.add(filename)
+        return {"filename": filename, "chunks_ingested": 3}
+
+    manager = IngestJobManager(
+        ingest_service._run_ingest, max_workers=2, update_interval=0
+    )
+    with patch.object(
+        ingest_service, "ingest_document", side_effect=ingest_document
+    ) as mock:
+        first = manager.submit("a.pdf")
+        started.wait(5)
+        second = manager.submit("a.pdf")
+        release.set()
+        manager.shutdown()
+
+    assert mock.call_count == 1
+    assert first.result == {"filename": "a.pdf", "chunks_ingested": 3}
+    assert second.result == {"filename": "a.pdf", "message": "Already ingested"}
@@ -0,0 +1,90 @@
+# tests/services/test_lexical_index.py
+
+import numpy as np
+import pytest
+
+from app.services.lexical_index import LexicalIndex, tokenize
+
+TEXTS = [
+    "Replace the fuel pump relay PN-4471-B if error E042 appears.",
+    "The fuel filter should be replaced every 500 hours.",
+    "Error E017 means the pump is dry; prime the pump before restarting.",
+    "Torque the cylinder head bolts to 40 Nm.",
+]
+
+
+@pytest.fixture
+def index():
+    index = LexicalIndex()
+    index.add([0, 1, 2, 3], TEXTS)
+    return index
+
+
+def test_tokenize_keeps_compound_terms_and_their_parts():
+    assert tokenize("Relay PN-4471-B, v2.1") == [
+        "relay",
+        "pn-4471-b",
+        "pn",
+        "4471",
+        "b",
+        "v2.1",
+        "v2",
+        "1",
+    ]
+
+
+def test_lexical_search_ranks_by_bm25(index):
+    ids, scores = index.search("pump", k=4)
+    # Chunk 2 mentions the pump twice in a text of similar length
+    assert ids.tolist() == [2, 0]
+    assert scores[0] > scores[1] > 0
+
+    ids, _ = index.search("pn-4471-b", k=4)
+    assert ids.tolist() == [0]
+    ids, _ = index.search("error E042 pump", k=1)
+    assert ids.tolist() == [0]
+    ids, _ = index.search("pump", k=4, allowed=[0, 1, 3])
+    assert ids.tolist() == [0]
+    assert len(index.search("carburettor", k=4)[0]) == 0
+
+
+def test_lexical_index_rejects_ids_out_of_order(index):
+    with pytest.raises(ValueError, match="increasing order"):
+        index.add([3], ["again"])
+    with pytest.raises(ValueError, match="increasing order"):
+        index.add([7, 5], ["a", "b"])
+    index.add([5, 6], [None, "later"])
+    assert index.contains([4, 5, 6]).tolist() == [False, False, True]
+
+
+def test_lexical_remove_and_compact(index):
+    assert index.remove([2, 2, 99]) == 1
+    assert len(index) == 3
+    ids, _ = index.search("pump", k=4)
+    assert ids.tolist() == [0]
+
+    before = index.nbytes
+    assert index.compact() == len(set(tokenize(TEXTS[2])))
+    assert index.nbytes < before
+    ids, _ = index.search("pump", k=4)
+    assert ids.tolist() == [0]
+    index.add([4], ["pump pump"])
+    assert index.search("pump", k=4)[0].tolist() == [4, 0]
+
+
+def test_lexical_index_round_trips_and_recovers_term_counts(index):
+    index.remove([1])
+    loaded = LexicalIndex.from_bytes(index.to_bytes())
+
+    for query in ("pump", "fuel", "pn-4471-b e042", "bolts"):
+        expected, expected_scores = index.search(query, k=4)
+        found, scores = loaded.search(query, k=4)
+        assert found.tolist() == expected.tolist()
+        np.testing.assert_allclose(scores, expected_scores)
+
+    counts = loaded.term_counts([3, 1, 0])
+    assert counts[0] == {t: tokenize(TEXTS[3]).count(t) for t in tokenize(TEXTS[3])}
+    assert counts[1] is None
+    copy = LexicalIndex()
+    copy.add([10, 11], [counts[2], counts[0]])
+    assert copy.search("E042", k=2)[0].tolist() == [10]
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from app.services.metadata_store import MetadataStore
+
+
+def _entry(filename, chunk_id, **extra):
+    return {
+        "filename": filename,
+        "chunk_id": chunk_id,
+        "fingerprint": f"{chunk_id:016x}",
+        "page": chunk_id // 2,
+        "start": 0,
+        "end_page": chunk_id // 2,
+        "end": 500,
+        **extra,
+    }
+
+
+def test_store_roundtrips_entries():
+    entries = [_entry("a.pdf", i) for i in range(3)] + [
+        {"id": 1},
+        {"filename": "b.pdf"},
+    ]
+    store = MetadataStore(capacity=2)
+    store.extend(entries)
+
+    assert len(store) == 5
+    assert list(store) == entries
+    assert store[-1] == {"filename": "b.pdf"}
+    with pytest.raises(IndexError):
+        store[5]
+
+
+def test_store_keeps_values_that_do_not_fit_columns_as_extras():
+    entry = {
+        "filename": "a.pdf",
+        "chunk_id": "c-1",
+        "fingerprint": "xyz",
+        "page": 2**40,
+    }
+    store = MetadataStore()
+    store.extend([entry])
+
+    assert store[0] == entry
+
+
+def test_store_gathers_positions():
+    store = MetadataStore.from_dicts([_entry("a.pdf", i) for i in range(10)])
+
+    assert store.gather(np.array([7, 2, 7])) == [
+        _entry("a.pdf", 7),
+        _entry("a.pdf", 2),
+        _entry("a.pdf", 7),
+    ]
+    with pytest.raises(IndexError):
+        store.gather([10])
+
+
+def test_store_tracks_documents_through_set_and_delete():
+    store = MetadataStore.from_dicts(
+        [_entry("a.pdf", 0), _entry("b.pdf", 0), _entry("a.pdf", 1, note="x")]
+    )
+    assert store.positions("a.pdf").tolist() == [0, 2]
+    assert store.positions("b.pdf", "a.pdf", "x.pdf").tolist() == [0, 1, 2]
+    assert store.positions("x.pdf").tolist() == []
+    assert store.fingerprints([1, 2]) == [f"{0:016x}", f"{1:016x}"]
+
+    store.set(1, _entry("a.pdf", 2))
+    assert not store.has_document("b.pdf")
+
+    store.delete([0])
+    assert store.positions("a.pdf").tolist() == [0, 1]
+    assert store[1]["note"] == "x"
+
+    store.delete([0, 1])
+    assert len(store) == 0
+    assert not store.has_document("a.pdf")
+    store.extend([_entry("c.pdf", 0)])
+    assert store.has_document("c.pdf")
+
+
+def test_store_serialises_to_bytes():
+    entries = [_entry("a.pdf", 0), {"filename": "b.pdf", "note": [1, 2]}]
+    store = MetadataStore.from_dicts(entries)
+
+    loaded = MetadataStore.from_bytes(store.to_bytes())
+    assert list(loaded) == entries
+    assert loaded.has_document("b.pdf")
+
+
+def test_store_keeps_texts_through_delete_and_serialisation():
+    store = MetadataStore(capacity=2)
+    store.extend(
+        [_entry("a.pdf", i) for i in range(4)],
+        ["zero", None, "zwei \u00fcber", "three"],
+    )
+    store.extend([_entry("b.pdf", 0)])
+
+    assert store.texts([2, 0, 1, 4]) == ["zwei \u00fcber", "zero", None, None]
+    store.delete([0])
+    assert store.texts(range(len(store))) == [None, "zwei \u00fcber", "three", None]
+
+    loaded = MetadataStore.from_bytes(store.to_bytes())
+    assert loaded.texts(range(len(loaded))) == [None, "zwei \u00fcber", "three", None]
+    assert list(loaded) == list(store)
+
+
+def test_store_tombstones_keep_positions_and_ids():
+    store = MetadataStore()
+    assert store.extend([_entry("a.pdf", 0), _entry("b.pdf", 0)]).tolist() == [0, 1]
+    store.extend([_entry("a.pdf", 1)])
+
+    assert store.tombstone([0, 2]) == 2
+    assert store.tombstone([0]) == 0
+    assert not store.has_document("a.pdf")
+    assert store.positions("a.pdf").tolist() == []
+    assert store.live_mask().tolist() == [False, True, False]
+    assert store.lookup([0, 1, 9]).tolist() == [-1, 1, -1]
+
+    loaded = MetadataStore.from_bytes(store.to_bytes())
+    assert loaded.tombstones == 2
+    loaded.delete(loaded.tombstoned())
+    assert loaded.tombstones == 0
+    assert loaded.ids([0]).tolist() == [1]
+    assert loaded.lookup([1]).tolist() == [0]
+    assert loaded.extend([_entry("c.pdf", 0)]).tolist() == [3]
@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import fitz
 import pytest
 
 from app.services.pdf_loader import PDFLoader
@@ -27,3 +28,33 @@ def test_load_text_by_page(loader):
     assert isinstance(pages, list)
     assert all(isinstance(p, str) for p in pages)
     assert len(pages) > 0
+
+
+def test_iter_pages_matches_load_text(loader):
+    pages = list(loader.iter_pages())
+    assert [number for number, _ in pages] == list(range(len(pages)))
+    assert [text for _, text in pages] == loader.load_text(by_page=True)
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path):
+    path = tmp_path / "long.pdf"
+    doc = fitz.open()
+    for i in range(40):
+        doc.new_page().insert_text((72, 72), f"This is page {i}")
+    doc.save(path)
+    doc.close()
+
+    serial = PDFLoader(path, workers=1).load_text(by_page=True)
+    parallel = list(PDFLoader(path, workers=2, parallel_min_pages=1).iter_pages())
+
+    assert [number for number, _ in parallel] == list(range(40))
+    assert [text for _, text in parallel] == serial
+    assert "This is page 39" in serial[39]
+
+
+def test_from_bytes_reads_in_memory_pdf(loader):
+    data = TEST_PDF.read_bytes()
+    in_memory = PDFLoader.from_bytes(data, name="sample.pdf")
+
+    assert in_memory.load_text(by_page=True) == loader.load_text(by_page=True)
+    assert next(in_memory.iter_pages())[0] == 0
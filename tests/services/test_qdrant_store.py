@@ -0,0 +1,119 @@
+# tests/services/test_qdrant_store.py
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from qdrant_client import QdrantClient
+
+from app.services.indexer import FAISSIndexer
+from app.services.qdrant_store import QdrantStore
+
+
+@pytest.fixture
+def store():
+    return QdrantStore(QdrantClient(":memory:"), dim=4, batch_size=2)
+
+
+def _add_versions(indexer):
+    indexer.add_embeddings(
+        np.eye(4, dtype="float32")[:3],
+        [
+            {"filename": "v1.pdf", "chunk_id": 0, "fingerprint": "a"},
+            {"filename": "v1.pdf", "chunk_id": 1, "fingerprint": "b"},
+            {"filename": "other.pdf", "chunk_id": 0, "fingerprint": "a"},
+        ],
+    )
+
+
+def test_qdrant_store_search_matches_faiss(store):
+    faiss_indexer = FAISSIndexer(dim=4)
+    for indexer in (store, faiss_indexer):
+        _add_versions(indexer)
+    queries = np.array([[0.9, 0.1, 0.0, 0.0], [0.0, 0.2, 0.0, 0.0]], dtype="float32")
+
+    for filter in (None, ["other.pdf", "v1.pdf"], ["other.pdf"]):
+        expected = faiss_indexer.search(queries, k=2, filter=filter)
+        found = store.search(queries, k=2, filter=filter)
+        for want, got in zip(expected, found):
+            assert [h["metadata"] for h in got] == [h["metadata"] for h in want]
+            assert [h["score"] for h in got] == pytest.approx(
+                [h["score"] for h in want], abs=1e-5
+            )
+    assert store.search(queries[:1], k=2, filter=[]) == [[]]
+
+
+def test_qdrant_store_hits_carry_chunk_texts(store):
+    store.add_embeddings(
+        np.eye(4, dtype="float32")[:2],
+        [
+            {"filename": "a.pdf", "chunk_id": 0},
+            {"filename": "a.pdf", "chunk_id": 1},
+        ],
+        ["Check the seals.", None],
+    )
+
+    [hits] = store.search(np.eye(4, dtype="float32")[:1], k=2)
+    assert [(h["metadata"], h["text"]) for h in hits] == [
+        ({"filename": "a.pdf", "chunk_id": 0}, "Check the seals."),
+        ({"filename": "a.pdf", "chunk_id": 1}, None),
+    ]
+
+
+def test_qdrant_store_hybrid_search_falls_back_to_vectors(store, capsys):
+    _add_versions(store)
+    query = np.array([0.0, 0.9, 0.0, 0.0], dtype="float32")
+
+    hits = store.hybrid_search(query, "seals", k=2, filter=["v1.pdf"])
+    store.hybrid_search(query, "seals", k=2)
+
+    [expected] = store.search(query.reshape(1, -1), k=2, filter=["v1.pdf"])
+    assert hits == expected
+    assert capsys.readouterr().out.count("falls back to vector search") == 1
+
+
+def test_qdrant_store_rejects_keyword_search(store):
+    with pytest.raises(ValueError, match="no keyword index"):
+        store.search_text("seals")
+
+
+def test_qdrant_store_creates_payload_indexes_on_open():
+    client = QdrantClient(":memory:")
+    with patch.object(
+        client, "create_payload_index", wraps=client.create_payload_index
+    ) as create_index:
+        store = QdrantStore(client, dim=4)
+        _add_versions(store)
+        store.search([[1.0, 0.0, 0.0, 0.0]], k=1, filter=["v1.pdf"])
+    assert sorted(c.kwargs["field_name"] for c in create_index.call_args_list) == [
+        "chunk_index",
+        "doc_id",
+    ]
+
+    reopened = QdrantStore(store.client, dim=4)
+    with pytest.raises(ValueError, match="expected 8-dimensional"):
+        QdrantStore(store.client, dim=8)
+    _add_versions(reopened)
+    assert store.has_document("v1.pdf")
+
+
+def test_qdrant_store_replace_and_remove_document(store):
+    _add_versions(store)
+    assert store.document_fingerprints("v1.pdf") == {"a": 1, "b": 1}
+
+    carried = [{"filename": "v2.pdf", "chunk_id": 0, "fingerprint": "a"}]
+    with pytest.raises(ValueError, match="no longer indexed"):
+        store.replace_document("v1.pdf", "v2.pdf", carried * 2)
+    assert store.replace_document("v1.pdf", "v2.pdf", carried) == 1
+
+    assert not store.has_document("v1.pdf")
+    [[hit]] = store.search([[1.0, 0.0, 0.0, 0.0]], k=1)
+    assert hit["metadata"] == carried[0]
+    assert hit["score"] == pytest.approx(0.0)
+
+    assert store.remove_ids([hit["id"], "00000000-0000-0000-0000-000000000000"]) == 1
+    assert store.remove_document("other.pdf") == 1
+    assert store.search([[1.0, 0.0, 0.0, 0.0]], k=3) == [[]]
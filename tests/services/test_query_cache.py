@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache
+from app.services.query_cache import QueryEmbeddingCache, normalize_question
+
+
+class FakeEmbedder:
+    deployment = "docuwise-embeddings"
+    dimensions = None
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_array(self, texts, use_cache=True):
+        assert not use_cache
+        self.texts.extend(texts)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype="float32")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    yield cache
+    cache.close()
+
+
+def test_normalize_question_folds_trivial_differences():
+    assert normalize_question("  What IS\tthe  torque?\n") == "what is the torque?"
+    assert normalize_question("ＰＮ－４４７１") == "pn-4471"
+
+
+def test_query_cache_serves_repeats_from_memory():
+    embedder = FakeEmbedder()
+    cache = QueryEmbeddingCache(embedder)
+
+    first = cache.embed_array(["What is the torque?"])
+    again = cache.embed_array(["what is  the torque?", "Where is the relay?"])
+
+    # Normalisation only picks the cache entry; the question is embedded as asked
+    assert embedder.texts == ["What is the torque?", "Where is the relay?"]
+    np.testing.assert_array_equal(again[:1], first)
+    assert again.shape == (2, 2) and again.dtype == np.float32
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_query_cache_expires_and_evicts_entries():
+    embedder, clock = FakeEmbedder(), Clock()
+    cache = QueryEmbeddingCache(embedder, max_entries=2, ttl=60, clock=clock)
+
+    cache.embed_array(["a"])
+    clock.now = 59
+    cache.embed_array(["a"])
+    clock.now = 60
+    cache.embed_array(["a"])
+    assert embedder.texts == ["a", "a"]
+
+    cache.embed_array(["b"])
+    cache.embed_array(["c"])
+    cache.embed_array(["a"])
+    assert embedder.texts == ["a", "a", "b", "c", "a"]
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["evicted"] == 2
+
+
+def test_query_cache_shares_embeddings_between_workers(shared):
+    first, second = FakeEmbedder(), FakeEmbedder()
+    worker = QueryEmbeddingCache(first, shared=shared)
+    other = QueryEmbeddingCache(second, shared=shared)
+
+    expected = worker.embed_array(["How do I prime the pump?"])
+    found = other.embed_array(["how do i prime the pump?"])
+
+    np.testing.assert_array_equal(found, expected)
+    assert second.texts == []
+    assert other.stats()["shared_hits"] == 1
+    assert other.stats()["hit_rate"] == 1.0
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import query
+from app.services.indexer import FAISSIndexer
+from app.services.retriever import PageCache, Retriever
+
+
+class FakeEmbedder:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_array(self, texts):
+        return np.array([self.vector] * len(texts), dtype="float32")
+
+
+@pytest.fixture
+def client(tmp_path):
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        np.eye(4, dtype="float32")[:3],
+        [{"filename": "manual.pdf", "chunk_id": i} for i in range(3)],
+        [
+            "Pump manual overview.",
+            "Error code E4711 means the relay failed.",
+            "Check the seals.",
+        ],
+    )
+    retriever = Retriever(
+        indexer, FakeEmbedder([1.0, 0.0, 0.0, 0.0]), PageCache(tmp_path)
+    )
+    app = FastAPI()
+    app.include_router(query.router, prefix="/api")
+    with patch.object(query, "get_retriever", return_value=retriever):
+        yield TestClient(app)
+
+
+def test_query_route_ranks_by_vectors_by_default(client):
+    response = client.post("/api/query", json={"question": "E4711", "top_k": 1})
+
+    assert response.status_code == 200
+    assert response.json()["answer"] == "Pump manual overview."
+
+
+def test_query_route_hybrid_mode_finds_exact_terms(client):
+    response = client.post(
+        "/api/query", json={"question": "E4711", "top_k": 1, "mode": "hybrid"}
+    )
+
+    assert response.status_code == 200
+    [source] = response.json()["sources"]
+    assert source["chunk_id"] == 1
+    assert source["text"] == "Error code E4711 means the relay failed."
+    assert "search;dur=" in response.headers["Server-Timing"]
+
+
+def test_query_route_rejects_unknown_mode(client):
+    response = client.post("/api/query", json={"question": "pump", "mode": "fuzzy"})
+
+    assert response.status_code == 422
@@ -0,0 +1,136 @@
+# tests/services/test_retriever.py
+
+from unittest.mock import patch
+
+import fitz
+import numpy as np
+import pytest
+
+from app.services.indexer import FAISSIndexer
+from app.services.pdf_loader import PDFLoader
+from app.services.retriever import PageCache, Retriever
+
+
+class FakeEmbedder:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_array(self, texts):
+        return np.array([self.vector] * len(texts), dtype="float32")
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    doc = fitz.open()
+    for text in ("Pump manual. Check the seals.", "Replace the relay."):
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(tmp_path / "manual.pdf")
+    doc.close()
+    pages = PDFLoader(tmp_path / "manual.pdf").load_text(by_page=True)
+
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        np.eye(4, dtype="float32")[:3],
+        [
+            {
+                "filename": "manual.pdf",
+                "chunk_id": 0,
+                "page": 0,
+                "start": 0,
+                "end_page": 0,
+                "end": 12,
+            },
+            {
+                "filename": "manual.pdf",
+                "chunk_id": 1,
+                "page": 0,
+                "start": 13,
+                "end_page": 1,
+                "end": len(pages[1].rstrip()),
+            },
+            {
+                "filename": "gone.pdf",
+                "chunk_id": 0,
+                "page": 0,
+                "start": 0,
+                "end_page": 0,
+                "end": 5,
+            },
+        ],
+    )
+    embedder = FakeEmbedder([0.9, 0.5, 0.1, 0.0])
+    return Retriever(indexer, embedder, PageCache(tmp_path))
+
+
+def test_retriever_reads_passages_from_spans(retriever):
+    passages, timings = retriever.retrieve("How do I fix the pump?", k=3)
+
+    assert [(p["filename"], p["chunk_id"]) for p in passages] == [
+        ("manual.pdf", 0),
+        ("manual.pdf", 1),
+        ("gone.pdf", 0),
+    ]
+    assert passages[0]["text"] == "Pump manual."
+    assert passages[1]["text"].split() == [
+        "Check",
+        "the",
+        "seals.",
+        "Replace",
+        "the",
+        "relay.",
+    ]
+    assert passages[1]["page"] == 0
+    # The PDF of gone.pdf isn't there; the hit is still reported
+    assert passages[2]["text"] is None
+    assert passages[0]["score"] < passages[1]["score"]
+    assert set(timings) == {"embed", "search", "fetch"}
+
+
+def test_retriever_caches_page_texts(retriever):
+    with patch.object(
+        PDFLoader, "load_pages", autospec=True, side_effect=PDFLoader.load_pages
+    ) as load_pages:
+        first, _ = retriever.retrieve("pump", k=2)
+        second, _ = retriever.retrieve("pump", k=2)
+
+    assert load_pages.call_count == 1
+    assert second == first
+    assert retriever.pages.size == sum(
+        len(text)
+        for text in PDFLoader(retriever.pages.directory / "manual.pdf").load_text(
+            by_page=True
+        )
+    )
+
+    retriever.pages = PageCache(retriever.pages.directory, max_chars=0)
+    [passage], _ = retriever.retrieve("pump", k=1, filter=["manual.pdf"])
+    assert passage["text"] == "Pump manual."
+    assert retriever.pages.size == 0
+
+
+def test_retriever_uses_stored_texts_without_reading_pdfs(tmp_path):
+    indexer = FAISSIndexer(dim=4)
+    indexer.add_embeddings(
+        np.eye(4, dtype="float32")[:2],
+        [
+            {
+                "filename": "gone.pdf",
+                "chunk_id": 0,
+                "page": 0,
+                "start": 0,
+                "end_page": 0,
+                "end": 12,
+            },
+            {"filename": "gone.pdf", "chunk_id": 1},
+        ],
+        ["Pump manual.", "Replace the relay."],
+    )
+    retriever = Retriever(
+        indexer, FakeEmbedder([0.9, 0.5, 0.0, 0.0]), PageCache(tmp_path)
+    )
+
+    with patch.object(PDFLoader, "load_pages") as load_pages:
+        passages, _ = retriever.retrieve("pump", k=2)
+
+    load_pages.assert_not_called()
+    assert [p["text"] for p in passages] == ["Pump manual.", "Replace the relay."]
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from app.services.rw_lock import ReadWriteLock
+
+
+def test_readers_share_the_lock_and_writers_wait():
+    lock = ReadWriteLock()
+    both_reading = threading.Barrier(2, timeout=5)
+    events = []
+
+    def read():
+        with lock.read():
+            both_reading.wait()
+            events.append("read")
+
+    def write():
+        with lock.write():
+            events.append("write")
+
+    with lock.read():
+        reader = threading.Thread(target=read)
+        reader.start()
+        both_reading.wait()
+        reader.join(timeout=5)
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(timeout=0.1)
+        assert writer.is_alive()
+    writer.join(timeout=5)
+
+    assert events == ["read", "write"]
+
+
+def test_write_lock_is_reentrant_and_may_read():
+    lock = ReadWriteLock()
+    with lock.write(), lock.write(), lock.read():
+        pass
+    with lock.read(), lock.read(), pytest.raises(RuntimeError), lock.write():
+        pass
@@ -0,0 +1,235 @@
+# tests/services/test_sharded_indexer.py
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.services.indexer import FAISSIndexer
+from app.services.sharded_indexer import ShardedIndexer
+
+
+def _texts(metadata):
+    return [
+        f"{m['filename']} chunk {m['chunk_id']} part p{i}"
+        for i, m in enumerate(metadata)
+    ]
+
+
+def _corpus(num_docs=12, chunks=5, dim=8, seed=0):
+    vectors = np.random.default_rng(seed).random((num_docs * chunks, dim))
+    metadata = [
+        {
+            "filename": f"doc{i // chunks}.pdf",
+            "chunk_id": i % chunks,
+            "fingerprint": f"{i:016x}",
+        }
+        for i in range(num_docs * chunks)
+    ]
+    return vectors.astype("float32"), metadata
+
+
+def _names_on_different_shards(indexer):
+    names = [f"doc{i}.pdf" for i in range(100)]
+    first = names[0]
+    other = next(n for n in names if indexer.shard_for(n) != indexer.shard_for(first))
+    return first, other
+
+
+def test_sharded_search_matches_single_index():
+    vectors, metadata = _corpus()
+    single = FAISSIndexer(dim=8)
+    single.add_embeddings(vectors, metadata)
+    sharded = ShardedIndexer(dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata)
+
+    assert {len(s.metadata_store) for s in sharded.shards} != {0}
+    expected = single.search(vectors[:10], k=7)
+    found = sharded.search(vectors[:10], k=7)
+
+    for want, got in zip(expected, found):
+        assert [h["metadata"] for h in got] == [h["metadata"] for h in want]
+        assert [h["score"] for h in got] == pytest.approx([h["score"] for h in want])
+
+
+def test_sharded_search_filters_and_removes_by_global_id():
+    vectors, metadata = _corpus()
+    sharded = ShardedIndexer(dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata)
+
+    hits = sharded.search(vectors[:2], k=5, filter=["doc3.pdf", "doc7.pdf"])
+    for query_hits in hits:
+        assert len(query_hits) == 5
+        assert {h["metadata"]["filename"] for h in query_hits} <= {
+            "doc3.pdf",
+            "doc7.pdf",
+        }
+    assert sharded.search(vectors[:1], k=5, filter=[]) == [[]]
+
+    [[top]] = sharded.search(vectors[:1], k=1)
+    assert top["shard"] == sharded.shard_for("doc0.pdf")
+    assert sharded.remove_ids([top["id"]]) == 1
+    [[next_hit]] = sharded.search(vectors[:1], k=1)
+    assert next_hit["id"] != top["id"]
+
+
+def test_sharded_search_text_merges_shards():
+    vectors, metadata = _corpus()
+    single = FAISSIndexer(dim=8)
+    single.add_embeddings(vectors, metadata, _texts(metadata))
+    sharded = ShardedIndexer(dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata, _texts(metadata))
+
+    [hit] = sharded.search_text("p17")
+    assert hit["metadata"] == metadata[17]
+    assert hit["shard"] == sharded.shard_for(metadata[17]["filename"])
+    assert sharded.remove_ids([hit["id"]]) == 1
+    assert sharded.search_text("p17") == []
+
+    hits = sharded.search_text("doc5.pdf chunk", k=5, filter=["doc5.pdf", "doc6.pdf"])
+    assert {h["metadata"]["filename"] for h in hits} == {"doc5.pdf"}
+    assert len(sharded.search_text("chunk", k=100)) == len(metadata) - 1
+
+    resharded = ShardedIndexer.from_indexers(sharded.shards, dim=8, num_shards=2)
+    [moved] = resharded.search_text("p18")
+    assert moved["metadata"] == metadata[18]
+
+
+def test_sharded_replace_document_moves_carried_vectors_across_shards():
+    sharded = ShardedIndexer(dim=8, num_shards=4)
+    previous, filename = _names_on_different_shards(sharded)
+    vectors = np.eye(8, dtype="float32")[:3]
+    sharded.add_embeddings(
+        vectors,
+        [
+            {"filename": previous, "chunk_id": i, "fingerprint": f"{i:016x}"}
+            for i in range(3)
+        ],
+    )
+    carried = [{"filename": filename, "chunk_id": 0, "fingerprint": f"{1:016x}"}]
+
+    assert sharded.replace_document(previous, filename, carried, ["moved"]) == 2
+
+    assert not sharded.has_document(previous)
+    assert sharded.document_fingerprints(filename) == {f"{1:016x}": 1}
+    [[hit]] = sharded.search(vectors[1:2], k=1)
+    assert hit["metadata"]["filename"] == filename
+    assert hit["score"] == pytest.approx(0.0)
+    assert [h["id"] for h in sharded.search_text("moved")] == [hit["id"]]
+
+
+def test_sharded_replace_document_rolls_back_copies_on_failure():
+    sharded = ShardedIndexer(dim=8, num_shards=4)
+    previous, filename = _names_on_different_shards(sharded)
+    vectors = np.eye(8, dtype="float32")[:3]
+    fingerprints = [f"{i:016x}" for i in range(3)]
+    sharded.add_embeddings(
+        vectors,
+        [
+            {"filename": previous, "chunk_id": i, "fingerprint": fingerprints[i]}
+            for i in range(3)
+        ],
+    )
+    # The new version's own chunk, added before the old one is retired
+    sharded.add_embeddings(
+        np.eye(8, dtype="float32")[7:], [{"filename": filename, "chunk_id": 1}]
+    )
+    carried = [{"filename": filename, "chunk_id": 0, "fingerprint": fingerprints[1]}]
+    source = sharded.shards[sharded.shard_for(previous)]
+
+    failing = patch.object(source, "remove_document", side_effect=OSError("log full"))
+    with failing, pytest.raises(OSError):
+        sharded.replace_document(previous, filename, carried, ["moved"])
+
+    assert sharded.document_fingerprints(previous) == dict.fromkeys(fingerprints, 1)
+    assert sharded.has_document(filename)
+    assert sharded.document_fingerprints(filename) == {}
+    assert sharded.search_text("moved") == []
+
+
+def test_sharded_save_writes_changed_shards_only(tmp_path):
+    vectors, metadata = _corpus()
+    sharded = ShardedIndexer(dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata)
+    assert sharded.save(tmp_path) == 3
+
+    sharded.remove_document("doc0.pdf")
+    assert sharded.save(tmp_path) == 1
+
+    loaded = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    assert not loaded.has_document("doc0.pdf")
+    assert loaded.has_document("doc1.pdf")
+    shard = loaded.shard_for("doc1.pdf")
+    alone = ShardedIndexer.load_shard(tmp_path, shard, dim=8)
+    assert alone.has_document("doc1.pdf")
+
+    with pytest.raises(ValueError, match="expected 2"):
+        ShardedIndexer.open(tmp_path, dim=8, num_shards=2)
+
+
+def test_sharded_save_keeps_unwritten_shards_dirty(tmp_path):
+    vectors, metadata = _corpus()
+    sharded = ShardedIndexer(dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata)
+    with (
+        patch.object(sharded.shards[1], "save", side_effect=OSError("disk full")),
+        pytest.raises(OSError),
+    ):
+        sharded.save(tmp_path)
+
+    # Shard 0 was written; shards 1 and 2 are saved on the next attempt
+    assert sharded._dirty == {1, 2}
+    assert sharded.save(tmp_path) == 2
+
+
+def test_sharded_open_rejects_unsharded_snapshot(tmp_path):
+    vectors, metadata = _corpus()
+    single = FAISSIndexer(dim=8)
+    single.add_embeddings(vectors, metadata)
+    single.remove_document("doc0.pdf")
+    single.save(tmp_path)
+
+    with pytest.raises(ValueError, match="unsharded"):
+        ShardedIndexer.open(tmp_path, dim=8, num_shards=2)
+
+    resharded = ShardedIndexer.from_indexers([single], dim=8, num_shards=2)
+    assert sum(len(s.metadata_store) for s in resharded.shards) == 55
+    assert not resharded.has_document("doc0.pdf")
+
+
+def test_sharded_open_recovers_unsaved_changes(tmp_path):
+    vectors, metadata = _corpus()
+    sharded = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    sharded.add_embeddings(vectors, metadata)
+    sharded.remove_document("doc0.pdf")
+    assert sharded.wal_bytes > 0
+
+    recovered = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    for shard in recovered.shards:
+        shard.wait_for_compaction()
+    live = [
+        len(s.metadata_store) - s.metadata_store.tombstones for s in recovered.shards
+    ]
+    assert sum(live) == 55
+    assert not recovered.has_document("doc0.pdf")
+    assert recovered.has_document("doc1.pdf")
+    with pytest.raises(ValueError, match="expected 2"):
+        ShardedIndexer.open(tmp_path, dim=8, num_shards=2)
+
+
+def test_sharded_save_after_recovery_folds_the_log_into_snapshots(tmp_path):
+    vectors, metadata = _corpus()
+    sharded = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    sharded.add_embeddings(vectors[:30], metadata[:30])
+    sharded.save(tmp_path)
+    sharded.add_embeddings(vectors[30:], metadata[30:])
+
+    recovered = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    assert recovered.wal_bytes > 0
+    assert recovered.save(tmp_path) > 0
+    assert recovered.wal_bytes == 0
+
+    reopened = ShardedIndexer.open(tmp_path, dim=8, num_shards=3)
+    assert reopened.wal_bytes == 0
+    assert sum(len(s.metadata_store) for s in reopened.shards) == 60
+    assert reopened.save(tmp_path) == 0
@@ -19,3 +19,21 @@ def test_upload_pdf_route_success() -> None:
     assert data["original_filename"] == "sample.pdf"
     assert data["saved_as"].endswith(".pdf")
     assert data["storage"] == "local"
+
+
+def test_upload_identical_pdf_returns_existing_record() -> None:
+    test_file = Path("tests/data/sample.pdf")
+    responses = []
+    for _ in range(2):
+        with open(test_file, "rb") as f:
+            responses.append(
+                client.post(
+                    "/api/upload", files={"file": ("sample.pdf", f, "application/pdf")}
+                )
+            )
+
+    first, second = (r.json() for r in responses)
+    assert all(r.status_code == 200 for r in responses)
+    assert second["duplicate"] is True
+    assert second["saved_as"] == first["saved_as"]
+    assert second["sha256"] == first["sha256"]